@@ -0,0 +1,76 @@
+"""
+Benchmarks for the serialization of commonast trees.
+
+Compares JSON (tojson/fromjson) with the binary format (tobytes/frombytes),
+with and without positions, and pickle (which uses the binary format).
+Also compares the structural __eq__ with comparing the dicts that
+the JSON serialization is based on. The trees are those of the sample
+files in the tests directory. Usage:
+
+    python benchmarks/bench_commonast.py
+
+"""
+
+import os
+import sys
+import pickle
+from time import perf_counter
+
+from pscript import commonast
+
+
+REPEAT = 5
+SCALE = 10
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(os.path.dirname(THIS_DIR), "tests")
+SAMPLES = "python_sample.py", "python_sample3.py"
+
+
+def best_time(func, repeat=REPEAT):
+    """Get the best time of a few calls to func, and its result."""
+    times = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        res = func()
+        times.append(perf_counter() - t0)
+    return min(times), res
+
+
+def get_roots(scale=SCALE):
+    roots = []
+    for filename in SAMPLES:
+        with open(os.path.join(SAMPLES_DIR, filename), "rb") as f:
+            code = f.read().decode()
+        roots.append(commonast.parse(code * scale))
+    return roots
+
+
+def main():
+    roots = get_roots()
+
+    formats = {
+        "json": (lambda r: r.tojson(None), commonast.Node.fromjson),
+        "json_indent": (lambda r: r.tojson(), commonast.Node.fromjson),
+        "bytes": (lambda r: r.tobytes(), commonast.Node.frombytes),
+        "bytes_nopos": (lambda r: r.tobytes(False), commonast.Node.frombytes),
+        "pickle": (pickle.dumps, pickle.loads),
+    }
+    print("%-14s %12s %12s %12s" % ("format", "size (kB)", "dump (ms)", "load (ms)"))
+    for name, (dump, load) in formats.items():
+        t_dump, blobs = best_time(lambda dump=dump: [dump(r) for r in roots])
+        t_load, _ = best_time(lambda load=load, blobs=blobs: [load(b) for b in blobs])
+        size = sum(len(b) for b in blobs) / 1024
+        print("%-14s %12.1f %12.2f %12.2f" % (name, size, t_dump * 1000, t_load * 1000))
+
+    copies = [commonast.Node.frombytes(r.tobytes()) for r in roots]
+    pairs = list(zip(roots, copies))  # noqa: B905 - same length
+    t_dict, _ = best_time(lambda: [r._todict() == c._todict() for r, c in pairs])
+    t_eq, _ = best_time(lambda: [r == c for r, c in pairs])
+    print()
+    print("%-14s %12.2f ms" % ("eq via dicts", t_dict * 1000))
+    print("%-14s %12.2f ms" % ("eq structural", t_eq * 1000))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
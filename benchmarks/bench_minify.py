@@ -0,0 +1,64 @@
+"""
+Benchmark for the size of minified code.
+
+Reports the raw and gzipped size of the generated JS for the corpus
+of the transpiler benchmark, with and without the ``minify`` option,
+and for the full stdlib. Usage:
+
+    python benchmarks/bench_minify.py [name_filter ...] [--scale 1]
+
+"""
+
+import sys
+import gzip
+import argparse
+
+from pscript import py2js, stdlib
+
+from bench_transpiler import CORPUS
+
+
+def get_sizes(code):
+    """Get the raw and gzipped size of the given code, in bytes."""
+    data = code.encode()
+    return len(data), len(gzip.compress(data, 9))
+
+
+def format_row(name, normal, minified):
+    return "%-16s %9i %9i %6.1f%% %9i %9i %6.1f%%" % (
+        name,
+        normal[0],
+        minified[0],
+        100 * (1 - minified[0] / normal[0]),
+        normal[1],
+        minified[1],
+        100 * (1 - minified[1] / normal[1]),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark minified code size.")
+    parser.add_argument("filters", nargs="*", help="only use matching corpora")
+    parser.add_argument("--scale", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(
+        "%-16s %9s %9s %7s %9s %9s %7s"
+        % ("corpus", "raw", "minified", "saved", "gzip", "minified", "saved")
+    )
+    for func in CORPUS:
+        name = func.__name__
+        if args.filters and not any(f in name for f in args.filters):
+            continue
+        pycode = func(args.scale)
+        normal = get_sizes(py2js(pycode))
+        minified = get_sizes(py2js(pycode, minify=True))
+        print(format_row(name, normal, minified))
+
+    normal = get_sizes(stdlib.get_full_std_lib())
+    minified = get_sizes(stdlib.get_full_std_lib(minify=True))
+    print(format_row("full stdlib", normal, minified))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+Benchmarks for the runtime performance of code generated by PScript.
+
+Each kernel is a PScript function that exercises a common idiom (loops,
+comprehensions, string formatting, etc.). It is called with the problem
+size and returns a checksum. Every kernel is run in three variants, each
+in a separate Node.js process so that they do not share JIT state:
+
+* js: a hand-written JavaScript implementation, the baseline.
+* pscript: the transpiled kernel.
+* no_overload: the transpiled kernel with ``PSCRIPT_OVERLOAD = False``.
+
+After a few warmup calls, the best time of a number of repetitions is
+taken. The result is a table of overhead ratios relative to the
+hand-written JS. This table is stored in runtime_overhead.md next to
+this file, so that changes to the stdlib (or the parser) that make the
+generated code slower show up in review. Usage:
+
+    python benchmarks/bench_runtime.py [name_filter ...]
+        [--update] [--threshold 1.5]
+
+Without --update, the results are compared to the stored table, and the
+exit code is 1 if an overhead ratio got worse than the threshold allows.
+A "*" marks a no_overload variant that gives a different result than the
+baseline, i.e. a kernel that relies on the overloading to be correct.
+
+"""
+
+import os
+import sys
+import json
+import inspect
+import argparse
+import textwrap
+
+from pscript import py2js, evaljs
+
+
+WARMUP = 3
+REPEAT = 10
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLE_FILENAME = os.path.join(THIS_DIR, "runtime_overhead.md")
+
+KERNELS = []
+
+HARNESS = """
+var checksum, times = [];
+for (var i=0; i<%(warmup)i; i++) {checksum = %(name)s(%(n)i);}
+for (var i=0; i<%(repeat)i; i++) {
+    var t0 = performance.now();
+    checksum = %(name)s(%(n)i);
+    times.push((performance.now() - t0) / 1000);
+}
+console.log(JSON.stringify({time: Math.min.apply(null, times), checksum: checksum}));
+"""
+
+
+def kernel(n, js):
+    """Decorator to register a kernel with its problem size, and the
+    hand-written JavaScript to compare against. The JS must define a
+    function with the same name as the kernel.
+    """
+
+    def wrapper(func):
+        KERNELS.append((func, n, js))
+        return func
+
+    return wrapper
+
+
+def get_variants(func, js):
+    """Get a dict that maps variant name to the JS code that defines a
+    function with the name of the kernel.
+    """
+    code = textwrap.dedent(inspect.getsource(func))
+    code = code[code.index("def ") :]  # strip the decorator
+    defline, body = code.split("\n", 1)
+    no_overload = defline + "\n    PSCRIPT_OVERLOAD = False\n" + body
+    return {
+        "js": js,
+        "pscript": py2js(code),
+        "no_overload": py2js(no_overload),
+    }
+
+
+def run_variant(name, jscode, n, warmup=WARMUP, repeat=REPEAT):
+    """Run a variant of a kernel in Node.js and return a dict with the
+    best time in seconds and the checksum.
+    """
+    jscode += HARNESS % dict(name=name, n=n, warmup=warmup, repeat=repeat)
+    return json.loads(evaljs(jscode, print_result=False))
+
+
+## Kernels
+
+
+@kernel(
+    1_000,
+    js="""
+function loops (n) {
+    var total = 0;
+    for (var i=0; i<n; i++) {
+        for (var j=0; j<n; j++) {
+            if ((i + j) % 3 === 0) {total += i * j;} else {total -= 1;}
+        }
+    }
+    return total;
+}""",
+)
+def loops(n):
+    total = 0
+    for i in range(n):
+        for j in range(n):
+            if (i + j) % 3 == 0:
+                total += i * j
+            else:
+                total -= 1
+    return total
+
+
+@kernel(
+    100_000,
+    js="""
+function comprehensions (n) {
+    var total = 0;
+    for (var k=0; k<10; k++) {
+        var squares = [];
+        for (var x=0; x<n; x++) {if (x % 3) {squares.push(x * x);}}
+        var values = [];
+        for (var i=0; i<squares.length; i++) {values.push(squares[i] % 7);}
+        total += values.length;
+    }
+    return total;
+}""",
+)
+def comprehensions(n):
+    total = 0
+    for _ in range(10):
+        squares = [x * x for x in range(n) if x % 3]
+        values = [s % 7 for s in squares]
+        total += len(values)
+    return total
+
+
+@kernel(
+    20_000,
+    js="""
+function string_formatting (n) {
+    var total = 0;
+    for (var i=0; i<n; i++) {
+        var name = "item" + i;
+        var s1 = name + ": " + i + " of " + n;
+        var s2 = "<" + name + " " + (i * 2) + ">";
+        total += s1.length + s2.length;
+    }
+    return total;
+}""",
+)
+def string_formatting(n):
+    total = 0
+    for i in range(n):
+        name = "item" + str(i)
+        s1 = "%s: %i of %i" % (name, i, n)
+        s2 = f"<{name} {i * 2}>"
+        total += len(s1) + len(s2)
+    return total
+
+
+@kernel(
+    50_000,
+    js="""
+function dict_ops (n) {
+    var d = {};
+    for (var i=0; i<n; i++) {d["k" + (i % 1000)] = i;}
+    var total = 0;
+    for (var i=0; i<n; i++) {
+        var key = "k" + (i % 2000);
+        if (key in d) {total += d[key];}
+    }
+    var keys = Object.keys(d);
+    for (var i=0; i<keys.length; i++) {total += d[keys[i]] % 10;}
+    return total;
+}""",
+)
+def dict_ops(n):
+    d = {}
+    for i in range(n):
+        d["k" + str(i % 1000)] = i
+    total = 0
+    for i in range(n):
+        key = "k" + str(i % 2000)
+        if key in d:
+            total += d[key]
+    for _, value in d.items():
+        total += value % 10
+    return total
+
+
+@kernel(
+    50_000,
+    js="""
+function class_instantiation (n) {
+    function Point (x, y) {this.x = x; this.y = y;}
+    Point.prototype.norm1 = function () {return Math.abs(this.x) + Math.abs(this.y);};
+    var total = 0;
+    for (var i=0; i<n; i++) {
+        var p = new Point(i, -i);
+        total += p.norm1();
+    }
+    return total;
+}""",
+)
+def class_instantiation(n):
+    class Point:
+        def __init__(self, x, y):
+            self.x = x
+            self.y = y
+
+        def norm1(self):
+            return abs(self.x) + abs(self.y)
+
+    total = 0
+    for i in range(n):
+        p = Point(i, -i)
+        total += p.norm1()
+    return total
+
+
+@kernel(
+    2_000,
+    js="""
+function deep_equality (n) {
+    function eq (a, b) {
+        if (Array.isArray(a)) {
+            if (!Array.isArray(b) || a.length !== b.length) {return false;}
+            for (var i=0; i<a.length; i++) {if (!eq(a[i], b[i])) {return false;}}
+            return true;
+        }
+        if (a !== null && typeof a === "object") {
+            if (b === null || typeof b !== "object") {return false;}
+            var akeys = Object.keys(a);
+            if (akeys.length !== Object.keys(b).length) {return false;}
+            for (var i=0; i<akeys.length; i++) {
+                if (!(akeys[i] in b) || !eq(a[akeys[i]], b[akeys[i]])) {return false;}
+            }
+            return true;
+        }
+        return a === b;
+    }
+    var records = [], copies = [];
+    for (var i=0; i<n; i++) {
+        records.push({id: i, tags: ["a", "b", i % 5], pos: [i, i * 2]});
+        copies.push({id: i, tags: ["a", "b", i % 7], pos: [i, i * 2]});
+    }
+    var count = 0;
+    for (var k=0; k<10; k++) {
+        for (var i=0; i<n; i++) {if (eq(records[i], copies[i])) {count += 1;}}
+    }
+    return count;
+}""",
+)
+def deep_equality(n):
+    records = []
+    copies = []
+    for i in range(n):
+        records.append({"id": i, "tags": ["a", "b", i % 5], "pos": [i, i * 2]})
+        copies.append({"id": i, "tags": ["a", "b", i % 7], "pos": [i, i * 2]})
+    count = 0
+    for _ in range(10):
+        for i in range(n):
+            if records[i] == copies[i]:
+                count += 1
+    return count
+
+
+## Running
+
+
+def run_all(filters=(), warmup=WARMUP, repeat=REPEAT):
+    """Run all variants of all kernels. Yields (name, n, results) tuples,
+    where results maps variant name to a dict with time and checksum.
+    """
+    for func, n, js in KERNELS:
+        name = func.__name__
+        if filters and not any(f in name for f in filters):
+            continue
+        results = {}
+        for variant, jscode in get_variants(func, js).items():
+            results[variant] = run_variant(name, jscode, n, warmup, repeat)
+        if results["pscript"]["checksum"] != results["js"]["checksum"]:
+            raise RuntimeError("Kernel %s gives a different result than its JS." % name)
+        yield name, n, results
+
+
+def read_table(filename=TABLE_FILENAME):
+    """Read the overhead ratios from the stored table. Returns a dict
+    that maps kernel name to a (pscript_ratio, no_overload_ratio) tuple.
+    """
+    ratios = {}
+    if not os.path.isfile(filename):
+        return ratios
+    with open(filename, "rb") as f:
+        for line in f.read().decode().splitlines():
+            cells = [c.strip().rstrip("*x ") for c in line.strip("|").split("|")]
+            if len(cells) == 6 and cells[1].isdigit():
+                ratios[cells[0]] = float(cells[4]), float(cells[5])
+    return ratios
+
+
+def format_table(rows):
+    """Format the results as a markdown table."""
+    lines = [
+        "| kernel | n | js (ms) | pscript (ms) | pscript / js | no_overload / js |",
+        "|---|--:|--:|--:|--:|--:|",
+    ]
+    for name, n, results in rows:
+        t_js = results["js"]["time"]
+        t_ps = results["pscript"]["time"]
+        t_no = results["no_overload"]["time"]
+        mark = (
+            ""
+            if results["no_overload"]["checksum"] == results["js"]["checksum"]
+            else "*"
+        )
+        lines.append(
+            "| %s | %i | %0.2f | %0.2f | %0.2fx | %0.2fx%s |"
+            % (name, n, t_js * 1000, t_ps * 1000, t_ps / t_js, t_no / t_js, mark)
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PScript-generated JS.")
+    parser.add_argument("filters", nargs="*", help="only run matching kernels")
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--update", action="store_true", help="update the stored table")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="flag a regression if a ratio is worse than stored by this factor",
+    )
+    args = parser.parse_args(argv)
+
+    stored = read_table()
+    rows, regressions = [], []
+    for row in run_all(args.filters, args.warmup, args.repeat):
+        rows.append(row)
+        print(format_table([row]).splitlines()[-1])
+        name, _, results = row
+        for i, variant in enumerate(("pscript", "no_overload")):
+            ratio = results[variant]["time"] / results["js"]["time"]
+            if name in stored and ratio > stored[name][i] * args.threshold:
+                regressions.append(name + "/" + variant)
+
+    table = format_table(rows)
+    if args.update:
+        header = (
+            "# Runtime overhead of PScript-generated code\n\n"
+            "Generated by `python benchmarks/bench_runtime.py --update`.\n"
+            "Ratios are relative to hand-written JS; lower is better. A `*`\n"
+            "marks a variant that gives a different result without overloading.\n\n"
+        )
+        with open(TABLE_FILENAME, "wb") as f:
+            f.write((header + table).encode())
+    if regressions:
+        print(
+            "Regressions (threshold %0.2fx): %s"
+            % (args.threshold, ", ".join(regressions))
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Benchmarks for the PScript standard library.
+
+Each benchmark is a PScript function that is transpiled with py2js and
+run in Node.js. It is called with the problem size and returns the time
+spent in the part of interest, so that setup code is not measured. The
+best time of a few runs is reported. Benchmarks that list legacy helpers
+are also run with the previous implementation of these helpers, to show
+the speedup. Usage:
+
+    python benchmarks/bench_stdlib.py [name_filter ...]
+
+"""
+
+import sys
+import json
+from time import perf_counter
+
+from pscript import py2js, evaljs
+
+
+REPEAT = 5
+
+BENCHMARKS = []
+SHARED = []  # functions that benchmarks can use
+
+# Previous implementations of stdlib helpers, to compare against
+LEGACY = {}
+
+LEGACY["_pyfunc_op_equals"] = """function op_equals (a, b) {
+    var a_type = typeof a;
+    if (a_type === "string" || a_type === "boolean" || a_type === "number") {
+        return a == b;
+    }
+    if (a == null || b == null) {
+    } else if (Array.isArray(a) && Array.isArray(b)) {
+        var i = 0, iseq = a.length == b.length;
+        while (iseq && i < a.length) {iseq = op_equals(a[i], b[i]); i+=1;}
+        return iseq;
+    } else if (a.constructor === Object && b.constructor === Object) {
+        var akeys = Object.keys(a), bkeys = Object.keys(b);
+        akeys.sort(); bkeys.sort();
+        var i=0, k, iseq = op_equals(akeys, bkeys);
+        while (iseq && i < akeys.length)
+            {k=akeys[i]; iseq = op_equals(a[k], b[k]); i+=1;}
+        return iseq;
+    } return a == b;
+}"""
+
+LEGACY["_pyfunc_op_contains"] = """function op_contains (a, b) {
+    if (b == null) {
+    } else if (Array.isArray(b)) {
+        for (var i=0; i<b.length; i++) {if (_pyfunc_op_equals(a, b[i]))
+                                           return true;}
+        return false;
+    } else if (b.constructor === Object) {
+        for (var k in b) {if (a == k) return true;}
+        return false;
+    } else if (b.constructor == String) {
+        return b.indexOf(a) >= 0;
+    } var e = Error('Not a container: ' + b); e.name='TypeError'; throw e;
+}"""
+
+LEGACY["_pymeth_count"] = """function (x, start, stop) {
+    start = (start === undefined) ? 0 : start;
+    stop = (stop === undefined) ? this.length : stop;
+    start = Math.max(0, ((start < 0) ? this.length + start : start));
+    stop = Math.min(this.length, ((stop < 0) ? this.length + stop : stop));
+    if (Array.isArray(this)) {
+        var count = 0;
+        for (var i=0; i<this.length; i++) {
+            if (_pyfunc_op_equals(this[i], x)) {count+=1;}
+        } return count;
+    } else return this.count.apply(this, arguments);
+}"""
+
+LEGACY["_pymeth_index"] = """function (x, start, stop) {
+    start = (start === undefined) ? 0 : start;
+    stop = (stop === undefined) ? this.length : stop;
+    start = Math.max(0, ((start < 0) ? this.length + start : start));
+    stop = Math.min(this.length, ((stop < 0) ? this.length + stop : stop));
+    if (Array.isArray(this)) {
+        for (var i=start; i<stop; i++) {
+            if (_pyfunc_op_equals(this[i], x)) {return i;}
+        }
+    } else return this.index.apply(this, arguments);
+    var e = Error(x); e.name='ValueError'; throw e;
+}"""
+
+LEGACY["_pyfunc_op_mult"] = """function (a, b) {
+    if ((typeof a === 'number') + (typeof b === 'number') === 1) {
+        if (a.constructor === String) return _pymeth_repeat.call(a, b);
+        if (b.constructor === String) return _pymeth_repeat.call(b, a);
+        if (Array.isArray(b)) {var t=a; a=b; b=t;}
+        if (Array.isArray(a)) {
+            var res = []; for (var i=0; i<b; i++) res = res.concat(a);
+            return res;
+        }
+    } return a * b;
+}"""
+
+LEGACY["_pyfunc_truthy"] = """function (v) {
+    if (v === null || typeof v !== "object") {return v;}
+    else if (v.length !== undefined) {return v.length ? v : false;}
+    else if (v.byteLength !== undefined) {return v.byteLength ? v : false;}
+    else if (v.constructor !== Object) {return true;}
+    else {return Object.getOwnPropertyNames(v).length ? v : false;}
+}"""
+
+
+def benchmark(n, legacy=()):
+    """Decorator to register a benchmark function with its problem size,
+    and optionally the names of the legacy helpers to compare against.
+    """
+
+    def wrapper(func):
+        BENCHMARKS.append((func, n, legacy))
+        return func
+
+    return wrapper
+
+
+def shared(func):
+    """Decorator to register a function that benchmarks can use."""
+    SHARED.append(func)
+    return func
+
+
+def run_benchmark(func, n, legacy=(), repeat=REPEAT):
+    """Run a benchmark in Node.js and return the best time in seconds.
+    If legacy names are given, the corresponding helpers are replaced
+    with their previous implementation.
+    """
+    name = func.__name__
+    js = "".join(py2js(f) for f in SHARED) + py2js(func)
+    for helper_name in legacy:
+        js += "\n%s = %s;\n" % (helper_name, LEGACY[helper_name])
+    js += "\nvar times = [];\n"
+    js += "for (var i=0; i<%i; i++) {times.push(%s(%i));}\n" % (repeat, name, n)
+    js += "console.log(JSON.stringify(times));\n"
+    times = json.loads(evaljs(js, print_result=False))
+    return min(times)
+
+
+## Sorting
+
+
+@benchmark(100_000)
+def sort_objects_by_key(n):
+    items = [{"id": i, "value": (i * 7919) % 1000} for i in range(n)]
+    t0 = perf_counter()
+    items.sort(key=lambda item: item.value)
+    return perf_counter() - t0
+
+
+@benchmark(100_000)
+def sort_objects_by_key_reversed(n):
+    items = [{"id": i, "value": (i * 7919) % 1000} for i in range(n)]
+    t0 = perf_counter()
+    items.sort(key=lambda item: item.value, reverse=True)
+    return perf_counter() - t0
+
+
+@benchmark(100_000)
+def sorted_objects_by_str_key(n):
+    items = [{"id": i, "name": "item" + str((i * 7919) % n)} for i in range(n)]
+    t0 = perf_counter()
+    sorted(items, key=lambda item: item.name)
+    return perf_counter() - t0
+
+
+@benchmark(100_000)
+def sorted_objects_by_computed_key(n):
+    items = [{"id": i, "name": "Item" + str((i * 7919) % n)} for i in range(n)]
+    t0 = perf_counter()
+    sorted(items, key=lambda item: item.name.lower())
+    return perf_counter() - t0
+
+
+@benchmark(100_000)
+def sorted_numbers(n):
+    items = [(i * 7919) % n for i in range(n)]
+    t0 = perf_counter()
+    sorted(items)
+    return perf_counter() - t0
+
+
+## Equality
+
+
+@shared
+def make_records(n):
+    # Realistic nested data, like parsed JSON
+    records = []
+    for i in range(n):
+        records.append(
+            {
+                "id": i,
+                "name": "record" + str(i),
+                "tags": ["a", "b", str(i % 7)],
+                "position": {"x": i * 0.5, "y": i % 13, "z": None},
+                "active": i % 2 == 0,
+            }
+        )
+    return records
+
+
+@benchmark(2_000, legacy=("_pyfunc_op_equals",))
+def equals_nested_records(n):
+    a = make_records(n)
+    b = make_records(n)
+    t0 = perf_counter()
+    for _ in range(20):
+        assert a == b
+    return perf_counter() - t0
+
+
+@benchmark(2_000, legacy=("_pyfunc_op_equals", "_pyfunc_op_contains"))
+def contains_record(n):
+    records = make_records(n)
+    needles = make_records(n)[-20:]
+    t0 = perf_counter()
+    for needle in needles:
+        assert needle in records
+    return perf_counter() - t0
+
+
+@benchmark(100_000, legacy=("_pyfunc_op_equals", "_pymeth_count", "_pymeth_index"))
+def count_and_index_numbers(n):
+    numbers = [i for i in range(n)]
+    t0 = perf_counter()
+    for i in range(20):
+        numbers.count(i)
+        numbers.index(n - 1 - i)
+    return perf_counter() - t0
+
+
+@benchmark(10_000, legacy=("_pyfunc_op_equals", "_pymeth_count"))
+def count_short_lists(n):
+    pairs = [[i % 10, i % 3] for i in range(n)]
+    t0 = perf_counter()
+    for i in range(10):
+        pairs.count([i, i % 3])
+    return perf_counter() - t0
+
+
+## Repetition
+
+
+@benchmark(20_000, legacy=("_pyfunc_op_mult",))
+def repeat_single_element_list(n):
+    t0 = perf_counter()
+    zeros = [0] * n
+    assert len(zeros) == n
+    return perf_counter() - t0
+
+
+@benchmark(5_000, legacy=("_pyfunc_op_mult",))
+def repeat_multi_element_list(n):
+    t0 = perf_counter()
+    pattern = [1, 2, 3] * n
+    assert len(pattern) == 3 * n
+    return perf_counter() - t0
+
+
+## Truthiness
+
+
+@benchmark(1_000, legacy=("_pyfunc_truthy",))
+def truthy_records(n):
+    records = make_records(n)
+    t0 = perf_counter()
+    count = 0
+    for _ in range(100):
+        for record in records:
+            if record:
+                count += 1
+    assert count == 100 * n
+    return perf_counter() - t0
+
+
+def main(filters):
+    print("%-40s %10s %12s %12s %8s" % ("benchmark", "n", "best (ms)", "legacy", ""))
+    for func, n, legacy in BENCHMARKS:
+        if filters and not any(f in func.__name__ for f in filters):
+            continue
+        t = run_benchmark(func, n)
+        line = "%-40s %10i %12.2f" % (func.__name__, n, t * 1000)
+        if legacy:
+            t_legacy = run_benchmark(func, n, legacy)
+            line += " %12.2f %7.1fx" % (t_legacy * 1000, t_legacy / t)
+        print(line)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
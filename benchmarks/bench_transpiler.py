@@ -0,0 +1,323 @@
+"""
+Benchmarks for the PScript transpiler.
+
+Each stage of the pipeline is measured separately: Python's ast.parse,
+the conversion to commonast, the parsing (i.e. transpiling) by the
+Parser, the assembly of the stdlib, and dumping the code. The best time
+of a few runs is reported as throughput in lines per second, together
+with the peak memory of the stage (measured in a separate run with
+tracemalloc).
+
+The corpus consists of the sample files in the tests directory, and
+synthetic modules that stress specific constructs. Of the samples, only
+the top-level statements that PScript can transpile are used (e.g.
+imports are dropped, which is reported), repeated to get a sizable module.
+
+Results can be saved to JSON, and compared against a saved baseline.
+The exit code is 1 if a stage got slower than the threshold allows, so
+that CI can flag regressions. Usage:
+
+    python benchmarks/bench_transpiler.py [name_filter ...]
+        [--save results.json] [--baseline results.json] [--threshold 1.25]
+
+"""
+
+import io
+import os
+import sys
+import ast
+import json
+import argparse
+import tracemalloc
+from time import perf_counter
+
+from pscript import Parser, commonast, stdlib
+
+
+REPEAT = 5
+SCALE = 100
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(os.path.dirname(THIS_DIR), "tests")
+
+CORPUS = []
+STAGES = []
+
+
+def load_sample(filename):
+    """Get the code of a sample file, with only the top-level statements
+    that PScript can transpile. The skipped statements are reported.
+    """
+    with open(os.path.join(SAMPLES_DIR, filename), "rb") as f:
+        code = f.read().decode()
+    lines = code.splitlines(True)
+    nodes = ast.parse(code).body
+    # Each statement runs up to the next one, without the comments and empty
+    # lines in between (ast.get_source_segment() needs Python 3.8)
+    starts = [_get_first_lineno(node) - 1 for node in nodes] + [len(lines)]
+    statements, skipped = [], []
+    for i, node in enumerate(nodes):
+        segment = lines[starts[i] : starts[i + 1]]
+        while segment and segment[-1].lstrip()[:1] in ("", "#"):
+            segment.pop(-1)
+        segment = "".join(segment).rstrip()
+        if not segment:
+            continue  # on the same line as the previous statement
+        try:
+            Parser(segment)
+        except Exception:
+            skipped.append(str(node.lineno))
+            continue
+        statements.append(segment)
+    if skipped:
+        print(
+            "%s: skipped %i of %i statements that cannot be transpiled, "
+            "at lines %s" % (filename, len(skipped), len(nodes), ", ".join(skipped)),
+            file=sys.stderr,
+        )
+    return "\n".join(statements) + "\n"
+
+
+def _get_first_lineno(node):
+    """Get the first line of a statement, including its decorators."""
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def corpus(func):
+    """Decorator to register a function that produces a module to transpile."""
+    CORPUS.append(func)
+    return func
+
+
+def stage(func):
+    """Decorator to register a stage of the pipeline. The function gets
+    the code and returns a (setup, run) tuple of functions. The result
+    of setup() is passed to run(), which is the part that is measured.
+    """
+    STAGES.append(func)
+    return func
+
+
+## Corpus
+
+
+@corpus
+def sample(scale=SCALE):
+    return load_sample("python_sample.py") * scale
+
+
+@corpus
+def sample3(scale=SCALE):
+    return load_sample("python_sample3.py") * scale
+
+
+@corpus
+def deep_nesting(scale=SCALE):
+    # Functions with deeply nested control flow and expressions
+    lines = []
+    for i in range(scale):
+        lines.append("def nested%i(a, b):" % i)
+        indent = "    "
+        for depth in range(20):
+            keyword = ("if a > %i:", "for x%i in b:", "while a < %i:")[depth % 3]
+            lines.append(indent + keyword % depth)
+            indent += "    "
+            expr = "a"
+            for j in range(depth % 7):
+                expr = "(%s + b[%i]) * (a - %i)" % (expr, j, j)
+            lines.append(indent + "a = %s" % expr)
+        lines.append(indent + "return a")
+    return "\n".join(lines) + "\n"
+
+
+@corpus
+def many_classes(scale=SCALE):
+    # Many small classes with inheritance, methods and properties
+    lines = []
+    for i in range(scale * 5):
+        base = "Base%i" % (i - 1) if i else "object"
+        lines.append("class Base%i(%s):" % (i, base))
+        lines.append('    """Class number %i."""' % i)
+        lines.append("    def __init__(self, x, y=%i):" % i)
+        lines.append("        super().__init__()")
+        lines.append("        self.x = x")
+        lines.append("        self.y = y")
+        lines.append("    def total(self):")
+        lines.append("        return self.x + self.y + len(self.items())")
+        lines.append("    def items(self):")
+        lines.append("        return [i * %i for i in range(self.x)]" % i)
+        lines.append("    def describe(self):")
+        lines.append("        return 'Base%i(%%s, %%s)' %% (self.x, self.y)" % i)
+    return "\n".join(lines) + "\n"
+
+
+@corpus
+def long_functions(scale=SCALE):
+    # A few functions with very many statements
+    lines = []
+    for i in range(5):
+        lines.append("def long%i(data, key):" % i)
+        lines.append("    result = {}")
+        lines.append("    total = 0")
+        for j in range(scale * 20):
+            k = j % 5
+            if k == 0:
+                lines.append("    value%i = data.get(key, %i)" % (j, j))
+            elif k == 1:
+                lines.append(
+                    "    total += value%i * 2 if value%i else 1" % (j - 1, j - 1)
+                )
+            elif k == 2:
+                lines.append("    result['k%i'] = str(total) + key.upper()" % j)
+            elif k == 3:
+                lines.append("    if total > %i and key in result:" % j)
+                lines.append("        total = max(total, len(result))")
+            else:
+                lines.append("    data.append(f'{key}-{total}')")
+        lines.append("    return result, total")
+    return "\n".join(lines) + "\n"
+
+
+## Stages
+
+
+@stage
+def ast_parse(code):
+    return (lambda: code), ast.parse
+
+
+@stage
+def commonast_convert(code):
+    def setup():
+        return commonast.NativeAstConverter(code)
+
+    return setup, lambda converter: converter.convert()
+
+
+@stage
+def parse(code):
+    root = commonast.parse(code)  # the parser does not modify the tree
+    return (lambda: root), lambda root: Parser(root, inline_stdlib=False)
+
+
+@stage
+def stdlib_assembly(code):
+    parser = Parser(code, inline_stdlib=False)
+    names = parser._std_functions, parser._std_methods
+
+    return (lambda: names), lambda names: stdlib.get_partial_std_lib(*names)
+
+
+@stage
+def dump(code):
+    parser = Parser(code)
+    return (lambda: parser), lambda parser: parser.dump()
+
+
+@stage
+def dump_to(code):
+    parser = Parser(code)
+    return (lambda: parser), lambda parser: parser.dump_to(io.StringIO())
+
+
+## Running
+
+
+def run_stage(func, code, repeat=REPEAT):
+    """Run a stage and return a dict with the best time (s) and the peak
+    memory (bytes).
+    """
+    setup, run = func(code)
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        t0 = perf_counter()
+        run(arg)
+        times.append(perf_counter() - t0)
+    # Measure memory separately, because tracemalloc slows things down
+    arg = setup()
+    tracemalloc.start()
+    try:
+        run(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"time": min(times), "peak_memory": peak}
+
+
+def run_all(filters=(), scale=SCALE, repeat=REPEAT):
+    """Run all stages on all modules in the corpus. Yields
+    ("module/stage", result_dict) tuples.
+    """
+    for corpus_func in CORPUS:
+        code = corpus_func(scale)
+        nlines = code.count("\n")
+        for stage_func in STAGES:
+            name = corpus_func.__name__ + "/" + stage_func.__name__
+            if filters and not any(f in name for f in filters):
+                continue
+            result = run_stage(stage_func, code, repeat)
+            result["lines"] = nlines
+            result["lines_per_second"] = nlines / max(result["time"], 1e-9)
+            yield name, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PScript transpiler.")
+    parser.add_argument("filters", nargs="*", help="only run matching benchmarks")
+    parser.add_argument("--scale", type=int, default=SCALE, help="corpus size")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--save", help="filename to save the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="flag a regression if slower than the baseline by this factor",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = json.loads(f.read().decode())["results"]
+
+    print(
+        "%-32s %8s %12s %12s %12s %8s"
+        % ("benchmark", "lines", "best (ms)", "lines/s", "peak (MB)", "")
+    )
+    results, regressions = {}, []
+    for name, result in run_all(args.filters, args.scale, args.repeat):
+        results[name] = result
+        line = "%-32s %8i %12.2f %12.0f %12.2f" % (
+            name,
+            result["lines"],
+            result["time"] * 1000,
+            result["lines_per_second"],
+            result["peak_memory"] / 2**20,
+        )
+        if name in baseline:
+            ratio = result["time"] / baseline[name]["time"]
+            line += " %7.2fx" % ratio
+            if ratio > args.threshold:
+                line += " REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        info = {"python": sys.version.split()[0], "scale": args.scale}
+        with open(args.save, "wb") as f:
+            data = {"info": info, "results": results}
+            f.write(json.dumps(data, indent=2, sort_keys=True).encode())
+    if regressions:
+        print(
+            "Regressions (threshold %0.2fx): %s"
+            % (args.threshold, ", ".join(regressions))
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,11 +10,11 @@ sections below.
 
 PScript is a tool to write JavaScript using (a subset) of the Python
 language. All relevant builtins, and the methods of list, dict and str
-are supported. Not supported are set, slicing with steps, ``yield`` and
-imports. Other than that, most Python code should work as expected ...
-mostly, see caveats below. If you try hard enough the JavaScript may
-shine through. As a rule of thumb, the code should behave as expected
-when correct, but error reporting may not be very Pythonic.
+are supported. Not supported are set and imports. Other than that,
+most Python code should work as expected ... mostly, see caveats below.
+If you try hard enough the JavaScript may shine through. As a rule of
+thumb, the code should behave as expected when correct, but error
+reporting may not be very Pythonic.
 
 The most important functions you need to know about are
 :func:`py2js <pscript.py2js>` and
@@ -108,6 +108,13 @@ plan to make heavy use of PScript.
 * Divide by zero results in `inf` instead of raising ZeroDivisionError.
 * In Python you can do `a_list += a_string` where each character in the string
   will be added to the list. In PScript this will convert `a_list` to a string.
+* ``range()`` gives a lazy range object rather than an array. It can be
+  indexed, iterated over, added and multiplied like a list, but JS array
+  methods like ``map()`` and ``concat()`` are not available, and adding
+  it to a list without PScript's operator overloading gives a string.
+  Use ``list(range(n))`` to get an array.
+* Slicing a typed array (e.g. ``Float32Array``) without a step gives a view
+  on the same data, like in NumPy, rather than a copy.
 
 
 PScript is valid Python
@@ -177,8 +184,6 @@ Not currently supported:
 
 * import (maybe we should translate an import to ``require()``?)
 * the ``set`` class (JS has no set, but we could create one?)
-* slicing with steps (JS does not support this)
-* Generators, i.e. ``yield`` (not widely supported in JS)
 
 Supported basics:
 
@@ -187,7 +192,7 @@ Supported basics:
 * comparisons (``==`` -> ``==``, ``is`` -> ``===``)
 * tuple packing and unpacking
 * basic string formatting
-* slicing with start end end (though not with step)
+* slicing, also with a step, slice assignment and ``del`` of a slice
 * if-statements and single-line if-expressions
 * while-loops and for-loops supporting continue, break, and else-clauses
 * for-loops using ``range()``
@@ -198,6 +203,7 @@ Supported basics:
 * function calls/defs can use keyword arguments and ``**kwargs``, but
   use with care (see caveats).
 * lambda expressions
+* generators, i.e. ``yield`` and ``yield from`` (these map to ``function*``)
 * list comprehensions
 * classes, with (single) inheritance, and the use of ``super()``
 * raising and catching exceptions, assertions
@@ -262,15 +268,16 @@ logger = logging.getLogger(__name__)
 # docstrings are combined into one complete guide.
 
 
-from .parser0 import Parser0, JSError
+from .parser0 import Parser0, JSError, ParserProfile
 from .parser1 import Parser1
 from .parser2 import Parser2
 from .parser3 import Parser3
 from .base import *
 
-from .functions import py2js, evaljs, evalpy, JSString
+from .functions import py2js, evaljs, evalpy, JSString, StatsCollector
 from .functions import script2js, js_rename, create_js_module
-from .stdlib import get_full_std_lib, get_all_std_names
+from .stdlib import get_full_std_lib, get_all_std_names, write_std_lib
+from .linker import link
 from .stubs import RawJS, JSConstant, window, undefined
 
 
@@ -0,0 +1,35 @@
+"""
+Command line interface for PScript build steps. Usage:
+
+    python -m pscript stdlib DIRNAME [--module-type TYPE] [--minify]
+
+"""
+
+import sys
+import argparse
+
+from .stdlib import write_std_lib
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pscript")
+    subparsers = parser.add_subparsers(dest="command")  # required needs py37
+    sub = subparsers.add_parser("stdlib", help="write the stdlib to a JS file")
+    sub.add_argument("dirname", help="the directory to write the file to")
+    sub.add_argument("--module-type", default=None, help="e.g. 'umd' or 'esm'")
+    sub.add_argument("--minify", action="store_true", help="remove whitespace")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.error("a command is required, e.g. 'stdlib'")
+    elif args.command == "stdlib":
+        try:
+            manifest = write_std_lib(args.dirname, args.module_type, args.minify)
+        except OSError as err:
+            parser.error("cannot write the stdlib to %r: %s" % (args.dirname, err))
+        print("Wrote %s (%i bytes)" % (manifest["filename"], manifest["size"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
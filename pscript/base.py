@@ -14,7 +14,7 @@ class Parser(Parser3):
     """Parser to convert Python to JavaScript.
 
     Instantiate this class with the Python code. Retrieve the JS code
-    using the dump() method.
+    using the dump() method, or write it to a file using dump_to().
 
     In a subclass, you can implement methods called "function_x" or
     "method_x", which will then be called during parsing when a
@@ -25,7 +25,9 @@ class Parser(Parser3):
     https://greentreesnakes.readthedocs.org
 
     Parameters:
-        code (str): the Python source code.
+        code (str): the Python source code, or a tree produced by
+            ``commonast.parse()``. The tree is not modified, so it can
+            be parsed multiple times.
         pysource (tuple): the filename and line number that contain the source.
         indent (int): the base indentation level (default 0). One
             indentation level means 4 spaces.
@@ -33,6 +35,24 @@ class Parser(Parser3):
             (default True).
         inline_stdlib (bool): whether the used stdlib functions are inlined
             (default True). Set to False if the stdlib is already loaded.
+        profile (ParserProfile): if given, the number of calls and the time
+            spent in each handler are recorded in this profile (default None).
+        instrument (bool): whether to instrument the generated functions and
+            methods to count calls and measure the time spent in them
+            (default False). At runtime, the stats are available via
+            ``pscript_profile.stats``, and as JSON via ``pscript_profile.dump()``.
+            Lambdas and generator functions are not instrumented.
+        check_stdlib (bool): if inline_stdlib is False, whether to add a
+            check that throws an error at load time if the used stdlib
+            functions are not defined (default False).
+        minify (bool): whether to produce compact code (default False).
+            Indentation and docstrings are omitted at the source, dummy
+            variables and stdlib functions get short names, and blocks
+            with a single statement are folded. The remaining whitespace
+            and comments are removed by a pass that leaves strings alone.
+        optimize (bool): whether to fold constant conditions and remove
+            code that can never run (default False), e.g. the Python-only
+            branch of ``if this_is_js()``. See the ``optimizer`` module.
     """
 
     pass
@@ -12,7 +12,10 @@ from __future__ import print_function, absolute_import
 import sys
 import ast
 import json
+import array
 import base64
+import marshal
+from collections import deque
 
 if hasattr(base64, "encodebytes"):
     encodebytes = base64.encodebytes
@@ -85,34 +88,39 @@ class Node(object):
         NotIn = "NotIn"
 
     def __init__(self, *args):
+        # Note that the node classes in this module get a faster __init__
         names = self.__slots__
-        # Checks
         assert len(args) == len(names)  # check this always
         if docheck:
-            assert not hasattr(self, "__dict__"), "Nodes must have __slots__"
-            assert self.__class__ is not Node, "Node is an abstract class"
-            for name, val in zip(names, args):
-                assert not isinstance(val, ast.AST)
-                if name == "name":
-                    assert isinstance(val, (str, NoneType)), "name not a string"
-                elif name == "op":
-                    assert val in Node.OPS.__dict__ or val in Node.COMP.__dict__
-                elif name.endswith("_node"):
-                    assert isinstance(val, (Node, NoneType)), "%r is not a Node" % name
-                elif name.endswith("_nodes"):
-                    islistofnodes = isinstance(val, list) and all(
-                        isinstance(n, Node) for n in val
-                    )
-                    assert islistofnodes, "%r is not a list of nodes" % name
-                else:
-                    assert not isinstance(val, Node), "%r should not be a Node" % name
-                    assert not (
-                        isinstance(val, list) and all(isinstance(n, Node) for n in val)
-                    )
+            self._check(args)
         # Assign
         for name, val in zip(names, args):
             setattr(self, name, val)
 
+    def _check(self, args):
+        """Check the values for the slots of this node."""
+        names = self.__slots__
+        assert not hasattr(self, "__dict__"), "Nodes must have __slots__"
+        assert self.__class__ is not Node, "Node is an abstract class"
+        for name, val in zip(names, args):
+            assert not isinstance(val, ast.AST)
+            if name == "name":
+                assert isinstance(val, (str, NoneType)), "name not a string"
+            elif name == "op":
+                assert val in Node.OPS.__dict__ or val in Node.COMP.__dict__
+            elif name.endswith("_node"):
+                assert isinstance(val, (Node, NoneType)), "%r is not a Node" % name
+            elif name.endswith("_nodes"):
+                islistofnodes = isinstance(val, list) and all(
+                    isinstance(n, Node) for n in val
+                )
+                assert islistofnodes, "%r is not a list of nodes" % name
+            else:
+                assert not isinstance(val, Node), "%r should not be a Node" % name
+                assert not (
+                    isinstance(val, list) and all(isinstance(n, Node) for n in val)
+                )
+
     def tojson(self, indent=2):
         """Return a string with the JSON representatiom of this AST.
         Set indent to None for a more compact representation.
@@ -124,6 +132,87 @@ class Node(object):
         """Classmethod to create an AST tree from JSON."""
         return Node._fromdict(json.loads(text))
 
+    def tobytes(self, positions=True):
+        """Return a compact binary representation of this AST, e.g. to
+        cache it or send it to another process. This is much faster
+        than JSON. If positions is False, lineno and col_offset are
+        not included.
+        """
+        type_names = {}  # name -> id
+        strings = {}  # to intern strings, so marshal stores each once
+        data = []
+        pos = array.array("i")
+
+        def encode(node):
+            cls = node.__class__
+            type_id = type_names.get(cls.__name__)
+            if type_id is None:
+                type_id = type_names[cls.__name__] = len(type_names)
+            data.append(type_id)
+            if positions:
+                pos.append(getattr(node, "lineno", -1))
+                pos.append(getattr(node, "col_offset", -1))
+            for name, kind in _get_slots(cls):
+                val = getattr(node, name)
+                if kind == 1:  # node
+                    if val is None:
+                        data.append(None)
+                    else:
+                        encode(val)
+                elif kind == 2:  # list of nodes
+                    data.append(len(val))
+                    for sub_node in val:
+                        encode(sub_node)
+                elif isinstance(val, str):
+                    data.append(strings.setdefault(val, val))
+                else:
+                    data.append(val)
+
+        encode(self)
+        pos = pos.tobytes() if positions else None
+        return marshal.dumps((_BYTES_MAGIC, tuple(type_names), data, pos))
+
+    @classmethod
+    def frombytes(cls, data):
+        """Classmethod to create an AST tree from the result of tobytes()."""
+        try:
+            magic, type_names, data, pos = marshal.loads(data)
+            assert magic == _BYTES_MAGIC
+        except Exception:
+            raise ValueError("Invalid commonast bytes.") from None
+        classes = [_NODE_CLASSES[name] for name in type_names]
+        next_val = iter(data).__next__
+        if pos is not None:
+            positions = array.array("i")
+            positions.frombytes(pos)
+            next_pos = iter(positions).__next__
+
+        def decode(type_id):
+            Cls = classes[type_id]
+            lineno = col_offset = -1
+            if pos is not None:
+                lineno, col_offset = next_pos(), next_pos()
+            args = []
+            for _, kind in _get_slots(Cls):
+                val = next_val()
+                if kind == 1 and val is not None:
+                    val = decode(val)
+                elif kind == 2:
+                    val = [decode(next_val()) for i in range(val)]
+                args.append(val)
+            node = Cls(*args)
+            if lineno >= 0:
+                node.lineno = lineno
+            if col_offset >= 0:
+                node.col_offset = col_offset
+            return node
+
+        return decode(next_val())
+
+    def __reduce__(self):
+        # Pickle a tree as a single blob, which is faster and more compact
+        return _frombytes, (self.tobytes(),)
+
     @classmethod
     def _fromdict(cls, d):
         assert "_type" in d
@@ -170,7 +259,28 @@ class Node(object):
     def __eq__(self, other):
         if not isinstance(other, Node):
             raise ValueError("Can only compare nodes to other nodes.")
-        return self._todict() == other._todict()
+        # Compare structurally, without recursion and without creating dicts
+        pairs = [(self, other)]
+        while pairs:
+            node1, node2 = pairs.pop()
+            cls = node1.__class__
+            if node2.__class__ is not cls:
+                return False
+            for name, kind in _get_slots(cls):
+                val1, val2 = getattr(node1, name), getattr(node2, name)
+                if kind == 0:
+                    if val1 != val2:
+                        return False
+                elif val1 is None or val2 is None:
+                    if val1 is not val2:
+                        return False
+                elif kind == 1:
+                    pairs.append((val1, val2))
+                elif len(val1) != len(val2):
+                    return False
+                else:
+                    pairs.extend(zip(val1, val2))  # noqa: B905 - same length
+        return True
 
     def __repr__(self):
         names = ", ".join([repr(x) for x in self.__slots__])
@@ -888,13 +998,61 @@ class ClassDef(Node):
 ## -- (end marker for doc generator)
 
 
+# For tobytes(), frombytes() and __eq__: the node classes by name, and the
+# (name, kind) of each slot, with kind 0 for a value, 1 for a node, and 2
+# for a list of nodes.
+_BYTES_MAGIC = "commonast1"
+_NODE_CLASSES = {}
+_SLOTS = {}
+
+
+def _get_slots(cls):
+    try:
+        return _SLOTS[cls]
+    except KeyError:
+        slots = tuple(
+            (name, 2 if name.endswith("_nodes") else 1 if name.endswith("_node") else 0)
+            for name in cls.__slots__
+        )
+        _SLOTS[cls] = slots
+        return slots
+
+
+def _make_init(cls):
+    """Generate an __init__ for a node class that assigns each slot
+    directly. This makes creating nodes about twice as fast.
+    """
+    names = cls.__slots__
+    lines = ["def __init__(self%s):" % "".join(", " + name for name in names)]
+    lines.append("    if docheck:")
+    lines.append("        self._check((%s))" % "".join(name + ", " for name in names))
+    lines.extend("    self.%s = %s" % (name, name) for name in names)
+    namespace = {}
+    exec("\n".join(lines), globals(), namespace)
+    init = namespace["__init__"]
+    init.__doc__ = Node.__init__.__doc__
+    return init
+
+
+for _cls in list(globals().values()):
+    if isinstance(_cls, type) and issubclass(_cls, Node) and _cls is not Node:
+        _NODE_CLASSES[_cls.__name__] = _cls
+        _cls.__init__ = _make_init(_cls)
+del _cls
+
+
+def _frombytes(data):
+    return Node.frombytes(data)
+
+
 class NativeAstConverter:
     """Convert ast produced by Python's ast module to common ast."""
 
     def __init__(self, code):
         self._root = ast.parse(code)
         self._lines = code.splitlines()
-        self._stack = []  # contains tuple elements: (list_obj, native_nodes)
+        self._stack = deque()  # contains tuple elements: (list_obj, native_nodes)
+        self._converters = {}  # native node class -> converter method
 
     def _add_comments(self, container, lineno):
         """Add comment nodes from the last point until the given line number."""
@@ -918,7 +1076,7 @@ class NativeAstConverter:
         result = self._convert(self._root)
 
         while self._stack:
-            container, native_nodes = self._stack.pop(0)
+            container, native_nodes = self._stack.popleft()
             for native_node in native_nodes:
                 node = self._convert(native_node)
                 if comments:
@@ -931,22 +1089,29 @@ class NativeAstConverter:
         # n is the native node produced by the ast module
         if n is None:
             return None  # but some node attributes can be None
-        assert isinstance(n, ast.AST)
 
         # Get converter function
-        type = n.__class__.__name__
         try:
-            converter = getattr(self, "_convert_" + type)
-        except AttributeError:  # pragma: no cover
-            raise RuntimeError("Cannot convert %s nodes." % type) from None
+            converter = self._converters[n.__class__]
+        except KeyError:
+            converter = self._get_converter(n)
         # Convert node
         val = converter(n)
-        assert isinstance(val, Node)
         # Set its position
         val.lineno = getattr(n, "lineno", 1)
         val.col_offset = getattr(n, "col_offset", 0)
         return val
 
+    def _get_converter(self, n):
+        assert isinstance(n, ast.AST)
+        type = n.__class__.__name__
+        try:
+            converter = getattr(self, "_convert_" + type)
+        except AttributeError:  # pragma: no cover
+            raise RuntimeError("Cannot convert %s nodes." % type) from None
+        self._converters[n.__class__] = converter
+        return converter
+
     def _convert_Module(self, n):
         node = Module([])
         # Add back the "docstring" that Python removed; this may actually be
@@ -1031,15 +1196,12 @@ class NativeAstConverter:
         return Subscript(self._convert(n.value), self._convert_index_like(n.slice))
 
     def _convert_index_like(self, n):
-        c = self._convert
-        if isinstance(n, (ast.Slice, ast.Index, ast.ExtSlice, ast.Ellipsis)):
-            return c(n)  # Python < 3.8 (and also 3.8 on Windows?)
-        elif isinstance(n, ast.Tuple):
-            assert isinstance(n, ast.Tuple)
+        # Note: Slice, Index, ExtSlice (Python < 3.9) have their own converter
+        if n.__class__ is ast.Tuple:
             dims = [self._convert_index_like(x) for x in n.elts]
             return Tuple(dims)
-        else:  # Num, Unary, Name, or ...
-            return c(n)
+        else:  # Num, Unary, Name, Slice, or ...
+            return self._convert(n)
 
     def _convert_Index(self, n):
         return self._convert(n.value)
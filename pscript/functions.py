@@ -5,9 +5,11 @@ import inspect
 import hashlib
 import tempfile
 import subprocess
+from time import perf_counter
 
-from . import Parser
-from .stdlib import get_full_std_lib  # noqa
+from . import Parser, commonast
+from .stdlib import get_full_std_lib, get_std_import  # noqa
+from .stdlib import minify_js, get_short_names
 from .modules import create_js_module
 
 
@@ -17,12 +19,75 @@ class JSString(str):
     pass
 
 
+_stats_collectors = []
+
+
+class StatsCollector:
+    """Collect the stats of all calls to py2js(), to find the components
+    that dominate the transpile time and the size of the generated code.
+    Use as a context manager:
+
+    .. code-block:: py
+
+        with StatsCollector() as collector:
+            ...  # code that calls py2js()
+        print(collector.report())
+
+    Attributes:
+        entries (list): (name, stats) tuples, one for each call.
+        totals (dict): the stats summed over all calls.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.totals = {}
+
+    def __enter__(self):
+        _stats_collectors.append(self)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        _stats_collectors.remove(self)
+
+    def add(self, name, stats):
+        """Add the stats of one call."""
+        self.entries.append((name, stats))
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                total = self.totals.setdefault(key, {})
+                for subkey, subvalue in value.items():
+                    total[subkey] = total.get(subkey, 0) + subvalue
+            else:
+                self.totals[key] = self.totals.get(key, 0) + value
+
+    def report(self, n=10, sort_by="time_total"):
+        """Get a string with the totals and the n most expensive calls,
+        sorted by the given stats field.
+        """
+        lines = ["py2js() was called %i times" % len(self.entries)]
+        for key in sorted(self.totals):
+            value = self.totals[key]
+            if key.startswith("time_"):
+                lines.append("  %-20s %10.1f ms" % (key, value * 1000))
+            elif key.startswith("bytes_"):
+                lines.append("  %-20s %10i" % (key, value))
+            else:
+                lines.append("  %-20s %10i" % (key, sum(value.values())))
+        entries = sorted(self.entries, key=lambda e: e[1][sort_by], reverse=True)
+        lines.append("Top %i by %s:" % (n, sort_by))
+        scale = 1000 if sort_by.startswith("time_") else 1  # show ms
+        for name, stats in entries[:n]:
+            lines.append("  %-40s %12.1f" % (name, stats[sort_by] * scale))
+        return "\n".join(lines)
+
+
 def py2js(ob=None, new_name=None, **parser_options):
     """Convert Python to JavaScript.
 
     Parameters:
-        ob (str, module, function, class): The code, function or class
-            to transpile.
+        ob (str, module, function, class, Node): The code, function or class
+            to transpile, or a tree produced by ``commonast.parse()``, which
+            is not modified.
         new_name (str, optional): If given, renames the function or class. This
             can be used to simply change the name and/or add a prefix. It can
             also be used to turn functions into methods using
@@ -37,7 +102,7 @@ def py2js(ob=None, new_name=None, **parser_options):
 
         * filename (str): the name of the file that defines the object.
         * linenr (int): the starting linenr for the object definition.
-        * pycode (str): the Python code used to generate the JS.
+        * pycode (str): the Python code (or tree) used to generate the JS.
         * pyhash (str): a hash of the Python code.
         * vars_defined (set): names defined in the toplevel namespace.
         * vars_unknown (set): names used in the code but not defined in it.
@@ -45,6 +110,17 @@ def py2js(ob=None, new_name=None, **parser_options):
         * vars_global (set): names explicitly declared global.
         * std_functions (set): stdlib functions used in this code.
         * std_method (set): stdlib methods used in this code.
+        * minify (bool): whether the code is minified, in which case it uses
+          the short names of the stdlib functions and methods.
+        * stats (dict): the wall time (in seconds) of each phase (time_extract,
+          time_convert, time_parse, time_stdlib, time_dump, time_rename
+          and time_total),
+          the size of the output in bytes (bytes_total, bytes_user and
+          bytes_stdlib), and overload_helpers, which maps the name of each
+          helper for overloaded operators (e.g. op_add) to the number
+          of times that it is called in the code.
+          See :class:`StatsCollector <pscript.StatsCollector>` to aggregate
+          these over multiple calls.
 
     Notes:
         The Python source code for a class is acquired by name.
@@ -56,11 +132,17 @@ def py2js(ob=None, new_name=None, **parser_options):
     """
 
     def py2js_(ob):
+        t0 = perf_counter()
         if isinstance(ob, str):
             thetype = "str"
             pycode = ob
             filename = None
             linenr = 0
+        elif isinstance(ob, commonast.Node):
+            thetype = "str"
+            pycode = ob
+            filename = None
+            linenr = 0
         elif isinstance(ob, types.ModuleType) and hasattr(ob, "__file__"):
             thetype = "str"
             filename = inspect.getsourcefile(ob)
@@ -105,19 +187,26 @@ def py2js(ob=None, new_name=None, **parser_options):
 
         # Get hash, in case we ever want to cache JS accross sessions
         h = hashlib.sha256("pscript version 1".encode())
-        h.update(pycode.encode())
+        if isinstance(pycode, commonast.Node):
+            h.update(pycode.tobytes(False))
+        else:
+            h.update(pycode.encode())
         hash = h.digest()
 
         # Get JS code
+        t1 = perf_counter()
         if filename:
             p = Parser(pycode, (filename, linenr), **parser_options)
         else:
             p = Parser(pycode, **parser_options)
+        t2 = perf_counter()
         jscode = p.dump()
+        t3 = perf_counter()
         if new_name:
             if thetype not in ("class", "def"):
                 raise TypeError("py2js() can only rename functions and classes.")
             jscode = js_rename(jscode, ob.__name__, new_name, thetype)
+        t4 = perf_counter()
 
         # Collect undefined variables
         # vars_unknown = [name for name, s in p.vars.get_undefined()]
@@ -141,6 +230,21 @@ def py2js(ob=None, new_name=None, **parser_options):
         jscode.meta["vars_defined"] = p.vars.get_defined()
         jscode.meta["vars_global"] = p.vars.get_globals()
         jscode.meta["vars_unknown"] = vars_unknown
+        jscode.meta["minify"] = p._minify
+
+        # Stats
+        stats = dict(p._stats)
+        stats["time_extract"] = t1 - t0
+        stats["time_dump"] = t3 - t2
+        stats["time_rename"] = t4 - t3
+        stats["time_total"] = perf_counter() - t0
+        stats["bytes_total"] = len(jscode.encode())
+        stats["bytes_user"] = stats["bytes_total"] - stats["bytes_stdlib"]
+        jscode.meta["stats"] = stats
+        if _stats_collectors:
+            name = getattr(ob, "__qualname__", None) or filename or "<string>"
+            for collector in _stats_collectors:
+                collector.add(name, stats)
         return jscode
 
     if ob is None:
@@ -192,9 +296,11 @@ def js_rename(jscode, cur_name, new_name, type=None):
     new_name_short = new_name.split(".")[-1]
     if isclass:
         # If this is about a class ...
-        jscode = jscode.replace(
-            '.__name__ = "%s"' % cur_name_short, '.__name__ = "%s"' % new_name_short
-        )
+        for eq in (" = ", "="):  # also support minified code
+            jscode = jscode.replace(
+                '.__name__%s"%s"' % (eq, cur_name_short),
+                '.__name__%s"%s"' % (eq, new_name_short),
+            )
         jscode = jscode.replace("._%s__" % cur_name_short, "._%s__" % new_name_short)
         jscode = jscode.replace("%s.prototype" % cur_name, "%s.prototype" % new_name)
     else:
@@ -207,6 +313,13 @@ def js_rename(jscode, cur_name, new_name, type=None):
             # jscode = jscode.replace('this.__', 'this._%s__' % new_cls_name)
 
     # Always do this
+    if "%s = " % cur_name not in jscode:
+        # Minified code, where the name can also be part of another name
+        name = r"(?<![\w$])" + re.escape(cur_name)
+        for func in ("=function", "=async function"):
+            jscode = re.sub(name + func, new_name + func, jscode, count=1)
+        var = "" if "." in new_name else "var %s;" % new_name
+        return re.sub(r"\bvar " + re.escape(cur_name) + ";", var, jscode, count=1)
     jscode = jscode.replace("%s = function" % cur_name, "%s = function" % new_name, 1)
     jscode = jscode.replace(
         "%s = async function" % cur_name, "%s = async function" % new_name, 1
@@ -330,7 +443,12 @@ def evalpy(pycode, whitespace=True):
 
 
 def script2js(
-    filename, namespace=None, target=None, module_type="umd", **parser_options
+    filename,
+    namespace=None,
+    target=None,
+    module_type="umd",
+    std_module=None,
+    **parser_options,
 ):
     """Export a .py file to a .js file.
 
@@ -338,29 +456,52 @@ def script2js(
       filename (str): the filename of the .py file to transpile.
       namespace (str): the namespace for this module. (optional)
       target (str): the filename of the resulting .js file. If not given
-        or None, will use the ``filename``, but with a ``.js`` extension.
+        or None, will use the ``filename``, but with a ``.js`` extension
+        (``.mjs`` for ES modules).
       module_type (str): the type of module to produce (if namespace is given),
-        can be 'hidden', 'simple', 'amd', 'umd', default 'umd'.
+        can be 'hidden', 'simple', 'amd', 'umd', 'esm', default 'umd'.
+        ES modules are always produced, also if namespace is not given.
+      std_module (str): for ES modules, the path of a shared ES module
+        that exports the stdlib. The used stdlib functions are then
+        imported from that module instead of inlined. (optional)
+        When using the ``minify`` parser option, the shared module must
+        be minified as well, see ``write_std_lib()``.
       parser_options: additional options for the parser. See Parser class
         for details.
     """
+    is_esm = isinstance(module_type, str) and module_type.lower() == "esm"
+    if std_module is not None:
+        if not is_esm:
+            raise ValueError("script2js() std_module needs module_type 'esm'.")
+        parser_options["inline_stdlib"] = False
     # Import
     assert filename.endswith(".py")
     pycode = open(filename, "rb").read().decode()
     # Convert
     parser = Parser(pycode, filename, **parser_options)
-    jscode = "/* Do not edit, autogenerated by pscript */\n\n" + parser.dump()
-    # Wrap in module
-    if namespace:
-        exports = [
-            name for name in parser.vars.get_defined() if not name.startswith("_")
-        ]
-        jscode = create_js_module(namespace, jscode, [], exports, module_type)
+    header = "/* Do not edit, autogenerated by pscript */\n\n"
     # Export
     if target is None:
         dirname, fname = os.path.split(filename)
-        filename2 = os.path.join(dirname, fname[:-3] + ".js")
+        filename2 = os.path.join(dirname, fname[:-3] + (".mjs" if is_esm else ".js"))
     else:
         filename2 = target
-    with open(filename2, "wb") as f:
-        f.write(jscode.encode())
+    with open(filename2, "w", encoding="utf-8", newline="") as f:
+        if namespace or is_esm:
+            # Wrap in module
+            exports = [
+                name for name in parser.vars.get_defined() if not name.startswith("_")
+            ]
+            if std_module is not None:
+                header += get_std_import(
+                    parser._std_functions, parser._std_methods, std_module
+                )
+            jscode = header + parser.dump()
+            name = namespace or os.path.basename(filename)[:-3]
+            jscode = create_js_module(name, jscode, [], exports, module_type)
+            if parser_options.get("minify", False):
+                jscode = minify_js(jscode, get_short_names())
+            f.write(jscode)
+        else:
+            f.write(header)
+            parser.dump_to(f)
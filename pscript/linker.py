@@ -0,0 +1,185 @@
+"""
+Functionality for linking multiple pieces of transpiled code into a single
+bundle, with one shared copy of the stdlib.
+"""
+
+import types
+
+from . import stdlib, commonast, optimizer
+from .functions import py2js, JSString
+from .modules import create_js_module
+
+
+def _split_stdlib(jscode):
+    """Get the JS code without the inlined stdlib, and the size in bytes
+    of the stdlib that would be inlined for this code.
+    """
+    meta = jscode.meta
+    libcode = stdlib.get_partial_std_lib(meta["std_functions"], meta["std_methods"])
+    if libcode and jscode.startswith(libcode):
+        jscode = jscode[len(libcode) :].lstrip("\n")
+    elif libcode and libcode.splitlines()[0] in jscode:
+        raise ValueError("link() cannot strip the stdlib from indented code.")
+    elif libcode:
+        # Maybe the code is minified
+        libcode_min = stdlib.get_partial_std_lib(
+            meta["std_functions"], meta["std_methods"], minify=True
+        )
+        if jscode.startswith(libcode_min):
+            jscode = jscode[len(libcode_min) :].lstrip("\n")
+            libcode = libcode_min
+    return str(jscode), len(libcode.encode())
+
+
+def _get_exports(jscode):
+    """Get the public names defined in the given code."""
+    return sorted(
+        name for name in jscode.meta["vars_defined"] if not name.startswith("_")
+    )
+
+
+def _sort_modules(items):
+    """Sort the items topologically, so that each module comes after the
+    modules that it imports. Otherwise the original order is maintained.
+    """
+    names = {}
+    for i, item in enumerate(items):
+        if item[0] in names:
+            raise ValueError("link() got multiple modules named %r." % item[0])
+        elif item[0] is not None:
+            names[item[0]] = i
+    # Dependencies within this bundle, per item
+    deps = []
+    for item in items:
+        dep_names = [imp.split(" as ", 1)[0] for imp in item[2]]
+        deps.append(set(names[dep] for dep in dep_names if dep in names))
+    # Pick the first item for which all deps are done
+    order, done = [], set()
+    while len(order) < len(items):
+        for i in range(len(items)):
+            if i not in done and deps[i].issubset(done):
+                order.append(i)
+                done.add(i)
+                break
+        else:
+            remaining = [items[i][0] for i in range(len(items)) if i not in done]
+            raise ValueError("link() found circular imports between %s." % remaining)
+    return [items[i] for i in order]
+
+
+def link(modules, module_type="umd", minify=False, optimize=False):
+    """Link multiple pieces of transpiled code into a single bundle, with
+    one shared copy of the stdlib instead of one copy per piece.
+
+    Parameters:
+        modules (list): the pieces of code to link. Each element is either
+            a JSString produced by ``py2js()``, which is included as-is,
+            or a tuple (name, code, imports, exports) that is wrapped in a
+            module using ``create_js_module()``. The code can be a JSString,
+            or Python code (a str, module, function or class) which is then
+            transpiled. If exports is None, all names defined in the code
+            that do not start with an underscore are exported.
+        module_type (str): the type of module to wrap the code in. See
+            ``create_js_module()``. Default 'umd'. The 'esm' type is not
+            supported, because ES modules cannot share a file.
+        minify (bool): whether to minify the bundle, see the ``minify``
+            option of the parser. Pieces that are already minified can
+            only be linked with minify set to True, otherwise a ValueError
+            is raised. Default False.
+        optimize (bool): whether to optimize the Python code that is
+            transpiled here, see the ``optimize`` option of the parser.
+            For modules given as Python source with explicit exports,
+            module-level functions that are not used are removed as well.
+            Default False.
+
+    Returns:
+        str: the JavaScript code as a str object that has a ``meta`` attribute.
+        This has fields std_functions, std_methods, and order (the names of
+        the modules in the order that they are defined, None for code that
+        is not wrapped). The stats field has bytes_total, bytes_stdlib,
+        and bytes_saved, the number of bytes saved compared to inlining
+        the stdlib in each piece.
+
+    Modules are sorted so that each module comes after the modules that
+    it imports, so that the bundle also works when modules are resolved
+    as globals (e.g. for the 'simple' and 'umd' types).
+    """
+    if isinstance(module_type, str) and module_type.lower() == "esm":
+        raise ValueError("link() cannot bundle ES modules in a single file.")
+
+    # Normalize input
+    items = []
+    for module in modules:
+        if isinstance(module, tuple):
+            if len(module) != 4:
+                raise ValueError("link() module specs must be 4-element tuples.")
+            name, code, imports, exports = module
+            if not isinstance(code, JSString):
+                if not isinstance(
+                    code, (str, types.ModuleType, type, types.FunctionType)
+                ):
+                    raise ValueError("link() got invalid code for module %r." % name)
+                optimize_code = optimize
+                if optimize and isinstance(code, str) and exports is not None:
+                    code = optimizer.optimize(commonast.parse(code), exports)
+                    optimize_code = False  # already done
+                code = py2js(
+                    code, inline_stdlib=False, minify=minify, optimize=optimize_code
+                )
+            if exports is None:
+                exports = _get_exports(code)
+            items.append((name, code, list(imports), exports))
+        elif isinstance(module, JSString):
+            items.append((None, module, [], None))
+        else:
+            raise ValueError(
+                "link() needs JSString objects or (name, code, ...) tuples."
+            )
+
+    # Minified pieces use the short stdlib names, so the stdlib must match
+    if not minify:
+        for item in items:
+            if item[1].meta.get("minify", False):
+                raise ValueError("link() needs minify=True for minified code.")
+
+    # Collect the stdlib that is needed
+    std_functions, std_methods = set(), set()
+    for item in items:
+        std_functions.update(item[1].meta["std_functions"])
+        std_methods.update(item[1].meta["std_methods"])
+    for name in list(std_functions):
+        _, function_deps, method_deps = stdlib.get_std_info(stdlib.FUNCTIONS[name])
+        std_functions.update(function_deps)
+        std_methods.update(method_deps)
+    for name in list(std_methods):
+        _, function_deps, method_deps = stdlib.get_std_info(stdlib.METHODS[name])
+        std_functions.update(function_deps)
+        std_methods.update(method_deps)
+    libcode = stdlib.get_partial_std_lib(std_functions, std_methods, minify=minify)
+
+    # Compose
+    parts = [libcode] if libcode else []
+    bytes_inlined = 0  # size of the stdlib if each piece inlines it
+    order = []
+    for name, code, imports, exports in _sort_modules(items):
+        usercode, inlined = _split_stdlib(code)
+        bytes_inlined += inlined
+        if name is not None:
+            usercode = create_js_module(name, usercode, imports, exports, module_type)
+        if minify:
+            usercode = stdlib.minify_js(usercode, stdlib.get_short_names())
+        parts.append(usercode.strip())
+        order.append(name)
+
+    jscode = JSString(("\n" if minify else "\n\n").join(parts) + "\n")
+    jscode.meta = {
+        "std_functions": std_functions,
+        "std_methods": std_methods,
+        "order": order,
+        "stats": {
+            "bytes_total": len(jscode.encode()),
+            "bytes_stdlib": len(libcode.encode()),
+            "bytes_saved": bytes_inlined - len(libcode.encode()),
+        },
+    }
+    return jscode
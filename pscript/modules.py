@@ -1,5 +1,6 @@
 """
-Functionality for creating JS modules of various formats, including AMD and UMD.
+Functionality for creating JS modules of various formats, including AMD,
+UMD and ES modules.
 """
 
 import re
@@ -72,6 +73,14 @@ return {exports};
 """.lstrip()
 
 
+# ES module, which can be analyzed statically (and is always strict)
+ESM = """
+{dep_imports}{code}
+
+export {exports};
+""".lstrip()
+
+
 def isidentifier(s):
     # http://stackoverflow.com/questions/2544972/
     if not isinstance(s, str):
@@ -95,8 +104,12 @@ def create_js_module(name, code, imports, exports, type="umd"):
             get when they import this module. Can be a JS expression or a list
             of names to export.
         type (str): the type of module to export, valid values are
-            'hidden', 'simple' (save module on root), 'amd' , 'amd-flexx' and
-            'umd' (case insensitive). Default 'umd'.
+            'hidden', 'simple' (save module on root), 'amd' , 'amd-flexx',
+            'umd' and 'esm' (case insensitive). Default 'umd'.
+
+    For the 'esm' type, each dependency is imported as a namespace
+    (e.g. ``import * as foo from "foo.js"``), and a list of exports
+    becomes named exports. A string export becomes the default export.
     """
 
     # Check input args
@@ -140,18 +153,29 @@ def create_js_module(name, code, imports, exports, type="umd"):
         "amd": AMD,
         "umd": UMD,
         "amd-flexx": AMD_FLEXX,
+        "esm": ESM,
     }
     if not isinstance(type, str):
         raise ValueError("create_js_module() type must be str.")
     if type.lower() not in types:
         raise ValueError("create_js_module() got invalid type %r" % type)
     template = types[type.lower()]
+    if type.lower() == "esm":
+        if isinstance(exports, str):
+            return_val = "default " + exports
+        else:
+            return_val = "{" + ", ".join(exports) + "}"
 
     # Derived information needed to populate the module templates
     save_name = lambda n: n.split("/")[-1].split(".")[0].replace("-", "_")
     dep_strings = ['"%s"' % dep for dep in deps]
     dep_fullnames = ["root." + save_name(dep) for dep in deps]
     dep_requires = ['require("%s")' % dep for dep in deps]
+    dep_imports = "".join(
+        'import * as %s from "%s";\n' % (dep_names[i], dep)
+        for i, dep in enumerate(deps)
+    )
+    dep_imports += "\n" if dep_imports else ""
 
     # Fill in the template
     for key, val in [
@@ -162,6 +186,7 @@ def create_js_module(name, code, imports, exports, type="umd"):
         ("{dep_strings}", ", ".join(dep_strings)),
         ("{dep_fullnames}", ", ".join(dep_fullnames)),
         ("{dep_requires}", ", ".join(dep_requires)),
+        ("{dep_imports}", dep_imports),
         ("{code}", code),  # last!
     ]:
         template = template.replace(key, val)
@@ -0,0 +1,468 @@
+"""
+Optimizations on the commonast tree, applied before it is transpiled.
+
+The optimizer folds constant conditions and removes code that can
+never run:
+
+* ``this_is_js()`` is ``True``, so that the Python-only branches of
+  hybrid code are not included in the JavaScript.
+* ``not``, ``and``, ``or`` and comparisons of literals are folded.
+* Arithmetic on numbers and strings is folded, e.g. ``2 * PI * 1000``,
+  ``"prefix-" + "name"`` and ``1 << 20``, with the semantics of Python
+  (e.g. for ``//`` and ``%`` with negative numbers). Module-level
+  constants, i.e. ``UPPER_CASE`` names that are assigned a literal
+  exactly once, are substituted where they are used.
+* The branches of ``if`` statements and expressions, and ``while`` loops
+  with a constant condition, are selected at compile time.
+* Statements after ``return``, ``raise``, ``break`` and ``continue`` are
+  dropped.
+* When the exports of a module are known (e.g. when linking a bundle),
+  module-level functions that are not exported, nor referenced by
+  the rest of the module, are dropped.
+
+The optimizer is used via the ``optimize`` option of the parser, and
+by ``link()``.
+"""
+
+import re
+import math
+import operator
+
+from . import commonast as ast
+
+
+re_identifier = re.compile(r"[A-Za-z_$][\w$]*")
+re_constant_name = re.compile(r"^_*[A-Z][A-Z0-9_]*$")
+
+TERMINATORS = ast.Return, ast.Raise, ast.Break, ast.Continue
+FUNCTION_DEFS = ast.FunctionDef, ast.AsyncFunctionDef
+TARGET_SLOTS = "target_node", "target_nodes", "as_node"
+
+MAX_SAFE_INTEGER = 2**53  # larger ints cannot be represented exactly in JS
+MAX_STRING_SIZE = 200  # don't create (or duplicate) larger strings
+
+UNARY_OPS = {
+    "UAdd": operator.pos,
+    "USub": operator.neg,
+    "Invert": operator.invert,
+}
+
+BINARY_OPS = {
+    "Add": operator.add,
+    "Sub": operator.sub,
+    "Mult": operator.mul,
+    "Div": operator.truediv,
+    "FloorDiv": operator.floordiv,
+    "Mod": operator.mod,
+    "Pow": operator.pow,
+    "LShift": operator.lshift,
+    "RShift": operator.rshift,
+    "BitOr": operator.or_,
+    "BitXor": operator.xor,
+    "BitAnd": operator.and_,
+}
+
+# In JS, these operate on 32 bit ints, so only fold if Python does the same
+INT32_OPS = "Invert", "LShift", "RShift", "BitOr", "BitXor", "BitAnd"
+
+COMPARISONS = {
+    "Eq": lambda a, b: a == b,
+    "NotEq": lambda a, b: a != b,
+    "Lt": lambda a, b: a < b,
+    "LtE": lambda a, b: a <= b,
+    "Gt": lambda a, b: a > b,
+    "GtE": lambda a, b: a >= b,
+    "In": lambda a, b: a in b,
+    "NotIn": lambda a, b: a not in b,
+}
+
+
+def optimize(root, exports=None):
+    """Optimize the given commonast tree in-place, and return it.
+
+    Parameters:
+        root (Node): the tree to optimize, e.g. from ``commonast.parse()``.
+        exports (list, str, optional): the names that the module exports,
+            or a JS expression for the exports. If given, module-level
+            functions that are not used are removed.
+    """
+    optimizer = Optimizer()
+    if isinstance(root, ast.Module):
+        optimizer.collect_constants(root)
+    optimizer.optimize(root)
+    if exports is not None and isinstance(root, ast.Module):
+        if isinstance(exports, str):
+            exports = re_identifier.findall(exports)
+        remove_unused_functions(root, exports)
+    return root
+
+
+def _get_constant(node):
+    """Get (True, value) if the node is a literal, else (False, None)."""
+    if isinstance(node, (ast.Num, ast.Str, ast.NameConstant)):
+        return True, node.value
+    return False, None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_same_kind(value1, value2):
+    """Get whether two constants are of the same kind, so that comparing
+    them for equality gives the same result in Python and JS. E.g. in JS
+    1 == "1" and true == 1.
+    """
+    if _is_number(value1) or _is_number(value2):
+        return _is_number(value1) and _is_number(value2)
+    return type(value1) is type(value2)
+
+
+def _is_int32(value):
+    return isinstance(value, int) and -(2**31) <= value < 2**31
+
+
+def _is_foldable(value):
+    """Get whether a folded value can be represented as a JS literal."""
+    if isinstance(value, bool):
+        return False  # e.g. True & False, which is a number in JS
+    elif isinstance(value, int):
+        return abs(value) <= MAX_SAFE_INTEGER
+    elif isinstance(value, float):
+        return math.isfinite(value)
+    elif isinstance(value, str):
+        return len(value) <= MAX_STRING_SIZE
+    return False
+
+
+def _fold_binary(op, value1, value2):
+    """Apply a binary operator to two literal values. Raises ValueError
+    if the result cannot be (or should not be) folded.
+    """
+    if _is_number(value1) and _is_number(value2):
+        if op in INT32_OPS:
+            if not (_is_int32(value1) and _is_int32(value2)):
+                raise ValueError("Not a 32 bit int")
+            elif op in ("LShift", "RShift") and not 0 <= value2 < 32:
+                raise ValueError("Invalid shift")
+        elif op == "Mod" and (value1 < 0 or value2 < 0):
+            raise ValueError("Python and JS differ for negative operands")
+        elif op == "Pow" and abs(value1) > 1 and value2 > 0:
+            if value2 * math.log2(abs(value1)) > 64:
+                raise ValueError("Result too large")
+    elif op == "Add" and isinstance(value1, str) and isinstance(value2, str):
+        pass
+    elif op == "Mult" and isinstance(value1, str) and _is_number(value2):
+        if len(value1) * value2 > MAX_STRING_SIZE:
+            raise ValueError("String too large")
+    elif op == "Mult" and _is_number(value1) and isinstance(value2, str):
+        if value1 * len(value2) > MAX_STRING_SIZE:
+            raise ValueError("String too large")
+    else:
+        raise ValueError("Unsupported operands")
+    try:
+        value = BINARY_OPS[op](value1, value2)
+    except (ArithmeticError, TypeError):
+        raise ValueError("Operation fails") from None
+    if op in INT32_OPS and not _is_int32(value):
+        raise ValueError("Not a 32 bit int")
+    elif not _is_foldable(value):
+        raise ValueError("Cannot fold value")
+    return value
+
+
+def _iter_target_names(node):
+    """Yield the Name nodes in an assignment target."""
+    if isinstance(node, ast.Name):
+        yield node
+    elif isinstance(node, (ast.Tuple, ast.List)):
+        for sub_node in node.element_nodes:
+            yield from _iter_target_names(sub_node)
+    elif isinstance(node, ast.Starred):
+        yield from _iter_target_names(node.value_node)
+
+
+def count_bindings(root):
+    """Count how often each name is bound in the given tree, by assignment,
+    deletion, a definition, an import, or a global/nonlocal declaration.
+    """
+    counts = {}
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        cls = node.__class__
+        names = []
+        if isinstance(node, (ast.Arg, ast.ClassDef, ast.ExceptHandler) + FUNCTION_DEFS):
+            names.append(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.extend(node.names)
+        elif isinstance(node, ast.Import):
+            names.extend(alias or name.split(".")[0] for name, alias in node.names)
+        for name, kind in ast._get_slots(cls):
+            if kind == 1:
+                child = getattr(node, name)
+                if child is not None:
+                    nodes.append(child)
+                    if name in TARGET_SLOTS:
+                        names.extend(n.name for n in _iter_target_names(child))
+            elif kind == 2:
+                nodes.extend(getattr(node, name))
+                if name in TARGET_SLOTS:
+                    for child in getattr(node, name):
+                        names.extend(n.name for n in _iter_target_names(child))
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def _constant(value, node):
+    """Create a literal node, at the position of the given node."""
+    if isinstance(value, str):
+        new_node = ast.Str(value)
+    elif value is None or isinstance(value, bool):
+        new_node = ast.NameConstant(value)
+    else:
+        new_node = ast.Num(value)
+    new_node.lineno = getattr(node, "lineno", 0)
+    new_node.col_offset = getattr(node, "col_offset", 0)
+    return new_node
+
+
+class Optimizer:
+    """Transformer for a commonast tree. For each node type, a method
+    ``optimize_<NodeType>`` can be defined, which gets the node (of which
+    the children are already optimized) and returns the node to replace
+    it with. Methods for statements can also return a list of nodes.
+    """
+
+    def __init__(self):
+        self._constants = {}  # name -> literal node
+
+    def collect_constants(self, root):
+        """Collect the module-level constants, so that they are substituted
+        where they are used. These are ``UPPER_CASE`` names that are assigned
+        once, to a value that can be folded to a literal.
+        """
+        counts = count_bindings(root)
+        for node in root.body_nodes:
+            if not (
+                isinstance(node, ast.Assign)
+                and len(node.target_nodes) == 1
+                and isinstance(node.target_nodes[0], ast.Name)
+            ):
+                continue
+            name = node.target_nodes[0].name
+            if re_constant_name.match(name) and counts.get(name) == 1:
+                node.value_node = self.optimize(node.value_node)
+                if _get_constant(node.value_node)[0]:
+                    self._constants[name] = node.value_node
+
+    def optimize(self, node):
+        """Optimize a node and its children. Returns the new node, or
+        a list of nodes if a statement is replaced by multiple statements.
+        """
+        cls = node.__class__
+        for name, kind in ast._get_slots(cls):
+            if kind == 1:
+                child = getattr(node, name)
+                if child is None or (
+                    name in TARGET_SLOTS and child.__class__ is ast.Name
+                ):
+                    continue
+                setattr(node, name, self.optimize(child))
+            elif kind == 2:
+                nodes = getattr(node, name)
+                if name in TARGET_SLOTS:
+                    nodes = [
+                        n if n.__class__ is ast.Name else self.optimize(n)
+                        for n in nodes
+                    ]
+                    setattr(node, name, nodes)
+                else:
+                    setattr(node, name, self.optimize_list(nodes))
+        func = getattr(self, "optimize_" + cls.__name__, None)
+        return func(node) if func else node
+
+    def optimize_list(self, nodes):
+        """Optimize a list of nodes. Statements that replace a statement
+        by multiple statements are spliced into the list, and statements
+        after a return, raise, break or continue are dropped.
+        """
+        new_nodes = []
+        for node in nodes:
+            new_node = self.optimize(node)
+            if isinstance(new_node, list):
+                new_nodes.extend(new_node)
+            else:
+                new_nodes.append(new_node)
+            if new_nodes and isinstance(new_nodes[-1], TERMINATORS):
+                break
+        # A body cannot be empty, and a function body with only a
+        # docstring would be interpreted as raw JS
+        only_doc = (
+            len(new_nodes) == 1 < len(nodes)
+            and isinstance(new_nodes[0], ast.Expr)
+            and isinstance(new_nodes[0].value_node, ast.Str)
+        )
+        if (nodes and not new_nodes) or only_doc:
+            new_node = ast.Pass()
+            new_node.lineno = getattr(nodes[-1], "lineno", 0)
+            new_node.col_offset = getattr(nodes[-1], "col_offset", 0)
+            new_nodes.append(new_node)
+        return new_nodes
+
+    ## Expressions
+
+    def optimize_Name(self, node):
+        constant = self._constants.get(node.name, None)
+        if constant is not None:
+            return _constant(constant.value, node)
+        return node
+
+    def optimize_Call(self, node):
+        if (
+            isinstance(node.func_node, ast.Name)
+            and node.func_node.name == "this_is_js"
+            and not node.arg_nodes
+            and not node.kwarg_nodes
+        ):
+            return _constant(True, node)
+        return node
+
+    def optimize_UnaryOp(self, node):
+        isconst, value = _get_constant(node.right_node)
+        if not isconst:
+            pass
+        elif node.op == ast.Node.OPS.Not:
+            return _constant(not value, node)
+        elif _is_number(value):
+            if node.op == ast.Node.OPS.Invert and not _is_int32(value):
+                return node
+            return _constant(UNARY_OPS[node.op](value), node)
+        return node
+
+    def optimize_BinOp(self, node):
+        isconst1, value1 = _get_constant(node.left_node)
+        isconst2, value2 = _get_constant(node.right_node)
+        if isconst1 and isconst2:
+            try:
+                return _constant(_fold_binary(node.op, value1, value2), node)
+            except ValueError:
+                pass  # leave it to runtime
+        return node
+
+    def optimize_Compare(self, node):
+        isconst1, value1 = _get_constant(node.left_node)
+        isconst2, value2 = _get_constant(node.right_node)
+        if isconst1 and isconst2:
+            if node.op in ("Is", "IsNot"):
+                if not isinstance(node.left_node, ast.NameConstant):
+                    return node  # identity of numbers and strings is undefined
+                if not isinstance(node.right_node, ast.NameConstant):
+                    return node
+                return _constant((value1 is value2) == (node.op == "Is"), node)
+            elif node.op in ("Eq", "NotEq") and not _is_same_kind(value1, value2):
+                return node  # the result depends on JS type coercion
+            try:
+                return _constant(COMPARISONS[node.op](value1, value2), node)
+            except TypeError:
+                pass  # e.g. comparing a str with a number, leave it to runtime
+        return node
+
+    def optimize_BoolOp(self, node):
+        # Drop leading constants that do not determine the result, e.g.
+        # "True and x" -> "x", and stop at one that does, e.g. "False and x".
+        is_and = node.op == ast.Node.OPS.And
+        value_nodes = list(node.value_nodes)
+        while len(value_nodes) > 1:
+            isconst, value = _get_constant(value_nodes[0])
+            if not isconst:
+                break
+            elif bool(value) == is_and:
+                value_nodes.pop(0)
+            else:
+                return value_nodes[0]
+        if len(value_nodes) == 1:
+            return value_nodes[0]
+        node.value_nodes = value_nodes
+        return node
+
+    def optimize_IfExp(self, node):
+        isconst, value = _get_constant(node.test_node)
+        if isconst:
+            return node.body_node if value else node.else_node
+        return node
+
+    ## Statements
+
+    def optimize_If(self, node):
+        isconst, value = _get_constant(node.test_node)
+        if isconst:
+            return node.body_nodes if value else node.else_nodes
+        return node
+
+    def optimize_While(self, node):
+        isconst, value = _get_constant(node.test_node)
+        if isconst and not value:
+            return node.else_nodes
+        return node
+
+
+## Removal of unused functions
+
+
+def _get_used_names(node):
+    """Get the names that are used in the given node (and its children).
+    This includes names in strings passed to RawJS.
+    """
+    names = set()
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        cls = node.__class__
+        if cls is ast.Name:
+            names.add(node.name)
+        elif (
+            cls is ast.Call
+            and isinstance(node.func_node, ast.Name)
+            and node.func_node.name == "RawJS"
+        ):
+            for arg in node.arg_nodes:
+                if isinstance(arg, ast.Str):
+                    names.update(re_identifier.findall(arg.value))
+        for name, kind in ast._get_slots(cls):
+            if kind == 1:
+                child = getattr(node, name)
+                if child is not None:
+                    nodes.append(child)
+            elif kind == 2:
+                nodes.extend(getattr(node, name))
+    return names
+
+
+def remove_unused_functions(root, exports):
+    """Remove module-level functions that are not in exports, and are not
+    (indirectly) used by the other code in the module. Functions with
+    decorators are always kept.
+    """
+    functions = {}  # name -> names used by that function
+    used = set(exports)
+    for node in root.body_nodes:
+        if isinstance(node, FUNCTION_DEFS) and not node.decorator_nodes:
+            functions[node.name] = _get_used_names(node)
+        else:
+            used.update(_get_used_names(node))
+    # Mark functions that are used by used functions
+    todo = [name for name in functions if name in used]
+    while todo:
+        for name in functions[todo.pop()]:
+            if name in functions and name not in used:
+                used.add(name)
+                todo.append(name)
+    root.body_nodes = [
+        node
+        for node in root.body_nodes
+        if not (isinstance(node, FUNCTION_DEFS) and node.name not in used)
+        or node.decorator_nodes
+    ]
+    return root
@@ -15,12 +15,17 @@ Main limiting features for browsers (not sure if this is 100% complete):
 import re
 import sys
 import json
+import marshal
+from time import perf_counter
 
 from . import commonast as ast
-from . import stdlib, logger
+from . import stdlib, logger, optimizer
 
 reprs = json.dumps  # Save string representation without the u in u'xx'.
 
+# Stdlib functions that implement Python semantics for operators
+OVERLOAD_HELPERS = "op_add", "op_mult", "op_equals", "op_contains", "truthy"
+
 
 class JSError(Exception):
     """Exception raised when unable to convert Python to JS."""
@@ -28,27 +33,204 @@ class JSError(Exception):
     pass
 
 
-def unify(x):
-    """Turn string or list of strings parts into string. Braces are
-    placed around it if its not alphanumerical
+# Precedence of JS operators (higher binds stronger), following the table
+# on MDN. Expressions with a precedence of at least PREC_ATOM (literals,
+# names, calls, indexing) never need braces.
+PRECEDENCE = {
+    "?:": 2,
+    "||": 3,
+    "&&": 4,
+    "|": 5,
+    "^": 6,
+    "&": 7,
+    "==": 8,
+    "!=": 8,
+    "===": 8,
+    "!==": 8,
+    "<": 9,
+    "<=": 9,
+    ">": 9,
+    ">=": 9,
+    "<<": 10,
+    ">>": 10,
+    "+": 11,
+    "-": 11,
+    "*": 12,
+    "/": 12,
+    "%": 12,
+    "unary": 14,
+    "new": 17,
+}
+PREC_ATOM = 18
+
+
+class JSExpr(str):
+    """The JS code for an expression, annotated with information that the
+    parser uses to make decisions without inspecting the code itself:
+
+    * precedence: of the outermost operator (see PRECEDENCE).
+    * kind: the kind of value that the expression produces, or None if
+      unknown. One of "bool", "null", "number", "string", "primitive"
+      (number or string), "truthy" (a value that is truthy in JS if and
+      only if it is in Python), "array" and "object" (never null).
+    * pure: whether evaluating the expression has no side effects.
     """
-    # Note that r'[\.\w]' matches anyting in 'ab_01.äé'
 
-    if isinstance(x, (tuple, list)):
-        x = "".join(x)
+    def __new__(cls, code, precedence=PREC_ATOM, kind=None, pure=False):
+        s = str.__new__(cls, code)
+        s.precedence = precedence
+        s.kind = kind
+        s.pure = pure
+        return s
+
 
+def _is_atomic(x):
+    # Note that r'[\.\w]' matches anyting in 'ab_01.äé'
     if x[0] in "'\"" and x[0] == x[-1] and x.count(x[0]) == 2:
-        return x  # string
+        return True  # string
     elif re.match(r"^[\.\w]*$", x, re.UNICODE):
-        return x  # words consisting of normal chars, numbers and dots
+        return True  # words consisting of normal chars, numbers and dots
     elif re.match(r"^[\.\w]*\(.*\)$", x, re.UNICODE) and x.count(")") == 1:
-        return x  # function calls (e.g. 'super()' or 'foo.bar(...)')
+        return True  # function calls (e.g. 'super()' or 'foo.bar(...)')
     elif re.match(r"^[\.\w]*\[.*\]$", x, re.UNICODE) and x.count("]") == 1:
-        return x  # indexing
+        return True  # indexing
     elif re.match(r"^\{.*\}$", x, re.UNICODE) and x.count("}") == 1:
-        return x  # dicts
-    else:
-        return "(%s)" % x
+        return True  # dicts
+    return False
+
+
+def as_expr(x):
+    """Turn string or list of strings parts into a JSExpr. If the code is
+    not a JSExpr already, its precedence is derived from the code.
+    """
+    if isinstance(x, (tuple, list)):
+        x = x[0] if len(x) == 1 else "".join(x)
+    if isinstance(x, JSExpr):
+        return x
+    return JSExpr(x, PREC_ATOM if _is_atomic(x) else 0)
+
+
+def unify(x):
+    """Turn string or list of strings parts into string. Braces are
+    placed around it if its not alphanumerical
+    """
+    x = as_expr(x)
+    if x.precedence >= PREC_ATOM:
+        return x
+    return JSExpr("(%s)" % x, PREC_ATOM, x.kind, x.pure)
+
+
+def wrap(x, precedence):
+    """Turn string or list of strings parts into a JSExpr that can be
+    used as an operand of an operator with the given precedence. Braces
+    are placed around it if it binds less strong.
+    """
+    x = as_expr(x)
+    if x.precedence > precedence:
+        return x
+    return JSExpr("(%s)" % x, PREC_ATOM, x.kind, x.pure)
+
+
+def iter_parts(parts):
+    """Iterate over the strings in a list of code parts. Parsing statements
+    produces nested lists (a rope), so that the code of a block is appended
+    to its parent in O(1), and all code is joined only once.
+    """
+    stack = [iter(parts)]
+    while stack:
+        for part in stack[-1]:
+            if isinstance(part, list):
+                stack.append(iter(part))
+                break
+            yield part
+        else:
+            stack.pop()
+
+
+def flatten_parts(parts, flat=None):
+    """Get a flat list with the strings in a (nested) list of code parts."""
+    flat = [] if flat is None else flat
+    for part in parts:
+        if part.__class__ is list:
+            flatten_parts(part, flat)
+        else:
+            flat.append(part)
+    return flat
+
+
+def last_part(parts):
+    """Get the last string in a (nested) list of code parts, or an empty
+    string if there is none.
+    """
+    while parts:
+        part = parts[-1]
+        if not isinstance(part, list):
+            return part
+        elif part:
+            parts = part
+        else:  # skip empty lists
+            parts = parts[:-1]
+    return ""
+
+
+def get_symbols(root):
+    """Get the symbol table of a module: a dict that maps names to the
+    FunctionDef and ClassDef nodes defined at module level, which are not
+    decorated, nor bound elsewhere in the module (e.g. by assignment or
+    as an argument name), so that all uses of that name refer to it.
+    """
+    symbols = {}
+    if not isinstance(root, ast.Module):
+        return symbols
+    for node in root.body_nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.decorator_nodes:
+                continue
+            elif node.arg_nodes and node.arg_nodes[0].name in ("self", "this"):
+                continue  # will be used as a method
+            symbols[node.name] = node
+        elif isinstance(node, ast.ClassDef):
+            symbols[node.name] = node
+    if symbols:
+        counts = optimizer.count_bindings(root)
+        for name in list(symbols):
+            if counts.get(name, 0) != 1:
+                symbols.pop(name)
+    return symbols
+
+
+def kwonly_as_args(node):
+    """Get whether a function accepts its keyword-only arguments also as
+    trailing positional arguments, so that calls to known functions can
+    pass all arguments positionally. This is the case if the function
+    has no ``*args`` and no ``**kwargs``.
+    """
+    return bool(node.kwarg_nodes) and not node.args_node and not node.kwargs_node
+
+
+def get_signature(node):
+    """Get the signature of a function, or of a class (via its ``__init__``),
+    as a tuple (arg_nodes, n), where arg_nodes are the Arg nodes of the
+    arguments in the JS function, of which the first n can be passed
+    positionally in Python. Returns None if the signature is not known.
+    """
+    if isinstance(node, ast.ClassDef):
+        inits = [
+            n
+            for n in node.body_nodes
+            if isinstance(n, ast.FunctionDef) and n.name == "__init__"
+        ]
+        if len(inits) != 1 or inits[0].decorator_nodes:
+            return None  # no __init__, or an __init__ that we cannot know
+        node = inits[0]
+    if node.kwarg_nodes and not kwonly_as_args(node):
+        return None
+    elif node.kwargs_node:
+        return None
+    arg_nodes = list(node.arg_nodes)
+    if arg_nodes and arg_nodes[0].name in ("self", "this"):
+        arg_nodes.pop(0)
+    return arg_nodes + list(node.kwarg_nodes), len(arg_nodes)
 
 
 class NameSpace(dict):
@@ -135,6 +317,88 @@ class NameSpace(dict):
         return [(name, val) for name, val in self.items() if isinstance(val, set)]
 
 
+class ParserProfile:
+    """Profile of the parser, with the number of calls and the time spent
+    in each parse_X, function_X and method_X handler. Pass an instance to
+    the Parser using ``profile=...``; the same instance can be used for
+    multiple parsers to aggregate the results. Profiling is off when no
+    profile is given, in which case it does not cost anything.
+
+    Attributes:
+        stats (dict): maps handler name to a list [ncalls, primcalls,
+            tottime, cumtime, callers]. The self-time (tottime) excludes the
+            time spent in other handlers, primcalls and cumtime exclude
+            recursive calls. Callers maps the name of each calling handler
+            (or None) to a list [ncalls, tottime, cumtime].
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self._stack = []  # [name, child_time] for each running handler
+        self._active = {}  # name -> number of running calls, for recursion
+
+    def call(self, name, func, *args):
+        """Call func with the given args, and record it for the given name."""
+        stack, active = self._stack, self._active
+        caller = stack[-1][0] if stack else None
+        depth = active.get(name, 0)
+        active[name] = depth + 1
+        stack.append([name, 0.0])
+        t0 = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            dt = perf_counter() - t0
+            tottime = dt - stack.pop()[1]
+            active[name] = depth
+            if stack:
+                stack[-1][1] += dt
+            cumtime = 0.0 if depth else dt  # dont count recursive calls twice
+            entry = self.stats.get(name)
+            if entry is None:
+                entry = self.stats[name] = [0, 0, 0.0, 0.0, {}]
+            entry[0] += 1
+            entry[1] += not depth
+            entry[2] += tottime
+            entry[3] += cumtime
+            edge = entry[4].get(caller)
+            if edge is None:
+                edge = entry[4][caller] = [0, 0.0, 0.0]
+            edge[0] += 1
+            edge[1] += tottime
+            edge[2] += dt
+
+    def report(self, n=20, sort_by="tottime"):
+        """Get a string with a table of the n handlers with the highest
+        ncalls, tottime or cumtime.
+        """
+        index = {"ncalls": 0, "tottime": 2, "cumtime": 3}[sort_by]
+        items = sorted(self.stats.items(), key=lambda i: i[1][index], reverse=True)
+        lines = ["%-32s %9s %12s %12s" % ("handler", "ncalls", "tottime", "cumtime")]
+        for name, (ncalls, _, tottime, cumtime, _) in items[:n]:
+            lines.append("%-32s %9i %12.6f %12.6f" % (name, ncalls, tottime, cumtime))
+        return "\n".join(lines)
+
+    def dump_stats(self, filename):
+        """Write the stats to a file in the format of the profile module,
+        so that it can be inspected with e.g. ``pstats.Stats(filename)``.
+        """
+
+        def key(name):
+            return ("pscript", 0, name)
+
+        stats = {}
+        for name, (ncalls, primcalls, tottime, cumtime, callers) in self.stats.items():
+            callers = {
+                key(caller): (ncalls_, ncalls_, tottime_, cumtime_)
+                for caller, (ncalls_, tottime_, cumtime_) in callers.items()
+                if caller is not None
+            }
+            stats[key(name)] = primcalls, ncalls, tottime, cumtime, callers
+        with open(filename, "wb") as f:
+            marshal.dump(stats, f)
+
+
 class Parser0:
     """The Base parser class. Implements the basic mechanism to allow
     parsing to work, but does not implement any parsing on its own.
@@ -197,7 +461,17 @@ class Parser0:
     }
 
     def __init__(
-        self, code, pysource=None, indent=0, docstrings=True, inline_stdlib=True
+        self,
+        code,
+        pysource=None,
+        indent=0,
+        docstrings=True,
+        inline_stdlib=True,
+        profile=None,
+        instrument=False,
+        check_stdlib=False,
+        minify=False,
+        optimize=False,
     ):
         self._pycode = code  # helpfull during debugging
         self._pysource = None
@@ -207,22 +481,38 @@ class Parser0:
             self._pysource = str(pysource[0]), int(pysource[1])
         elif pysource is not None:
             logger.warning("Parser ignores pysource; it must be str or (str, int).")
-        self._root = ast.parse(code)
+        t0 = perf_counter()
+        if isinstance(code, ast.Node):
+            self._root = code  # already parsed, the tree is not modified
+            if optimize:  # the optimizer works in-place
+                self._root = ast.Node.frombytes(code.tobytes())
+        else:
+            self._root = ast.parse(code)
+        if optimize:
+            optimizer.optimize(self._root)
+        t1 = perf_counter()
         self._stack = []
         self._indent = indent
         self._dummy_counter = 0
+        self._loop_stack = []  # else-dummy (or None) for each loop we're in
         self._scope_prefix = []  # stack of name prefixes to simulate local scope
 
         # To keep track of std lib usage
         self._std_functions = set()
         self._std_methods = set()
+        self._overload_helpers = dict.fromkeys(OVERLOAD_HELPERS, 0)
 
         # To help distinguish classes from functions
         self._seen_func_names = set()
         self._seen_class_names = set()
 
+        # Module-level functions and classes, see parse_Call()
+        self._symbols = get_symbols(self._root)
+
         # Options
-        self._docstrings = bool(docstrings)  # whether to inclue docstrings
+        self._minify = bool(minify)  # whether to produce compact code
+        self._docstrings = bool(docstrings) and not self._minify
+        self._instrument = bool(instrument)  # whether to profile the JS functions
 
         # Collect function and method handlers
         self._functions, self._methods = {}, {}
@@ -234,6 +524,17 @@ class Parser0:
             elif name.startswith("method_"):
                 self._methods[name[7:]] = getattr(self, name)
 
+        # Profile by wrapping the dispatch and the handlers
+        if profile is not None:
+            self._profile = profile
+            self.parse = self._parse_profiled
+            for prefix, handlers in [
+                ("function_", self._functions),
+                ("method_", self._methods),
+            ]:
+                for name, func in handlers.items():
+                    handlers[name] = self._make_profiled(prefix + name, func)
+
         # Prepare
         self.push_stack("module", "")
 
@@ -251,28 +552,66 @@ class Parser0:
                 err.args = (msg + ":\n" + str(err),)
                 raise (err)
 
-        # Finish
+        # Finish, flatten the nested list of code parts only once
+        self._parts = flatten_parts(self._parts)
         ns = self.vars  # do not self.pop_stack() so caller can inspect module vars
         defined_names = ns.get_defined()
         if defined_names:
             self._parts.insert(0, self.get_declarations(ns))
 
         # Add part of the stdlib that was actually used
+        t2 = perf_counter()
+        libcode = ""
         if inline_stdlib:
             libcode = stdlib.get_partial_std_lib(
-                self._std_functions, self._std_methods, self._indent
+                self._std_functions, self._std_methods, self._indent, minify=minify
             )
             if libcode:
                 self._parts.insert(0, libcode)
-
-        # Post-process
-        if self._parts:
+        elif check_stdlib:
+            checkcode = stdlib.get_std_check(
+                self._std_functions, self._std_methods, self._indent
+            )
+            if checkcode:
+                self._parts.insert(0, checkcode + "\n")
+        t3 = perf_counter()
+
+        # Post-process: squeeze out the remaining whitespace, and comments
+        if self._minify:
+            code = "".join(self._parts[1 if libcode else 0 :])
+            code = stdlib.minify_js(code, stdlib.get_short_names())
+            self._parts = [libcode, code] if libcode else [code]
+
+        # Post-process: indent the first line
+        if self._parts and not self._minify:
             self._parts[0] = "    " * indent + self._parts[0].lstrip()
 
+        # Stats, e.g. for py2js() to report
+        self._stats = {
+            "time_convert": t1 - t0,
+            "time_parse": t2 - t1,
+            "time_stdlib": t3 - t2,
+            "bytes_stdlib": len(libcode.encode()),
+            "overload_helpers": self._overload_helpers,
+        }
+
     def dump(self):
         """Get the JS code as a string."""
         return "".join(self._parts)
 
+    def dump_to(self, fileobj, chunk_size=2**16):
+        """Write the JS code to a file object (in text mode). The code
+        is written in chunks, without creating the complete string.
+        """
+        chunk, size = [], 0
+        for part in self._parts:
+            chunk.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                fileobj.write("".join(chunk))
+                chunk, size = [], 0
+        fileobj.write("".join(chunk))
+
     def _better_js_error(self, tb):  # pragma: no cover
         """If we get a JSError, we try to get the corresponding node
         and print the lineno as well as the function etc.
@@ -352,29 +691,41 @@ class Parser0:
 
     def lf(self, code=""):
         """Line feed - create a new line with the correct indentation."""
+        if self._minify:
+            return "\n" + code
         return "\n" + self._indent * "    " + code
 
     def dummy(self, name=""):
         """Get a unique name. The name is added to vars."""
         self._dummy_counter += 1
-        name = "stub%i_%s" % (self._dummy_counter, name)
+        if self._minify:
+            name = "$%i" % self._dummy_counter  # cannot clash with Python names
+        else:
+            name = "stub%i_%s" % (self._dummy_counter, name)
         self.vars.add(name)
         return name
 
     def _handle_std_deps(self, code):
+        # The deps include indirect dependencies
         nargs, function_deps, method_deps = stdlib.get_std_info(code)
-        for dep in function_deps:
-            self.use_std_function(dep, [])
-        for dep in method_deps:
-            self.use_std_method("x", dep, [])
+        self._std_functions.update(function_deps)
+        self._std_methods.update(method_deps)
 
-    def use_std_function(self, name, arg_nodes):
-        """Use a function from the PScript standard library."""
+    def get_std_function_name(self, name):
+        """Use a function from the PScript standard library, and get its
+        name in the generated code, e.g. to refer to it without calling it.
+        """
         self._handle_std_deps(stdlib.FUNCTIONS[name])
         self._std_functions.add(name)
-        mangled_name = stdlib.FUNCTION_PREFIX + name
+        return stdlib.FUNCTION_PREFIX + name
+
+    def use_std_function(self, name, arg_nodes):
+        """Use a function from the PScript standard library."""
+        mangled_name = self.get_std_function_name(name)
+        if name in self._overload_helpers:
+            self._overload_helpers[name] += 1
         args = [(a if isinstance(a, str) else unify(self.parse(a))) for a in arg_nodes]
-        return "%s(%s)" % (mangled_name, ", ".join(args))
+        return JSExpr("%s(%s)" % (mangled_name, ", ".join(args)))
 
     def use_std_method(self, base, name, arg_nodes):
         """Use a method from the PScript standard library."""
@@ -384,21 +735,22 @@ class Parser0:
         args = [(a if isinstance(a, str) else unify(self.parse(a))) for a in arg_nodes]
         # return '%s.%s(%s)' % (base, mangled_name, ', '.join(args))
         args.insert(0, base)
-        return "%s.call(%s)" % (mangled_name, ", ".join(args))
+        return JSExpr("%s.call(%s)" % (mangled_name, ", ".join(args)))
 
-    def pop_docstring(self, node):
-        """If a docstring is present, in the body of the given node,
-        remove that string node and return it as a string, corrected
-        for indentation and stripped. If no docstring is present return
-        empty string.
+    def split_docstring(self, node):
+        """Get the docstring of the given node and the body nodes after it.
+        The docstring is returned as a string, corrected for indentation
+        and stripped, or an empty string if there is no docstring. The node
+        itself is not modified, so that a tree can be parsed multiple times.
         """
-        docstring = ""
+        docstring, body_nodes = "", node.body_nodes
         if (
             node.body_nodes
             and isinstance(node.body_nodes[0], ast.Expr)
             and isinstance(node.body_nodes[0].value_node, ast.Str)
         ):
-            docstring = node.body_nodes.pop(0).value_node.value.strip()
+            body_nodes = node.body_nodes[1:]
+            docstring = node.body_nodes[0].value_node.value.strip()
             lines = docstring.splitlines()
             getindent = lambda x: len(x) - len(x.strip())
             indent = min([getindent(x) for x in lines[1:]]) if (len(lines) > 1) else 0
@@ -406,7 +758,15 @@ class Parser0:
                 lines[0] = " " * indent + lines[0]
                 lines = [line[indent:] for line in lines]
             docstring = "\n".join(lines)
-        return docstring
+        return docstring, body_nodes
+
+    def _make_profiled(self, name, func):
+        call = self._profile.call
+        return lambda *args: call(name, func, *args)
+
+    def _parse_profiled(self, node):
+        name = "parse_" + node.__class__.__name__
+        return self._profile.call(name, Parser0.parse, self, node)
 
     def parse(self, node):
         """Parse a node. Check node type and dispatch to one of the
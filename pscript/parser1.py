@@ -32,6 +32,11 @@ Slicing and subscriping
     foo = [1, 2, 3, 4, 5]
     foo[2:]
     foo[2:-2]
+    foo[::-1]
+
+    # Slice assignment and deletion are done in-place
+    foo[1:3] = [7, 8, 9]
+    del foo[::2]
 
     # Slicing strings
     bar = 'abcdefghij'
@@ -189,29 +194,53 @@ import re
 
 from . import commonast as ast
 from . import stdlib
-from .parser0 import Parser0, JSError, unify, reprs
-
-
-# Define builtin stuff for which we know that it returns a bool or int
-_bool_funcs = "hasattr", "all", "any", "op_contains", "op_equals", "truthy"
-_bool_meths = (
-    "count",
-    "isalnum",
-    "isalpha",
-    "isidentifier",
-    "islower",
-    "isnumeric",
-    "isdigit",
-    "isdecimal",
-    "isspace",
-    "istitle",
-    "isupper",
-    "startswith",
-)
-returning_bool = tuple(
-    [stdlib.FUNCTION_PREFIX + x + "(" for x in _bool_funcs]
-    + [stdlib.METHOD_PREFIX + x + "." for x in _bool_meths]
-)
+from .parser0 import Parser0, JSError, JSExpr, unify, reprs
+from .parser0 import as_expr, wrap, PREC_ATOM, PRECEDENCE
+from .parser0 import get_signature
+
+
+# Define builtin stuff for which we know the kind of value that it returns
+_func_kinds = {
+    "all": "bool",
+    "any": "bool",
+    "bool": "bool",
+    "callable": "bool",
+    "hasattr": "bool",
+    "isinstance": "bool",
+    "issubclass": "bool",
+    "abs": "number",
+    "float": "number",
+    "int": "number",
+    "len": "number",
+    "ord": "number",
+    "pow": "number",
+    "round": "number",
+    "chr": "string",
+    "repr": "string",
+    "str": "string",
+    "this_is_js": "string",
+    "list": "array",
+    "sorted": "array",
+    "tuple": "array",
+}
+_meth_kinds = {
+    "count": "number",
+    "isalnum": "bool",
+    "isalpha": "bool",
+    "isidentifier": "bool",
+    "islower": "bool",
+    "isnumeric": "bool",
+    "isdigit": "bool",
+    "isdecimal": "bool",
+    "isspace": "bool",
+    "istitle": "bool",
+    "isupper": "bool",
+    "startswith": "bool",
+}
+# Kinds of values that can be compared with plain ==
+_primitive_kinds = "bool", "null", "number", "string", "primitive"
+# Kinds of values for which the JS truthiness matches that of Python
+_plain_kinds = _primitive_kinds + ("truthy",)
 
 
 # precompile regexp to help determine whether a string is an identifier
@@ -262,6 +291,13 @@ reserved_names = (
 )
 
 
+def _is_negative_literal(node):
+    """Get whether the node is a negative number, e.g. -1."""
+    if isinstance(node, ast.UnaryOp) and node.op == node.OPS.USub:
+        return isinstance(node.right_node, ast.Num) and node.right_node.value > 0
+    return isinstance(node, ast.Num) and node.value < 0
+
+
 class Parser1(Parser0):
     """Parser that add basic functionality like assignments,
     operations, function calls, and indexing.
@@ -277,10 +313,12 @@ class Parser1(Parser0):
     ## Literals
 
     def parse_Num(self, node):
-        return repr(node.value)
+        code = repr(node.value)
+        precedence = PRECEDENCE["unary"] if code.startswith("-") else PREC_ATOM
+        return JSExpr(code, precedence, "number", True)
 
     def parse_Str(self, node):
-        return reprs(node.value)
+        return JSExpr(reprs(node.value), PREC_ATOM, "string", True)
 
     def parse_JoinedStr(self, node):
         parts, value_nodes = [], []
@@ -292,11 +330,13 @@ class Parser1(Parser0):
                 parts.append("{" + self._parse_FormattedValue_fmt(n) + "}")
                 value_nodes.append(n.value_node)
         thestring = reprs("".join(parts))
-        return self.use_std_method(thestring, "format", value_nodes)
+        code = self.use_std_method(thestring, "format", value_nodes)
+        return JSExpr(code, PREC_ATOM, "string")
 
     def parse_FormattedValue(self, node):  # can als be present standalone
         thestring = "{" + self._parse_FormattedValue_fmt(node) + "}"
-        return self.use_std_method(thestring, "format", [node.value_node])
+        code = self.use_std_method(thestring, "format", [node.value_node])
+        return JSExpr(code, PREC_ATOM, "string")
 
     def _parse_FormattedValue_fmt(self, node):
         """Return fmt for a FormattedValue node."""
@@ -317,7 +357,8 @@ class Parser1(Parser0):
 
     def parse_NameConstant(self, node):
         M = {True: "true", False: "false", None: "null"}
-        return M[node.value]
+        kind = "null" if node.value is None else "bool"
+        return JSExpr(M[node.value], PREC_ATOM, kind, True)
 
     def parse_List(self, node):
         code = ["["]
@@ -327,7 +368,7 @@ class Parser1(Parser0):
         if node.element_nodes:
             code.pop(-1)  # skip last comma
         code.append("]")
-        return code
+        return JSExpr("".join(code), PREC_ATOM, "array")
 
     def parse_Tuple(self, node):
         return self.parse_List(node)  # tuple = ~ list in JS
@@ -386,22 +427,22 @@ class Parser1(Parser0):
         if name in reserved_names:
             raise JSError("Cannot use reserved name %s as a variable name!" % name)
         if self.vars.is_known(name):
-            return self.with_prefix(name)
+            return JSExpr(self.with_prefix(name), PREC_ATOM, None, True)
         if self._scope_prefix:
             for stackitem in reversed(self._stack):
                 scope = stackitem[2]
                 for prefix in reversed(self._scope_prefix):
                     prefixed_name = prefix + name
                     if prefixed_name in scope:
-                        return prefixed_name
+                        return JSExpr(prefixed_name, PREC_ATOM, None, True)
         if name in self.NAME_MAP:
-            return self.NAME_MAP[name]
+            return JSExpr(self.NAME_MAP[name], PREC_ATOM, None, True)
         # Else ...
         if not (name in self._functions or name in ("undefined", "window")):
             # mark as used (not defined)
             used_name = (name + "." + fullname) if fullname else name
             self.vars.use(name, used_name)
-        return name
+        return JSExpr(name, PREC_ATOM, None, True)
 
     def parse_Starred(self, node):
         # they're present in Call arguments, but we parse them there.
@@ -417,51 +458,60 @@ class Parser1(Parser0):
         return code
 
     def parse_UnaryOp(self, node):
+        precedence = PRECEDENCE["unary"]
         if node.op == node.OPS.Not:
-            return "!", self._wrap_truthy(node.right_node)
+            test = self._wrap_truthy(node.right_node)
+            return JSExpr("!" + wrap(test, precedence), precedence, "bool")
         else:
             op = self.UNARY_OP[node.op]
-            right = unify(self.parse(node.right_node))
-            return op, right
+            right = wrap(self.parse(node.right_node), precedence)
+            return JSExpr(op + right, precedence, "number", right.pure)
 
     def parse_BinOp(self, node):
         if node.op == node.OPS.Mod and isinstance(node.left_node, ast.Str):
             # Modulo on a string is string formatting in Python
-            return self._format_string(node)
+            return JSExpr(self._format_string(node), PREC_ATOM, "string")
 
-        left = unify(self.parse(node.left_node))
-        right = unify(self.parse(node.right_node))
+        left = as_expr(self.parse(node.left_node))
+        right = as_expr(self.parse(node.right_node))
+        kinds = left.kind, right.kind
+        kind = "number"
 
         if node.op == node.OPS.Add:
-            C = ast.Num, ast.Str
-            if self._pscript_overload and not (
-                isinstance(node.left_node, C)
-                or isinstance(node.right_node, C)
-                or (
-                    isinstance(node.left_node, ast.BinOp)
-                    and node.left_node.op == node.OPS.Add
-                    and "op_add" not in left
-                )
-                or (
-                    isinstance(node.right_node, ast.BinOp)
-                    and node.right_node.op == node.OPS.Add
-                    and "op_add" not in right
-                )
-            ):
+            # JS does the right thing if either operand is a number or string
+            if "string" in kinds:
+                kind = "string"
+            elif "number" in kinds or "primitive" in kinds:
+                kind = "number" if kinds == ("number", "number") else "primitive"
+            elif self._pscript_overload:
                 return self.use_std_function("op_add", [left, right])
+            else:
+                kind = "primitive"
         elif node.op == node.OPS.Mult:
-            C = ast.Num
-            if self._pscript_overload and not (
-                isinstance(node.left_node, C) and isinstance(node.right_node, C)
-            ):
-                return self.use_std_function("op_mult", [left, right])
+            if self._pscript_overload and kinds != ("number", "number"):
+                kind = None
+                if "number" in kinds and kinds[0] != kinds[1]:
+                    other = kinds[1] if kinds[0] == "number" else kinds[0]
+                    kind = other if other in ("string", "array") else None
+                code = self.use_std_function("op_mult", [left, right])
+                return JSExpr(code, PREC_ATOM, kind)
         elif node.op == node.OPS.Pow:
-            return ["Math.pow(", left, ", ", right, ")"]
+            return JSExpr("Math.pow(%s, %s)" % (left, right), PREC_ATOM, "number")
         elif node.op == node.OPS.FloorDiv:
-            return ["Math.floor(", left, "/", right, ")"]
+            precedence = PRECEDENCE["/"]
+            code = "Math.floor(%s/%s)" % (
+                wrap(left, precedence - 1),
+                wrap(right, precedence),
+            )
+            return JSExpr(code, PREC_ATOM, "number")
 
-        op = " %s " % self.BINARY_OP[node.op]
-        return [left, op, right]
+        # Operators are left-associative, braces are only needed on the left
+        # for operators that bind less strong.
+        op = self.BINARY_OP[node.op]
+        precedence = PRECEDENCE[op]
+        left, right = wrap(left, precedence - 1), wrap(right, precedence)
+        code = "%s %s %s" % (left, op, right)
+        return JSExpr(code, precedence, kind, left.pure and right.pure)
 
     def _format_string(self, node):
         # Get value_nodes
@@ -502,63 +552,68 @@ class Parser1(Parser0):
         thestring = sep + "".join(parts) + sep
         return self.use_std_method(thestring, "format", value_nodes)
 
-    def _wrap_truthy(self, node):
-        """Wraps an operation in a truthy call, unless its not necessary."""
-        eq_name = stdlib.FUNCTION_PREFIX + "op_equals"
-        test = "".join(self.parse(node))
-        if not self._pscript_overload:
-            return unify(test)
-        elif (
-            test.endswith(".length")
-            or test.startswith("!")
-            or test.isnumeric()
-            or test == "true"
-            or test == "false"
-            or test.count("==")
-            or test.count(">")
-            or test.count("<")
-            or test.count(eq_name)
-            or test == '"this_is_js()"'
-            or test.startswith("Array.isArray(")
-            or (test.startswith(returning_bool) and "||" not in test)
-        ):
-            return unify(test)
+    def _wrap_truthy(self, node, keep_value=False):
+        """Wraps an operation in a truthy call, unless its not necessary.
+        A cheaper test is used when the kind of the expression is known.
+        If keep_value is True, the result must be the value itself when
+        it is truthy, as in ``a or b``.
+        """
+        test = as_expr(self.parse(node))
+        if not self._pscript_overload or test.kind in _plain_kinds:
+            return test
+        elif test.kind == "array" and not keep_value:
+            return JSExpr(unify(test) + ".length", PREC_ATOM, "number")
+        elif test.kind == "object" and not keep_value:
+            precedence = PRECEDENCE["!="]
+            code = wrap(test, precedence) + " != null"
+            return JSExpr(code, precedence, "bool")
         else:
-            return self.use_std_function("truthy", [test])
+            code = self.use_std_function("truthy", [test])
+            return JSExpr(code, PREC_ATOM, "truthy")
 
     def parse_BoolOp(self, node):
-        op = " %s " % self.BOOL_OP[node.op]
-        if node.op.lower() == "or":  # allow foo = bar or []
-            values = [unify(self._wrap_truthy(val)) for val in node.value_nodes[:-1]]
-            values += [unify(self.parse(node.value_nodes[-1]))]
+        op = self.BOOL_OP[node.op]
+        precedence = PRECEDENCE[op]
+        if node.op == node.OPS.Or:  # allow foo = bar or []
+            values = [self._wrap_truthy(val, True) for val in node.value_nodes[:-1]]
+            values.append(as_expr(self.parse(node.value_nodes[-1])))
+        else:
+            values = [self._wrap_truthy(val, True) for val in node.value_nodes]
+        # The result is one of the values, all but the last are tested
+        kinds = set(val.kind for val in values)
+        if len(kinds) == 1:
+            kind = kinds.pop()
+        elif values[-1].kind in _plain_kinds:
+            kind = "truthy"
         else:
-            values = [unify(self._wrap_truthy(val)) for val in node.value_nodes]
-        return op.join(values)
+            kind = None
+        code = (" %s " % op).join(wrap(val, precedence) for val in values)
+        return JSExpr(code, precedence, kind)
 
     def parse_Compare(self, node):
         left = unify(self.parse(node.left_node))
         right = unify(self.parse(node.right_node))
+        # Deep comparisons are not needed if either side is a primitive
+        primitive = left.kind in _primitive_kinds or right.kind in _primitive_kinds
 
-        if node.op in (node.COMP.Eq, node.COMP.NotEq) and not left.endswith(".length"):
+        if node.op in (node.COMP.Eq, node.COMP.NotEq) and not primitive:
+            op = self.COMP_OP[node.op]
             if self._pscript_overload:
                 code = self.use_std_function("op_equals", [left, right])
                 if node.op == node.COMP.NotEq:
-                    code = "!" + code
+                    return JSExpr("!" + code, PRECEDENCE["unary"], "bool")
+                return JSExpr(code, PREC_ATOM, "bool")
             else:
-                if node.op == node.COMP.NotEq:
-                    code = [left, "!=", right]
-                else:
-                    code = [left, "==", right]
-            return code
+                return JSExpr(left + op + right, PRECEDENCE[op], "bool")
         elif node.op in (node.COMP.In, node.COMP.NotIn):
-            self.use_std_function("op_equals", [])  # trigger use of equals
             code = self.use_std_function("op_contains", [left, right])
             if node.op == node.COMP.NotIn:
-                code = "!" + code
-            return code
+                return JSExpr("!" + code, PRECEDENCE["unary"], "bool")
+            return JSExpr(code, PREC_ATOM, "bool")
         else:
             op = self.COMP_OP[node.op]
-            return "%s %s %s" % (left, op, right)
+            code = "%s %s %s" % (left, op, right)
+            return JSExpr(code, PRECEDENCE[op], "bool")
 
     def parse_Call(self, node):
         # Get full function name and method name if it exists
@@ -580,35 +635,46 @@ class Parser1(Parser0):
             full_name = unify(self.parse(node.func_node))
 
         # Handle special functions and methods
-        res = None
+        res = kind = None
         if method_name in self._methods:
             res = self._methods[method_name](node, base_name)
+            kind = _meth_kinds.get(method_name, None)
         elif full_name in self._functions:
             res = self._functions[full_name](node)
+            kind = _func_kinds.get(full_name, None)
         if res is not None:
-            return res
+            res = as_expr(res)
+            return JSExpr(res, res.precedence, kind or res.kind) if kind else res
 
         # Handle normally
         if base_name.endswith("._base_class") or base_name == "super()":
             # super() was used, use "call" to pass "this"
-            return [full_name] + self._get_args(node, "this", True)
+            return JSExpr(full_name + "".join(self._get_args(node, "this", True)))
         else:
-            code = [full_name] + self._get_args(node, base_name)
+            code = full_name + "".join(self._get_args(node, base_name))
             # Insert "new" if this looks like a class
             if base_name == "this":
                 pass
             elif method_name:
                 if method_name[0].lower() != method_name[0]:
-                    code.insert(0, "new ")
+                    return JSExpr("new " + code, PRECEDENCE["new"])
+            elif isinstance(node.func_node, ast.Name) and (
+                node.func_node.name in self._symbols
+            ):
+                # A module-level function or class, no need to guess
+                symbol = self._symbols[node.func_node.name]
+                if isinstance(symbol, ast.ClassDef):
+                    return JSExpr("new " + code, PRECEDENCE["new"], "object")
             else:
                 fn = full_name
                 if fn in self._seen_func_names and fn not in self._seen_class_names:
                     pass
                 elif fn not in self._seen_func_names and fn in self._seen_class_names:
-                    code.insert(0, "new ")
+                    # An instance of a known class, which is never null
+                    return JSExpr("new " + code, PRECEDENCE["new"], "object")
                 elif full_name[0].lower() != full_name[0]:
-                    code.insert(0, "new ")
-            return code
+                    return JSExpr("new " + code, PRECEDENCE["new"])
+            return JSExpr(code)
 
     def _get_args(self, node, base_name, use_call_or_apply=False):
         """Get arguments for function call. Does checking for keywords and
@@ -621,11 +687,17 @@ class Parser1(Parser0):
         # use_call_or_apply:    foo.call(base_name, .., ..)
         # use_starargs:         foo.apply(base_name, vararg_name)
         #           or:         foo.apply(base_name, [].concat([.., ..], vararg_name)
-        # has_kwargs:           foo({__args: [], __kwargs: {} })
-        #         or:           foo.apply(base_name, ({__args: [], __kwargs: {} })
+        # has_kwargs:           foo(new op_kwargs([], {}))
+        #         or:           foo.call(base_name, new op_kwargs([], {}))
 
         base_name = base_name or "null"
 
+        # Calls to known functions can pass keyword arguments positionally
+        if node.kwarg_nodes and not use_call_or_apply:
+            args_simple = self._get_known_args(node)
+            if args_simple is not None:
+                return ["(", args_simple, ")"]
+
         # Get arguments
         args_simple, args_array = self._get_positional_args(node)
         kwargs = self._get_keyword_args(node)
@@ -636,14 +708,8 @@ class Parser1(Parser0):
                 start = [".call(", base_name, ", "]
             else:
                 start = ["("]
-            return start + [
-                "{",
-                "flx_args: ",
-                args_array,
-                ", flx_kwargs: ",
-                kwargs,
-                "})",
-            ]
+            marker = self.get_std_function_name("op_kwargs")
+            return start + ["new ", marker, "(", args_array, ", ", kwargs, "))"]
         elif args_simple is None:
             # Need to use apply
             return [".apply(", base_name, ", ", args_array, ")"]
@@ -657,6 +723,60 @@ class Parser1(Parser0):
             # Normal function call
             return ["(", args_simple, ")"]
 
+    def _get_known_args(self, node):
+        """For a call with keyword arguments to a known module-level function
+        or class, get a string with the arguments in positional form. Omitted
+        arguments with a literal default get that value. Returns None if the
+        call cannot be resolved statically, e.g. if the function accepts
+        **kwargs, or if a required argument is missing.
+        """
+        if not isinstance(node.func_node, ast.Name):
+            return None
+        symbol = self._symbols.get(node.func_node.name, None)
+        signature = None if symbol is None else get_signature(symbol)
+        if signature is None:
+            return None
+        arg_nodes, n_positional = signature
+        names = [arg.name for arg in arg_nodes]
+        if len(node.arg_nodes) > n_positional:
+            return None
+        elif any(isinstance(arg, ast.Starred) for arg in node.arg_nodes):
+            return None
+        # Map keywords to positions
+        value_nodes = list(node.arg_nodes)
+        value_nodes += [None] * (len(names) - len(node.arg_nodes))
+        indices = []
+        for kwnode in node.kwarg_nodes:
+            if kwnode.name not in names:
+                return None  # also for **xx
+            i = names.index(kwnode.name)
+            if value_nodes[i] is not None:
+                return None  # multiple values for argument
+            value_nodes[i] = kwnode.value_node
+            indices.append(i)
+        # Arguments are evaluated in order, so reordering is only
+        # allowed if the values have no side effects.
+        if indices != sorted(indices):
+            simple = ast.Num, ast.Str, ast.NameConstant, ast.Name
+            if not all(isinstance(value_nodes[i], simple) for i in indices):
+                return None
+        # Omitted arguments must have a default
+        for i, value_node in enumerate(value_nodes):
+            if value_node is None and arg_nodes[i].value_node is None:
+                return None
+        while value_nodes and value_nodes[-1] is None:
+            value_nodes.pop(-1)
+        args = []
+        for i, value_node in enumerate(value_nodes):
+            arg = arg_nodes[i]
+            if value_node is not None:
+                args.append(unify(self.parse(value_node)))
+            elif isinstance(arg.value_node, (ast.Num, ast.Str, ast.NameConstant)):
+                args.append(unify(self.parse(arg.value_node)))
+            else:
+                args.append("undefined")  # the function applies the default
+        return ", ".join(args)
+
     def _get_positional_args(self, node):
         """Returns:
         * a string args_simple, which represents the positional args in comma
@@ -761,7 +881,9 @@ class Parser1(Parser0):
         if attr in self.ATTRIBUTE_MAP:
             return self.ATTRIBUTE_MAP[attr].replace("{}", base_name)
         else:
-            return "%s.%s" % (base_name, attr)
+            kind = "number" if attr == "length" else None
+            pure = getattr(base_name, "pure", False)
+            return JSExpr("%s.%s" % (base_name, attr), PREC_ATOM, kind, pure)
 
     ## Statements
 
@@ -783,10 +905,22 @@ class Parser1(Parser0):
                 self._stack[-1][2]._pscript_overload = bool(node.value_node.value)
                 return []
 
+        # Slice assignment, e.g. x[i:j] = values, is done in-place by a helper
+        target = node.target_nodes[0]
+        if (
+            len(node.target_nodes) == 1
+            and isinstance(target, ast.Subscript)
+            and isinstance(target.slice_node, ast.Slice)
+        ):
+            args = self.parse_Slice(target.slice_node)
+            args += ["undefined"] * (3 - len(args))
+            args = [target.value_node] + args + [node.value_node]
+            return code + [self.use_std_function("op_setslice", args), ";"]
+
         # Parse targets
         tuple = []
         for target in node.target_nodes:
-            var = "".join(self.parse(target))
+            var = "".join(self.parse_target(target))
             if isinstance(target, ast.Name):
                 if "." in var:
                     code.append(var)
@@ -819,7 +953,7 @@ class Parser1(Parser0):
         if tuple:
             code.append(self.lf())
             for i, x in enumerate(tuple):
-                var = unify(self.parse(x))
+                var = unify(self.parse_target(x))
                 if isinstance(x, ast.Name):  # but not when attr or index
                     self.vars.add(var)
                 code.append("%s = %s[%i];" % (var, dummy, i))
@@ -827,7 +961,7 @@ class Parser1(Parser0):
         return code
 
     def parse_AugAssign(self, node):  # -> x += 1
-        target = "".join(self.parse(node.target_node))
+        target = "".join(self.parse_target(node.target_node))
         value = "".join(self.parse(node.value_node))
 
         nl = self.lf()
@@ -862,8 +996,14 @@ class Parser1(Parser0):
     def parse_Delete(self, node):
         code = []
         for target in node.target_nodes:
+            if isinstance(target, ast.Subscript) and isinstance(
+                target.slice_node, ast.Slice
+            ):
+                args = [target.value_node] + self.parse_Slice(target.slice_node)
+                code += [self.lf(), self.use_std_function("op_delslice", args), ";"]
+                continue
             code.append(self.lf("delete "))
-            code += self.parse(target)
+            code += self.parse_target(target)
             code.append(";")
         return code
 
@@ -872,40 +1012,61 @@ class Parser1(Parser0):
 
     ## Subscripting
 
-    def parse_Subscript(self, node):
-        value_list = self.parse(node.value_node)
-        slice_list = self.parse(node.slice_node)
-
-        code = []
-        code += value_list
+    def parse_Subscript(self, node, store=False):
+        # If store is True, the result must be valid as an assignment target
+        value = unify(self.parse(node.value_node))
+
+        if isinstance(node.slice_node, ast.Slice):
+            if store:
+                raise JSError("Slice assignment only supported in plain assignments.")
+            args = self.parse_Slice(node.slice_node)
+            if len(args) < 3 and value.kind in ("string", "array"):
+                if not args or args[0] == "undefined":
+                    args[:1] = ["0"]
+                return [value, ".slice(", ", ".join(args), ")"]
+            code = self.use_std_function("op_slice", [value] + args)
+            return JSExpr(code, PREC_ATOM, value.kind)
 
-        if isinstance(node.slice_node, (ast.Slice, ast.Tuple)):
-            code.append(".slice(")
-            code += slice_list
-            code.append(")")
+        slice_list = self.parse(node.slice_node)
+        if isinstance(node.slice_node, ast.Tuple):
+            return [value, ".slice("] + slice_list + [")"]
+
+        index = unify(slice_list) if len(slice_list) > 1 else slice_list[0]
+        if not index.startswith("-"):
+            return [value, "["] + slice_list + ["]"]
+        elif not (store or _is_negative_literal(node.slice_node)):
+            # A dynamic negative index, e.g. x[-i], which may be positive
+            return self.use_std_function("getitem", [value, index])
+        elif value.pure:
+            return [value, "[", value, ".length ", index, "]"]
+        elif self._stack[-1][:2] == ("function", ""):
+            # In a lambda, we cannot use a dummy variable
+            return self.use_std_function("getitem", [value, index])
         else:
-            code.append("[")
-            if slice_list[0].startswith("-"):
-                code.append(unify(value_list) + ".length ")
-            code += slice_list
-            code.append("]")
-        return code
+            # Evaluate the base only once, e.g. for self.get_items()[-1]
+            base = self.dummy("base")
+            return ["(%s = %s)[%s.length %s]" % (base, value, base, index)]
+
+    def parse_target(self, node):
+        """Parse the target of an assignment, deletion or loop."""
+        if isinstance(node, ast.Subscript):
+            return self.parse_Subscript(node, True)
+        return self.parse(node)
 
     def parse_Index(self, node):
         return self.parse(node.value_node)
 
     def parse_Slice(self, node):
-        code = []
-        if node.step_node:
-            raise JSError("Slicing with step not supported.")
-        if node.lower_node:
-            code += self.parse(node.lower_node)
-        else:
-            code.append("0")
-        if node.upper_node:
-            code.append(",")
-            code += self.parse(node.upper_node)
-        return code
+        # Get the arguments for op_slice() and friends: start, stop, step
+        step_node = node.step_node
+        if isinstance(step_node, ast.Num) and step_node.value == 1:
+            step_node = None
+        args = []
+        for n in (node.lower_node, node.upper_node, step_node):
+            args.append("undefined" if n is None else unify(self.parse(n)))
+        while args and args[-1] == "undefined":
+            args.pop()
+        return args
 
     def parse_ExtSlice(self, node):
         raise JSError("Multidimensional slicing not supported in JS")
@@ -934,15 +1095,15 @@ class Parser1(Parser0):
         # Get docstring, but only if in module mode
         # module_mode = self._stack[0][1] # top stack has a name -> works no more
         module_mode = self._pysource and self._pysource[1] == 0  # line nr offset
-        docstring = ""
+        docstring, body_nodes = "", node.body_nodes
         if self._docstrings and module_mode:
-            docstring = self.pop_docstring(node)
+            docstring, body_nodes = self.split_docstring(node)
 
         code = []
         if docstring:
             for line in docstring.splitlines():
                 code.append(self.lf("// " + line))
             code.append("\n")
-        for child in node.body_nodes:
-            code += self.parse(child)
+        for child in body_nodes:
+            code.append(self.parse(child))
         return code
@@ -50,6 +50,13 @@ Explicit iterating over arrays (and strings):
     for element in arr:
         print(element)
 
+    # Iterating over a slice does not copy the array, unless the loop
+    # calls functions, assigns to items, or uses the array other than
+    # by indexing and len()
+    total = 0
+    for element in arr[1:]:
+        total += element
+
 
 Iterations over dicts:
 
@@ -136,6 +143,20 @@ Defining functions
     foo = lambda x: x**2
 
 
+Functions that contain ``yield`` become generator functions. Iterating
+over a generator (in a for-loop, comprehension, or builtins like ``list()``,
+``sum()``, ``enumerate()`` and ``zip()``) consumes it lazily.
+
+.. pscript_example::
+
+    def evens(n):
+        for i in range(n):
+            if i % 2 == 0:
+                yield i
+
+    for i, x in enumerate(evens(100)):
+        print(i, x)
+
 PScript also supports async functions and await syntax. (These map to
 ``async`` and ``await`` in JS, which work in about every browser except IE.):
 
@@ -225,7 +246,9 @@ Globals and nonlocal
 from . import commonast as ast
 from . import stdlib
 from . import logger
-from .parser1 import Parser1, JSError, unify, reprs
+from .parser1 import Parser1, JSError, JSExpr, unify, reprs
+from .parser1 import as_expr, PREC_ATOM, PRECEDENCE, _is_negative_literal
+from .parser0 import last_part, iter_parts, kwonly_as_args
 
 
 RAW_DOC_WARNING = (
@@ -291,6 +314,121 @@ RESERVED = {
 }
 
 
+# Whether the (non-array) object X is an iterator. A dict can have a "next"
+# key, so we only trust objects that are not plain, or that are JS iterators.
+IS_ITERATOR_TEMPLATE = (
+    '(typeof X.next === "function" && (X.constructor !== Object || '
+    '(typeof Symbol !== "undefined" && typeof X[Symbol.iterator] === "function")))'
+)
+
+# Ensure that the thing we iterate over in a comprehension is an array
+ITERABLE_TEMPLATE = (
+    'if ((typeof iter# === "object") && (!Array.isArray(iter#))) {'
+    'if (typeof iter#.__iter__ === "function") {i# = iter#.__iter__();} '
+    "else if %s {i# = iter#;} else {i# = null;} "
+    "if (i# === null) {iter# = Object.keys(iter#);} else {for (iter# = [], "
+    "iter#_nxt = i#.next(); !iter#_nxt.done; iter#_nxt = i#.next()) "
+    "{iter#.push(iter#_nxt.value);}}}"
+) % IS_ITERATOR_TEMPLATE.replace("X", "iter#")
+
+
+def _contains_yield(nodes):
+    """Get whether any of the given nodes contains a yield expression,
+    without descending into nested functions and classes.
+    """
+    todo = list(nodes)
+    while todo:
+        node = todo.pop()
+        if isinstance(node, (ast.Yield, ast.YieldFrom)):
+            return True
+        elif isinstance(node, (ast.FunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        for name in node.__slots__:
+            if name.endswith("_node"):
+                child = getattr(node, name)
+                if child is not None:
+                    todo.append(child)
+            elif name.endswith("_nodes"):
+                todo.extend(getattr(node, name))
+    return False
+
+
+def _assigns_to_item(node):
+    """Get whether an assignment target assigns to an item, e.g. x[0]."""
+    if isinstance(node, ast.Subscript):
+        return True
+    elif isinstance(node, (ast.Tuple, ast.List)):
+        return any(_assigns_to_item(n) for n in node.element_nodes)
+    elif isinstance(node, ast.Starred):
+        return _assigns_to_item(node.value_node)
+    return False
+
+
+def _iterates_over_slice(node):
+    """Get whether a for-loop iterates over a slice of a variable, e.g.
+    ``for x in seq[1:]``, which is not used in the loop other than by
+    indexing and len(), so that the loop can iterate over the indices
+    instead of over a copy. The list may have aliases, so the loop must
+    not assign to or delete items, and it must not call functions
+    (other than len()), yield or await.
+    """
+    iter_node = node.iter_node
+    if not (
+        isinstance(iter_node, ast.Subscript)
+        and isinstance(iter_node.slice_node, ast.Slice)
+        and isinstance(iter_node.value_node, ast.Name)
+    ):
+        return False
+    slice_node = iter_node.slice_node
+    if slice_node.step_node is not None:
+        return False
+    elif slice_node.lower_node is None and slice_node.upper_node is None:
+        return False  # seq[:] is an explicit copy
+    name = iter_node.value_node.name
+    todo = [node]
+    while todo:
+        parent = todo.pop()
+        for slot in parent.__slots__:
+            if parent is node and slot in ("iter_node", "else_nodes"):
+                continue
+            elif slot.endswith("_node"):
+                children = [getattr(parent, slot)]
+            elif slot.endswith("_nodes"):
+                children = getattr(parent, slot)
+            else:
+                continue
+            for child in children:
+                if child is None:
+                    continue
+                elif isinstance(child, ast.Call) and not (
+                    isinstance(child.func_node, ast.Name)
+                    and child.func_node.name == "len"
+                ):
+                    return False
+                elif isinstance(
+                    child, (ast.Yield, ast.YieldFrom, ast.Await, ast.Delete, ast.With)
+                ):
+                    return False
+                elif isinstance(child, ast.Name) and child.name == name:
+                    if isinstance(parent, ast.Subscript) and slot == "value_node":
+                        pass
+                    elif (
+                        isinstance(parent, ast.Call)
+                        and slot == "arg_nodes"
+                        and isinstance(parent.func_node, ast.Name)
+                        and parent.func_node.name == "len"
+                    ):
+                        pass
+                    else:
+                        return False
+                elif slot in ("target_node", "target_nodes") and _assigns_to_item(
+                    child
+                ):
+                    return False
+                todo.append(child)
+    return True
+
+
 class Parser2(Parser1):
     """Parser that adds control flow, functions, classes, and exceptions."""
 
@@ -354,7 +492,7 @@ class Parser2(Parser1):
             code.append(self.lf("try {"))
             self._indent += 1
             for n in node.body_nodes:
-                code += self.parse(n)
+                code.append(self.parse(n))
             self._indent -= 1
             code.append(self.lf("}"))
 
@@ -370,7 +508,7 @@ class Parser2(Parser1):
                 else:
                     code.append(" else ")
                 subcode = self.parse(handler)
-                code += subcode
+                code.append(subcode)
 
             # Rethrow?
             if subcode and subcode[0].startswith("if"):
@@ -384,7 +522,7 @@ class Parser2(Parser1):
             code.append(" finally {")
             self._indent += 1
             for n in node.finally_nodes:
-                code += self.parse(n)
+                code.append(self.parse(n))
             self._indent -= 1
             code.append(self.lf("}"))  # end finally
 
@@ -411,7 +549,7 @@ class Parser2(Parser1):
 
         # Insert the body
         for n in node.body_nodes:
-            code += self.parse(n)
+            code.append(self.parse(n))
         self._indent -= 1
 
         code.append(self.lf("}"))
@@ -451,7 +589,7 @@ class Parser2(Parser1):
         code.append(self.lf("try {"))
         self._indent += 1
         for n in node.body_nodes:
-            code += self.parse(n)
+            code.append(self.parse(n))
         self._indent -= 1
         code.append(self.lf("}"))
 
@@ -477,19 +615,13 @@ class Parser2(Parser1):
 
     def parse_IfExp(self, node):
         # in "a if b else c"
-        a = self.parse(node.body_node)
+        a = as_expr(self.parse(node.body_node))
         b = self._wrap_truthy(node.test_node)
-        c = self.parse(node.else_node)
+        c = as_expr(self.parse(node.else_node))
 
-        code = []
-        code.append("(")
-        code += b
-        code.append(")? (")
-        code += a
-        code.append(") : (")
-        code += c
-        code.append(")")
-        return code
+        code = "(%s)? (%s) : (%s)" % (b, a, c)
+        kind = a.kind if a.kind == c.kind else None
+        return JSExpr(code, PRECEDENCE["?:"], kind)
 
     def parse_If(self, node):
         if (
@@ -512,12 +644,13 @@ class Parser2(Parser1):
             code = [self.lf("if ("), "true", ") ", "{ /* if this_is_js() */"]
             self._indent += 1
             for stmt in node.body_nodes:
-                code += self.parse(stmt)
+                code.append(self.parse(stmt))
             self._indent -= 1
             code.append(self.lf("}"))
             return code
 
         # Disable body if "not this_is_js()"
+        body_nodes = node.body_nodes
         if (
             True
             and isinstance(node.test_node, ast.UnaryOp)
@@ -526,26 +659,35 @@ class Parser2(Parser1):
             and isinstance(node.test_node.right_node.func_node, ast.Name)
             and node.test_node.right_node.func_node.name == "this_is_js"
         ):
-            node.body_nodes = []
+            body_nodes = []
 
         code = [self.lf("if (")]  # first part (popped in elif parsing)
         code.append(self._wrap_truthy(node.test_node))
         code.append(") {")
         self._indent += 1
-        for stmt in node.body_nodes:
-            code += self.parse(stmt)
+        for stmt in body_nodes:
+            code.append(self.parse(stmt))
         self._indent -= 1
         if node.else_nodes:
             if len(node.else_nodes) == 1 and isinstance(node.else_nodes[0], ast.If):
                 code.append(self.lf("} else if ("))
-                code += self.parse(node.else_nodes[0])[1:-1]  # skip first and last
+                elif_code = self.parse(node.else_nodes[0])
+                if len(elif_code) == 3:  # folded, see below
+                    elif_code = [None, elif_code[1], ") {", elif_code[2][2:], None]
+                code.append(elif_code[1:-1])  # skip first and last
             else:
                 code.append(self.lf("} else {"))
                 self._indent += 1
                 for stmt in node.else_nodes:
-                    code += self.parse(stmt)
+                    code.append(self.parse(stmt))
                 self._indent -= 1
         code.append(self.lf("}"))  # last part (popped in elif parsing)
+
+        # Fold a block with a single one-line statement, e.g. "if (x) y = 1;"
+        if self._minify and not node.else_nodes and len(code) == 5:
+            body = "".join(iter_parts(code[3:4]))
+            if body.count("\n") == 1 and body.count(";") == 1 and body.endswith(";"):
+                code[2:] = [") " + body.lstrip()]
         return code
 
     def parse_For(self, node):
@@ -556,6 +698,7 @@ class Parser2(Parser1):
         iter = None  # what to iterate over
         sure_is_dict = False  # flag to indicate that we're sure iter is a dict
         sure_is_range = False  # dito for range
+        sure_is_slice = False  # dito for a slice that we need not copy
 
         # First see if this for-loop is something that we support directly
         if isinstance(node.iter_node, ast.Call):
@@ -572,6 +715,12 @@ class Parser2(Parser1):
                     "".join(self.parse(arg)) for arg in node.iter_node.arg_nodes
                 ]
                 iter = "range"  # stub to prevent the parsing of iter_node below
+        elif _iterates_over_slice(node):
+            slice_node = node.iter_node.slice_node
+            sure_is_slice = [unify(self.parse(node.iter_node.value_node))]
+            for n in (slice_node.lower_node, slice_node.upper_node):
+                sure_is_slice.append(None if n is None else unify(self.parse(n)))
+            iter = "slice"  # stub to prevent the parsing of iter_node below
 
         # Otherwise we parse the iter
         if iter is None:
@@ -587,7 +736,9 @@ class Parser2(Parser1):
                     "Iteration over a dict with .items() needs two iterators."
                 )
         elif isinstance(node.target_node, ast.Tuple):
-            target = ["".join(self.parse(t)) for t in node.target_node.element_nodes]
+            target = [
+                "".join(self.parse_target(t)) for t in node.target_node.element_nodes
+            ]
             if sure_is_dict:
                 if not (sure_is_dict == "items" and len(target) == 2):
                     raise JSError(
@@ -599,22 +750,15 @@ class Parser2(Parser1):
         else:
             raise JSError("Invalid iterator in for-loop")
 
+        # Prepare variable to detect else
+        else_dummy = self.dummy("els") if node.else_nodes else None
+
         # Collect body and else-body
-        for_body = []
-        for_else = []
-        self._indent += 1
-        for n in node.body_nodes:
-            for_body += self.parse(n)
-        for n in node.else_nodes:
-            for_else += self.parse(n)
-        self._indent -= 1
+        for_body, for_else = self._parse_loop_body(node, else_dummy)
 
         # Init code
         code = []
-
-        # Prepare variable to detect else
-        if node.else_nodes:
-            else_dummy = self.dummy("els")
+        if else_dummy:
             code.append(self.lf("%s = true;" % else_dummy))
 
         # Declare iteration variables if necessary
@@ -640,6 +784,32 @@ class Parser2(Parser1):
             code.append(self.lf(t))
             self._indent += 1
 
+        elif sure_is_slice:  # Explicit iteration over the indices of a slice
+            seq, lower, upper = sure_is_slice
+            d_iter = self.dummy("itr")
+            d_target = target[0] if (len(target) == 1) else self.dummy("tgt")
+            # Get start and end, clipped like slice() does
+            length = seq + ".length"
+            if lower is None or lower.isdecimal():
+                start = lower or "0"
+            else:
+                start = self.use_std_function("op_slice_index", [lower, length])
+            end = self.dummy("end")
+            if upper is None:
+                code.append(self.lf("%s = %s;" % (end, length)))
+            elif upper.isdecimal():
+                code.append(self.lf("%s = Math.min(%s, %s);" % (end, upper, length)))
+            else:
+                value = self.use_std_function("op_slice_index", [upper, length])
+                code.append(self.lf("%s = %s;" % (end, value)))
+            # The loop
+            t = "for ({i} = {start}; {i} < {end}; {i} += 1) {{"
+            code.append(self.lf(t.format(i=d_iter, start=start, end=end)))
+            self._indent += 1
+            code.append(self.lf("%s = %s[%s];" % (d_target, seq, d_iter)))
+            if len(target) > 1:
+                code.append(self.lf(self._iterator_assign(d_target, *target)))
+
         elif sure_is_dict:  # Enumeration over an object (i.e. a dict)
             # Create dummy vars
             d_seq = self.dummy("seq")
@@ -663,45 +833,51 @@ class Parser2(Parser1):
             # sequence. Peformance for arrays should be good. For
             # objects probably slightly less.
 
+            # Iterators (e.g. generators) are consumed lazily via the iterator
+            # protocol. In that case the sequence var holds the result of next().
+
             # Create dummy vars
             d_seq = self.dummy("seq")
             d_iter = self.dummy("itr")
+            d_gen = self.dummy("gen")
             d_target = target[0] if (len(target) == 1) else self.dummy("tgt")
 
             # Ensure our iterable is indeed iterable
-            code.append(self._make_iterable(iter, d_seq))
+            code.append(self._make_iterable(iter, d_seq, d_gen))
 
             # The loop
             code.append(
                 self.lf(
-                    "for (%s = 0; %s < %s.length; %s += 1) {"
-                    % (d_iter, d_iter, d_seq, d_iter)
+                    "for (%s = 0; (%s === null) ? (%s < %s.length) : "
+                    "!(%s = %s.next()).done; %s += 1) {"
+                    % (d_iter, d_gen, d_iter, d_seq, d_seq, d_gen, d_iter)
                 )
             )
             self._indent += 1
-            code.append(self.lf("%s = %s[%s];" % (d_target, d_seq, d_iter)))
+            code.append(
+                self.lf(
+                    "%s = (%s === null) ? %s[%s] : %s.value;"
+                    % (d_target, d_gen, d_seq, d_iter, d_seq)
+                )
+            )
             if len(target) > 1:
                 code.append(self.lf(self._iterator_assign(d_target, *target)))
 
         # The body of the loop
-        code += for_body
+        code.append(for_body)
         self._indent -= 1
         code.append(self.lf("}"))
 
         # Handle else
-        if node.else_nodes:
+        if else_dummy:
             code.append(" if (%s) {" % else_dummy)
-            code += for_else
+            code.append(for_else)
             code.append(self.lf("}"))
-            # Update all breaks to set the dummy. We overwrite the
-            # "break;" so it will not be detected by a parent loop
-            ii = [i for i, part in enumerate(code) if part == "break;"]
-            for i in ii:
-                code[i] = "%s = false; break;" % else_dummy
 
         return code
 
-    def _make_iterable(self, name1, name2, newlines=True):
+    def _make_iterable(self, name1, name2, name3, newlines=True):
+        # name3 is set to the iterator if name1 is one, and to null otherwise
         code = []
         lf = self.lf
         if not newlines:  # pragma: no cover
@@ -709,60 +885,80 @@ class Parser2(Parser1):
 
         if name1 != name2:
             code.append(lf("%s = %s;" % (name2, name1)))
+        code.append(lf("%s = null;" % name3))
         code.append(
             lf(
                 'if ((typeof %s === "object") && '
                 "(!Array.isArray(%s))) {" % (name2, name2)
             )
         )
-        code.append(" %s = Object.keys(%s);" % (name2, name2))
+        code.append(
+            ' if (typeof %s.__iter__ === "function") {%s = %s = %s.__iter__();}'
+            % (name2, name3, name2, name2)
+        )
+        code.append(
+            " else if %s {%s = %s;} else {%s = Object.keys(%s);}"
+            % (
+                IS_ITERATOR_TEMPLATE.replace("X", name2),
+                name3,
+                name2,
+                name2,
+                name2,
+            )
+        )
         code.append("}")
         return "".join(code)
 
     def parse_While(self, node):
-        test = "".join(self.parse(node.test_node))
+        test = self._wrap_truthy(node.test_node)
+
+        # Prepare variable to detect else
+        else_dummy = self.dummy("els") if node.else_nodes else None
 
         # Collect body and else-body
-        for_body = []
-        for_else = []
-        self._indent += 1
-        for n in node.body_nodes:
-            for_body += self.parse(n)
-        for n in node.else_nodes:
-            for_else += self.parse(n)
-        self._indent -= 1
+        for_body, for_else = self._parse_loop_body(node, else_dummy)
 
         # Init code
         code = []
-
-        # Prepare variable to detect else
-        if node.else_nodes:
-            else_dummy = self.dummy("els")
+        if else_dummy:
             code.append(self.lf("%s = true;" % else_dummy))
 
         # The loop itself
         code.append(self.lf("while (%s) {" % test))
         self._indent += 1
-        code += for_body
+        code.append(for_body)
         self._indent -= 1
         code.append(self.lf("}"))
 
         # Handle else
-        if node.else_nodes:
+        if else_dummy:
             code.append(" if (%s) {" % else_dummy)
-            code += for_else
+            code.append(for_else)
             code.append(self.lf("}"))
-            # Update all breaks to set the dummy. We overwrite the
-            # "break;" so it will not be detected by a parent loop
-            ii = [i for i, part in enumerate(code) if part == "break;"]
-            for i in ii:
-                code[i] = "%s = false; break;" % else_dummy
 
         return code
 
+    def _parse_loop_body(self, node, else_dummy):
+        """Parse the body and else-body of a for- or while-loop. Breaks
+        in the body set the else_dummy (if given) to skip the else-body.
+        """
+        for_body = []
+        for_else = []
+        self._indent += 1
+        self._loop_stack.append(else_dummy)
+        for n in node.body_nodes:
+            for_body.append(self.parse(n))
+        self._loop_stack.pop(-1)
+        for n in node.else_nodes:
+            for_else.append(self.parse(n))
+        self._indent -= 1
+        return for_body, for_else
+
     def parse_Break(self, node):
-        # Note that in parse_For, we detect breaks and modify them to
-        # deal with the for-else clause
+        # Set the dummy for the else-clause of the loop that we break out of
+        else_dummy = self._loop_stack[-1] if self._loop_stack else None
+        if else_dummy:
+            return [self.lf(), "%s = false; break;" % else_dummy]
         return [self.lf(), "break;"]
 
     def parse_Continue(self, node):
@@ -791,15 +987,21 @@ class Parser2(Parser1):
                     self.vars.add(target[i])
             self.vars.add(prefix + "i%i" % iter)
             self.vars.add(prefix + "iter%i" % iter)
+            self.vars.add(prefix + "iter%i_nxt" % iter)
 
             # comprehension(target_node, iter_node, if_nodes)
-            cc.append("iter# = %s;" % "".join(self.parse(comprehension.iter_node)))
-            cc.append(
-                'if ((typeof iter# === "object") && '
-                "(!Array.isArray(iter#))) {iter# = Object.keys(iter#);}"
-            )
-            cc.append("for (i#=0; i#<iter#.length; i#++) {")
-            cc.append(self._iterator_assign("iter#[i#]", *target))
+            range_loop = self._get_range_loop(comprehension.iter_node, target)
+            if range_loop:  # Explicit iteration, like in a for-loop
+                start, end, compare, step = range_loop
+                cc.append("i# = %s; iter# = %s;" % (start, end))
+                cc.append("for (; i#%siter#; i#+=%s) {" % (compare, step))
+                cc.append(self._iterator_assign("i#", *target))
+            else:
+                iter_code = "".join(self.parse(comprehension.iter_node))
+                cc.append("iter# = %s;" % iter_code)
+                cc.append(ITERABLE_TEMPLATE)
+                cc.append("for (i#=0; i#<iter#.length; i#++) {")
+                cc.append(self._iterator_assign("iter#[i#]", *target))
             # Ifs
             if comprehension.if_nodes:
                 cc.append("if (!(")
@@ -839,21 +1041,34 @@ class Parser2(Parser1):
                     for t in comprehension.target_node.element_nodes
                 ]
             else:
-                target = ["".join(self.parse(comprehension.target_node))]
+                target = ["".join(self.parse_target(comprehension.target_node))]
             for t in target:
                 vars.append(t)
             vars.append("i%i" % iter)
+            vars.append("iter%i_nxt" % iter)
 
             # comprehension(target_node, iter_node, if_nodes)
-            if iter > 0:  # first one is passed to function as an arg
-                cc.append("iter# = %s;" % "".join(self.parse(comprehension.iter_node)))
-                vars.append("iter%i" % iter)
-            cc.append(
-                'if ((typeof iter# === "object") && '
-                "(!Array.isArray(iter#))) {iter# = Object.keys(iter#);}"
-            )
-            cc.append("for (i#=0; i#<iter#.length; i#++) {")
-            cc.append(self._iterator_assign("iter#[i#]", *target))
+            # The first iterable is passed to the function as an arg
+            range_loop = self._get_range_loop(comprehension.iter_node, target)
+            if range_loop:  # Explicit iteration, like in a for-loop
+                start, end, compare, step = range_loop
+                if iter > 0:
+                    cc.append("i# = %s; iter# = %s;" % (start, end))
+                    vars.append("iter%i" % iter)
+                else:
+                    iter0 = [end, start]  # i0 is passed as an arg too
+                cc.append("for (; i#%siter#; i#+=%s) {" % (compare, step))
+                cc.append(self._iterator_assign("i#", *target))
+            else:
+                iter_code = "".join(self.parse(comprehension.iter_node))
+                if iter > 0:
+                    cc.append("iter# = %s;" % iter_code)
+                    vars.append("iter%i" % iter)
+                else:
+                    iter0 = [iter_code]
+                cc.append(ITERABLE_TEMPLATE)
+                cc.append("for (i#=0; i#<iter#.length; i#++) {")
+                cc.append(self._iterator_assign("iter#[i#]", *target))
             # Ifs
             if comprehension.if_nodes:
                 cc.append("if (!(")
@@ -874,14 +1089,15 @@ class Parser2(Parser1):
             code.append("}")  # end for
         # Finalize
         code.append("return res;})")  # end function
-        iter0 = "".join(self.parse(node.comp_nodes[0].iter_node))
-        code.append(".call(this, " + iter0 + ")")  # call funct with iter as 1st arg
+        if len(iter0) > 1:
+            code[0] = "(function list_comprehension (iter0, i0) {"
+        code.append(".call(this, " + ", ".join(iter0) + ")")  # iter is 1st arg
         code.insert(2, "var %s;" % ", ".join(vars))
         # Clean vars
         for var in vars:
             self.vars.add(var)
         self.pop_stack()
-        return code
+        return JSExpr("".join(code), PREC_ATOM, "array")
 
         # todo: apply the apply(this) trick everywhere where we use a function
 
@@ -890,6 +1106,37 @@ class Parser2(Parser1):
     # DictComp
     # comprehension
 
+    def _get_range_loop(self, node, target):
+        """Get the (start, end, compare, step) to loop over a call to range()
+        without creating a range object, or None if node is not such a call.
+        The step must be a literal, so that we know the direction of the loop.
+        """
+        if not (
+            isinstance(node, ast.Call)
+            and isinstance(node.func_node, ast.Name)
+            and node.func_node.name in ("xrange", "range")
+            and 1 <= len(node.arg_nodes) <= 3
+            and not node.kwarg_nodes
+            and len(target) == 1
+        ):
+            return None
+        arg_nodes = node.arg_nodes
+        if any(isinstance(arg, ast.Starred) for arg in arg_nodes):
+            return None
+        compare = "<"
+        if len(arg_nodes) == 3:
+            if _is_negative_literal(arg_nodes[2]):
+                compare = ">"
+            elif not (isinstance(arg_nodes[2], ast.Num) and arg_nodes[2].value > 0):
+                return None
+        args = ["".join(self.parse(arg)) for arg in arg_nodes]
+        if len(args) == 1:
+            args.insert(0, "0")
+        if len(args) == 2:
+            args.append("1")
+        start, end, step = args
+        return start, end, compare, step
+
     def _iterator_assign(self, val, *names):
         if len(names) == 1:
             return "%s = %s;" % (names[0], val)
@@ -927,11 +1174,13 @@ class Parser2(Parser1):
                 self.vars.add(node.name)
                 self._seen_func_names.add(node.name)
             code.append(self.lf("%s = " % prefixed))
+        is_generator = not lambda_ and _contains_yield(node.body_nodes)
         code.append(
-            "%s%sfunction %s%s("
+            "%s%sfunction%s %s%s("
             % (
                 "(" if binder else "",
                 "async " if asyn else "",
+                "*" if is_generator else "",
                 func_name,
                 " " if func_name else "",
             )
@@ -943,11 +1192,10 @@ class Parser2(Parser1):
             name = self.NAME_MAP.get(arg.name, arg.name)
             if name != "this":
                 argnames.append(name)
-                # Add code and comma
-                code.append(name)
-                code.append(", ")
-        if argnames:
-            code.pop(-1)  # pop last comma
+        # Keyword-only args can also be passed positionally, see kwonly_as_args()
+        kwonly_args = not lambda_ and kwonly_as_args(node)
+        kwonly_names = [arg.name for arg in node.kwarg_nodes] if kwonly_args else []
+        code.append(", ".join(argnames + kwonly_names))
 
         # Check
         if (not lambda_) and node.decorator_nodes:
@@ -962,6 +1210,12 @@ class Parser2(Parser1):
         code.append(") {")
         pre_code, code = code, []
         self._indent += 1
+        instrument_label = None
+        if self._instrument and not (lambda_ or is_generator):
+            # Generators are not instrumented: a generator that is not
+            # exhausted never exits, so its time would not be recorded
+            instrument_label = self._get_instrument_label(node.name)
+            self._indent += 1  # the body goes in a try-block
         self.push_stack("function", "" if lambda_ else node.name)
 
         # Add argnames to known vars
@@ -994,6 +1248,7 @@ class Parser2(Parser1):
                 kw_argnames.add(arg.name)
                 names.append("'%s'" % arg.name)
                 values.append("".join(self.parse(arg.value_node)))
+            kw_defaults = values
             # Turn into string representation
             names = "[" + ", ".join(names) + "]"
             values = "[" + ", ".join(values) + "]"
@@ -1003,18 +1258,20 @@ class Parser2(Parser1):
             if node.kwarg_nodes:
                 values_var = self.dummy("kw_values")
                 kw_argnames.add(values_var)
-                code += [self.lf(values_var), " = ", values, ";"]
+                if not kwonly_args:
+                    code += [self.lf(values_var), " = ", values, ";"]
             else:
                 values_var = values
             # Enter if to actually parse kwargs
+            marker = self.get_std_function_name("op_kwargs")
             code.append(
-                self.lf(
-                    "if (arguments.length == 1 && typeof arguments[0] == 'object' && "
-                    "Object.keys(arguments[0]).toString() == 'flx_args,flx_kwargs') {"
-                )
+                self.lf("if (arguments.length == 1 && arguments[0] instanceof ")
             )
+            code.append(marker + ") {")
             self._indent += 1
             # Call function to parse args
+            if kwonly_args:  # otherwise the values are needed outside the if
+                code += [self.lf(values_var), " = ", values, ";"]
             code += [self.lf()]
             if node.kwargs_node:
                 kw_argnames.add(node.kwargs_node.name)
@@ -1039,6 +1296,8 @@ class Parser2(Parser1):
                 code.append(self.lf("%s = arguments[0].flx_args;" % args_var))
             for i, name in enumerate(argnames):
                 code.append(self.lf("%s = %s[%i];" % (name, args_var, i)))
+            for i, name in enumerate(kwonly_names):
+                code.append(self.lf("%s = %s[%i];" % (name, values_var, i)))
             # End if
             if vararg_code2:
                 code.append(self.lf(vararg_code2))
@@ -1050,8 +1309,9 @@ class Parser2(Parser1):
             # outside if, because these need to be assigned always
             # Note that we cannot use destructuring assignment because not all
             # browsers support it (meh IE and Safari!)
-            for i, arg in enumerate(node.kwarg_nodes):
-                code.append(self.lf("%s = %s[%i];" % (arg.name, values_var, i)))
+            if not kwonly_args:
+                for i, arg in enumerate(node.kwarg_nodes):
+                    code.append(self.lf("%s = %s[%i];" % (arg.name, values_var, i)))
         else:
             if vararg_code1:
                 code.append(self.lf(vararg_code1))
@@ -1063,6 +1323,10 @@ class Parser2(Parser1):
                 d = "".join(self.parse(arg.value_node))
                 x = "%s = (%s === undefined) ? %s: %s;" % (name, name, d, name)
                 code.append(self.lf(x))
+        for i, name in enumerate(kwonly_names):
+            d = kw_defaults[i]
+            x = "%s = (%s === undefined) ? %s: %s;" % (name, name, d, name)
+            code.append(self.lf(x))
 
         # Apply content
         if lambda_:
@@ -1070,8 +1334,8 @@ class Parser2(Parser1):
             code += self.parse(node.body_node)
             code.append(";")
         else:
-            docstring = self.pop_docstring(node)
-            if docstring and not node.body_nodes:
+            docstring, body_nodes = self.split_docstring(node)
+            if docstring and not body_nodes:
                 # Raw JS - but deprecated
                 logger.warning(RAW_DOC_WARNING % node.name)
                 for line in docstring.splitlines():
@@ -1081,8 +1345,8 @@ class Parser2(Parser1):
                 if self._docstrings:
                     for line in docstring.splitlines():
                         code.append(self.lf("// " + line))
-                for child in node.body_nodes:
-                    code += self.parse(child)
+                for child in body_nodes:
+                    code.append(self.parse(child))
 
         # Wrap up
         if lambda_:
@@ -1096,10 +1360,13 @@ class Parser2(Parser1):
             assert set(ns) == kw_argnames
             pre_code.append(self.get_declarations(ns))
         else:
-            if not (code and code[-1].strip().startswith("return ")):
+            if not last_part(code).strip().startswith("return "):
                 code.append(self.lf("return null;"))
+            if instrument_label:
+                self._indent -= 1
+                code = self._instrument_function(instrument_label, code)
             # Declare vars, but exclude our argnames
-            for name in argnames:
+            for name in argnames + kwonly_names:
                 self.vars.discard(name)
             ns = self.pop_stack()
             pre_code.append(self.get_declarations(ns))
@@ -1109,6 +1376,31 @@ class Parser2(Parser1):
             code.append(self.lf("}%s;\n" % binder))
         return pre_code + code
 
+    def _get_instrument_label(self, name):
+        """Get the JS expression for the label of a function in the
+        profile. Methods are labeled using the __name__ of the class.
+        """
+        nstype, nsname, _ = self._stack[-1]
+        if nstype == "class":
+            return "%s.prototype.__name__ + %s" % (nsname, reprs("." + name))
+        names = [nsname for nstype, nsname, _ in self._stack if nstype != "module"]
+        return reprs(".".join(names + [name]))
+
+    def _instrument_function(self, label, code):
+        """Wrap the code of a function body to count calls and measure
+        the time spent in it.
+        """
+        stats, t0 = self.dummy("profile"), self.dummy("t0")
+        enter = self.use_std_function("op_profile_enter", [label])
+        now = self.use_std_function("perf_counter", [])
+        exit = self.use_std_function("op_profile_exit", [stats, t0])
+        return (
+            [self.lf("%s = %s;" % (stats, enter)), self.lf("%s = %s;" % (t0, now))]
+            + [self.lf("try {")]
+            + code
+            + [self.lf("} finally {"), self.lf("    %s;" % exit), self.lf("}")]
+        )
+
     def parse_Lambda(self, node):
         return self.parse_FunctionDef(node, True)
 
@@ -1143,7 +1435,7 @@ class Parser2(Parser1):
 
         # Define function that acts as class constructor
         code = []
-        docstring = self.pop_docstring(node)
+        docstring, body_nodes = self.split_docstring(node)
         docstring = docstring if self._docstrings else ""
         for line in get_class_definition(node.name, base_class, docstring):
             code.append(self.lf(line))
@@ -1153,8 +1445,8 @@ class Parser2(Parser1):
         self.vars.add(node.name)
         self._seen_class_names.add(node.name)
         self.push_stack("class", node.name)
-        for sub in node.body_nodes:
-            code += self.parse(sub)
+        for sub in body_nodes:
+            code.append(self.parse(sub))
         code.append("\n")
         self.pop_stack()
         # no need to declare variables, because they're prefixed
@@ -1185,8 +1477,13 @@ class Parser2(Parser1):
         base_class = nsname2
         return "%s.prototype._base_class" % base_class
 
-    # def parse_Yield
-    # def parse_YieldFrom
+    def parse_Yield(self, node):
+        if node.value_node is None:
+            return "yield null"
+        return "yield %s" % "".join(self.parse(node.value_node))
+
+    def parse_YieldFrom(self, node):
+        return "yield* %s" % "".join(self.parse(node.value_node))
 
     def parse_Await(self, node):
         return "await %s" % "".join(self.parse(node.value_node))
@@ -116,6 +116,10 @@ hasattr, getattr, setattr and delattr
 Creating sequences
 ------------------
 
+As in Python 3, ``range()`` produces a lazy (and immutable) range object,
+which supports ``len()``, indexing, ``in`` and iteration without
+allocating its elements. Use ``list(range(...))`` to get an array.
+
 .. pscript_example::
 
     range(10)
@@ -328,10 +332,20 @@ class Parser3(Parser2):
         return "console.log(" + args_concat + end + ")"
 
     def function_len(self, node):
-        if len(node.arg_nodes) == 1:
-            return unify(self.parse(node.arg_nodes[0])), ".length"
-        else:
+        if len(node.arg_nodes) != 1:
             return None  # don't apply this feature
+        arg = node.arg_nodes[0]
+        if (
+            isinstance(arg, ast.Subscript)
+            and isinstance(arg.slice_node, ast.Slice)
+            and arg.slice_node.step_node is None
+        ):
+            # The length of a slice, without copying
+            args = [arg.value_node, arg.slice_node.lower_node or "undefined"]
+            if arg.slice_node.upper_node is not None:
+                args.append(arg.slice_node.upper_node)
+            return self.use_std_function("op_len_slice", args)
+        return unify(self.parse(arg)), ".length"
 
     def function_max(self, node):
         if len(node.arg_nodes) == 0:
@@ -446,44 +460,36 @@ class Parser3(Parser2):
 # Add functions and methods to the class, using the stdib functions ...
 
 
-def make_function(name, nargs, function_deps, method_deps):
+def make_function(name, nargs):
     def function_X(self, node):
         if node.kwarg_nodes:
             raise JSError("Function %s does not support keyword args." % name)
         if len(node.arg_nodes) not in nargs:
             raise JSError("Function %s needs #args in %r." % (name, nargs))
-        for dep in function_deps:
-            self.use_std_function(dep, [])
-        for dep in method_deps:
-            self.use_std_method("x", dep, [])
         return self.use_std_function(name, node.arg_nodes)
 
     return function_X
 
 
-def make_method(name, nargs, function_deps, method_deps):
+def make_method(name, nargs):
     def method_X(self, node, base):
         if node.kwarg_nodes:
             raise JSError("Method %s does not support keyword args." % name)
         if len(node.arg_nodes) not in nargs:
             return None  # call as-is, don't use our variant
-        for dep in function_deps:
-            self.use_std_function(dep, [])
-        for dep in method_deps:
-            self.use_std_method("x", dep, [])
         return self.use_std_method(base, name, node.arg_nodes)
 
     return method_X
 
 
 for name, code in stdlib.METHODS.items():
-    nargs, function_deps, method_deps = stdlib.get_std_info(code)
+    nargs = stdlib.get_std_info(code)[0]
     if nargs and not hasattr(Parser3, "method_" + name):
-        m = make_method(name, tuple(nargs), function_deps, method_deps)
+        m = make_method(name, tuple(nargs))
         setattr(Parser3, "method_" + name, m)
 
 for name, code in stdlib.FUNCTIONS.items():
-    nargs, function_deps, method_deps = stdlib.get_std_info(code)
+    nargs = stdlib.get_std_info(code)[0]
     if nargs and not hasattr(Parser3, "function_" + name):
-        m = make_function(name, tuple(nargs), function_deps, method_deps)
+        m = make_function(name, tuple(nargs))
         setattr(Parser3, "function_" + name, m)
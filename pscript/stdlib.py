@@ -8,7 +8,10 @@ Bokeh, jquery).
 
 """
 
+import os
 import re
+import json
+import hashlib
 
 # Functions not covered by this lib:
 # isinstance, issubclass, print, len, max, min, callable, chr, ord
@@ -17,12 +20,27 @@ FUNCTIONS = {}
 METHODS = {}
 FUNCTION_PREFIX = "_pyfunc_"
 METHOD_PREFIX = "_pymeth_"
+SHORT_FUNCTION_PREFIX = "$"  # used in minified code; dummies are $ + digits
+SHORT_METHOD_PREFIX = "$$"
+
+
+_std_info_cache = {}
 
 
 def get_std_info(code):
     """Given the JS code for a std function or method, determine the
     number of arguments, function_deps and method_deps.
     """
+    # The parser calls this for every use of a std function, so we cache
+    try:
+        nargs, function_deps, method_deps = _std_info_cache[code]
+    except KeyError:
+        nargs, function_deps, method_deps = _get_std_info(code)
+        _std_info_cache[code] = nargs, function_deps, method_deps
+    return list(nargs), list(function_deps), list(method_deps)
+
+
+def _get_std_info(code):
     _, _, nargs = code.splitlines()[0].partition("nargs:")
     nargs = [int(i.strip()) for i in nargs.strip().replace(",", " ").split(" ") if i]
     # Collect dependencies on other funcs/methods
@@ -67,11 +85,17 @@ def _update_deps(code, function_deps, method_deps):
 
 
 def get_partial_std_lib(
-    func_names, method_names, indent=0, func_prefix=None, method_prefix=None
+    func_names,
+    method_names,
+    indent=0,
+    func_prefix=None,
+    method_prefix=None,
+    minify=False,
 ):
     """Get the code for the PScript standard library consisting of
     the given function and method names. The given indent specifies how
-    many sets of 4 spaces to prepend.
+    many sets of 4 spaces to prepend. If minify is True, the code is
+    minified and uses short names (the indent is then ignored).
     """
     func_prefix = "var " + FUNCTION_PREFIX if (func_prefix is None) else func_prefix
     method_prefix = "var " + METHOD_PREFIX if (method_prefix is None) else method_prefix
@@ -85,6 +109,12 @@ def get_partial_std_lib(
         code = METHODS[name].strip()
         # lines.append('Object.prototype.%s%s = %s;' % (METHOD_PREFIX, name, code))
         lines.append("%s%s = %s;" % (method_prefix, name, code))
+    if minify:
+        for i, line in enumerate(lines):
+            if line not in _minify_cache:
+                _minify_cache[line] = minify_js(line, get_short_names())
+            lines[i] = _minify_cache[line]
+        return "".join(lines)
     code = "\n".join(lines)
     if indent:
         lines = ["    " * indent + line for line in code.splitlines()]
@@ -92,15 +122,192 @@ def get_partial_std_lib(
     return code
 
 
-def get_full_std_lib(indent=0):
+def get_full_std_lib(indent=0, minify=False):
     """Get the code for the full PScript standard library.
 
     The given indent specifies how many sets of 4 spaces to prepend.
+    If minify is True, the code is minified and uses the short names
+    that minified code uses.
     If the full stdlib is made available in JavaScript, multiple
     snippets of code can be transpiled without inlined stdlib parts by
     using ``py2js(..., inline_stdlib=False)``.
     """
-    return get_partial_std_lib(FUNCTIONS.keys(), METHODS.keys(), indent)
+    return get_partial_std_lib(FUNCTIONS.keys(), METHODS.keys(), indent, minify=minify)
+
+
+def get_std_import(func_names, method_names, path):
+    """Get an ES module import statement for the given function and
+    method names, from the ES module at the given path that exports
+    the stdlib. Returns an empty string if there is nothing to import.
+    """
+    names = [FUNCTION_PREFIX + name for name in sorted(func_names)]
+    names += [METHOD_PREFIX + name for name in sorted(method_names)]
+    if not names:
+        return ""
+    return 'import {%s} from "%s";\n\n' % (", ".join(names), path)
+
+
+def get_std_check(func_names, method_names, indent=0):
+    """Get JS code that throws an error at load time if any of the given
+    functions and methods is not defined. This is useful for code that
+    is transpiled with ``inline_stdlib=False``, to detect early that the
+    stdlib is not loaded, or is of a version that lacks a helper.
+    """
+    names = [FUNCTION_PREFIX + name for name in sorted(func_names)]
+    names += [METHOD_PREFIX + name for name in sorted(method_names)]
+    if not names:
+        return ""
+    types = ", ".join("typeof " + name for name in names)
+    code = (
+        'if ([%s].indexOf("undefined") >= 0) '
+        '{throw new Error("PScript stdlib is not loaded, this code needs: %s");}'
+    ) % (types, ", ".join(names))
+    return "    " * indent + code
+
+
+_JS_WORD = re.compile(r"[\w$]+")
+_JS_REGEXP_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^") | {"return", "typeof"}
+
+
+def get_short_names():
+    """Get a dict that maps the names of all stdlib functions and methods
+    to the shorter names used in minified code.
+    """
+    if not _short_names:
+        for name in FUNCTIONS:
+            _short_names[FUNCTION_PREFIX + name] = SHORT_FUNCTION_PREFIX + name
+        for name in METHODS:
+            _short_names[METHOD_PREFIX + name] = SHORT_METHOD_PREFIX + name
+    return _short_names
+
+
+_short_names = {}
+_minify_cache = {}  # line of stdlib code -> minified line
+
+
+def minify_js(code, names=None):
+    """Remove comments and whitespace from the given JS code. Strings and
+    regular expression literals are left alone. Newlines are only removed
+    where this cannot change the meaning of the code via automatic
+    semicolon insertion. If names is given, it is a dict that maps
+    identifiers to their replacement (e.g. from ``get_short_names()``).
+    """
+    tokens = []  # the output tokens, whitespace included
+    last = ""  # the last token that is not whitespace
+    pending = ""  # whitespace between last and the next token
+    i, n = 0, len(code)
+    while i < n:
+        c = code[i]
+        # Whitespace and comments
+        if c in " \t\r\n":
+            pending = "\n" if (c == "\n" or pending == "\n") else " "
+            i += 1
+            continue
+        elif code.startswith("//", i):
+            j = code.find("\n", i)
+            i = n if j < 0 else j
+            continue
+        elif code.startswith("/*", i):
+            i = code.index("*/", i + 2) + 2
+            pending = pending or " "
+            continue
+        # Get the next token
+        if c in "'\"`" or (c == "/" and (not last or last in _JS_REGEXP_PRECEDERS)):
+            j, in_class = i + 1, False
+            while code[j] != c or in_class:
+                if code[j] == "\\":
+                    j += 1
+                elif c == "/" and code[j] in "[]":
+                    in_class = code[j] == "["
+                j += 1
+            j += 1
+            if c == "/":  # flags
+                while j < n and (code[j].isalpha()):
+                    j += 1
+        elif _JS_WORD.match(c):
+            j = _JS_WORD.match(code, i).end()
+        else:
+            j = i + 1
+        token = code[i:j]
+        i = j
+        if names and token in names and last != ".":
+            token = names[token]
+        # Resolve the whitespace before it
+        if pending and last:
+            a, b = last[-1], token[0]
+            if _JS_WORD.match(a) and _JS_WORD.match(b):
+                tokens.append(pending)
+            elif a == b and a in "+-":
+                tokens.append(" ")
+            elif pending == "\n" and a not in "{;,([" and b not in ")]},;.":
+                tokens.append("\n")
+        pending = ""
+        tokens.append(token)
+        last = token
+    return "".join(tokens)
+
+
+def write_std_lib(dirname, module_type=None, minify=False, name="pscript-stdlib"):
+    """Write the full PScript standard library to a standalone JS file
+    in the given directory, e.g. to serve it with long-term caching.
+
+    The filename contains the PScript version and a hash of the content,
+    e.g. "pscript-stdlib-0.8.0.1a2b3c4d5e.js". The helpers are defined as
+    globals, unless module_type is given (e.g. 'umd' or 'esm', see
+    ``create_js_module()``), in which case they are the exports of the
+    module. If minify is True, comments and whitespace are removed, and
+    the helpers get the short names that minified code uses (see the
+    ``minify`` option of the parser).
+
+    The directory is created if it does not exist. Next to the file, a
+    manifest is written to "pscript-stdlib.json", which describes which
+    helpers the file contains. The manifest is also returned as a dict.
+    This function is also available as a build step:
+    ``python -m pscript stdlib DIRNAME [--module-type TYPE] [--minify]``.
+
+    Code that is transpiled with ``inline_stdlib=False`` can use this
+    stdlib. Use ``check_stdlib=True`` to check at load time that the
+    helpers that the code needs are present.
+    """
+    from . import __version__
+    from .modules import create_js_module
+
+    func_names, method_names = sorted(FUNCTIONS), sorted(METHODS)
+    func_prefix, method_prefix = FUNCTION_PREFIX, METHOD_PREFIX
+    if minify:
+        func_prefix, method_prefix = SHORT_FUNCTION_PREFIX, SHORT_METHOD_PREFIX
+    code = get_full_std_lib(minify=minify)
+    if module_type:
+        names = [func_prefix + n for n in func_names]
+        names += [method_prefix + n for n in method_names]
+        code = create_js_module(name, code, [], names, module_type)
+        if minify:
+            code = minify_js(code)
+    code = "/* PScript stdlib %s */\n%s\n" % (__version__, code.strip())
+
+    # Write, using a content hash in the filename
+    ext = ".mjs" if module_type and module_type.lower() == "esm" else ".js"
+    hash = hashlib.sha256(code.encode()).hexdigest()
+    filename = "%s-%s.%s%s" % (name, __version__, hash[:10], ext)
+    os.makedirs(dirname, exist_ok=True)
+    with open(os.path.join(dirname, filename), "wb") as f:
+        f.write(code.encode())
+
+    manifest = {
+        "filename": filename,
+        "version": __version__,
+        "sha256": hash,
+        "module_type": module_type,
+        "minified": bool(minify),
+        "size": len(code.encode()),
+        "function_prefix": func_prefix,
+        "method_prefix": method_prefix,
+        "functions": func_names,
+        "methods": method_names,
+    }
+    with open(os.path.join(dirname, name + ".json"), "wb") as f:
+        f.write(json.dumps(manifest, indent=2).encode())
+    return manifest
 
 
 # todo: now that we have modules, we can have shorter/no prefixes, right?
@@ -124,6 +331,28 @@ FUNCTIONS["perf_counter"] = """function() { // nargs: 0
 
 FUNCTIONS["time"] = """function () {return Date.now() / 1000;} // nargs: 0"""
 
+# The profile registry is a global, so that it is shared between modules
+FUNCTIONS["op_profile_enter"] = """function (label) { // nargs: 1
+    var g = typeof globalThis !== 'undefined' ? globalThis :
+            typeof window !== 'undefined' ? window :
+            typeof global !== 'undefined' ? global : {};
+    var profile = g.pscript_profile;
+    if (profile === undefined) {
+        profile = g.pscript_profile = {stats: {},
+            dump: function () {return JSON.stringify(this.stats);},
+            reset: function () {this.stats = {};}};
+    }
+    var s = profile.stats[label];
+    if (s === undefined) {s = profile.stats[label] = {enter: 0, exit: 0, time: 0, active: 0};}
+    s.enter += 1; s.active += 1;
+    return s;
+}"""
+
+FUNCTIONS["op_profile_exit"] = """function (s, t0) { // nargs: 2
+    s.exit += 1; s.active -= 1;
+    if (s.active === 0) {s.time += FUNCTION_PREFIXperf_counter() - t0;}  // not for recursive calls
+}"""
+
 ## Hardcore functions
 
 FUNCTIONS["op_instantiate"] = """function (ob, args) { // nargs: 2
@@ -159,24 +388,146 @@ FUNCTIONS["merge_dicts"] = """function () {
     return res;
 }"""
 
-# args is a list of (name, default) tuples, and is overwritten with names from kwargs
+# Calls with keyword arguments pass a single instance of this class, which the
+# called function detects with instanceof. The class is shared via a global,
+# so that code with separately inlined stdlibs can call each other.
+FUNCTIONS["op_kwargs"] = """(function () {
+    var g = typeof globalThis !== 'undefined' ? globalThis :
+            typeof window !== 'undefined' ? window :
+            typeof global !== 'undefined' ? global : {};
+    if (g.flx_kwargs_marker === undefined) {
+        g.flx_kwargs_marker = function FlxKwargs (args, kwargs) {
+            this.flx_args = args;
+            this.flx_kwargs = kwargs;
+        };
+    }
+    return g.flx_kwargs_marker;
+})()"""
+
+# arg_values holds the defaults, and is overwritten with values from kwargs.
+# Returns the remaining kwargs as a new object, so that kwargs is not modified.
 FUNCTIONS["op_parse_kwargs"] = """
 function (arg_names, arg_values, kwargs, strict) { // nargs: 3
-    for (var i=0; i<arg_values.length; i++) {
-        var name = arg_names[i];
-        if (kwargs[name] !== undefined) {
-            arg_values[i] = kwargs[name];
-            delete kwargs[name];
+    var res = {}, n = 0, keys = Object.keys(kwargs);
+    for (var j=0; j<keys.length; j++) {
+        var key = keys[j], i = arg_names.indexOf(key);
+        if (i < 0) {
+            res[key] = kwargs[key];
+            n += 1;
+        } else if (kwargs[key] !== undefined) {
+            arg_values[i] = kwargs[key];
         }
     }
-    if (strict && Object.keys(kwargs).length > 0) {
+    if (strict && n > 0) {
         throw FUNCTION_PREFIXop_error('TypeError',
             'Function ' + strict + ' does not accept **kwargs.');
     }
-    return kwargs;
+    return res;
 }""".lstrip()
 
 
+# Clip an index like slice() does, for a sequence of length n
+FUNCTIONS["op_slice_index"] = """function (i, n) { // nargs: 2
+    return (i < 0) ? Math.max(0, n + i) : Math.min(i, n);
+}"""
+
+# The length of a slice, without creating it
+FUNCTIONS["op_len_slice"] = """function (ob, i0, i1) { // nargs: 1 2 3
+    var n = ob.length;
+    i0 = (i0 === undefined) ? 0 : FUNCTION_PREFIXop_slice_index(i0, n);
+    i1 = (i1 === undefined) ? n : FUNCTION_PREFIXop_slice_index(i1, n);
+    return Math.max(0, i1 - i0);
+}"""
+
+# Clip an index like slice.indices() does, for a slice with a step
+FUNCTIONS["op_slice_step_index"] = """function (i, n, step, dflt) { // nargs: 4
+    if (i === undefined || i === null) {return dflt;}
+    if (i < 0) {return Math.max(n + i, (step < 0) ? -1 : 0);}
+    return Math.min(i, (step < 0) ? n - 1 : n);
+}"""
+
+# Slicing, e.g. x[i:j] and x[i:j:step]. Typed arrays give a view when they
+# can (like in NumPy), and a result with a step is allocated only once.
+FUNCTIONS["op_slice"] = """function (ob, start, stop, step) { // nargs: 1 2 3 4
+    if (step === undefined) {
+        return (ob.subarray !== undefined) ? ob.subarray(start, stop) : ob.slice(start, stop);
+    }
+    if (ob.__getitem__ !== undefined) {return ob.slice(start, stop, step);}
+    if (step === 0) {throw FUNCTION_PREFIXop_error('ValueError', 'slice step cannot be zero');}
+    var i, res, n = ob.length;
+    start = FUNCTION_PREFIXop_slice_step_index(start, n, step, (step < 0) ? n - 1 : 0);
+    stop = FUNCTION_PREFIXop_slice_step_index(stop, n, step, (step < 0) ? -1 : n);
+    n = Math.max(0, Math.ceil((stop - start) / step));
+    if (typeof ob === 'string') {
+        for (res = '', i = 0; i < n; i++) {res += ob[start + i * step];}
+        return res;
+    }
+    res = (ob.subarray !== undefined) ? new ob.constructor(n) : new Array(n);
+    for (i = 0; i < n; i++) {res[i] = ob[start + i * step];}
+    return res;
+}"""
+
+# Slice assignment, e.g. x[i:j] = values, in-place
+FUNCTIONS["op_setslice"] = """function (ob, start, stop, step, values) { // nargs: 5
+    var i, d, n = ob.length;
+    if (typeof ob === 'string') {
+        throw FUNCTION_PREFIXop_error('TypeError', "'str' object does not support item assignment");
+    }
+    if (values === ob || values.length === undefined) {values = FUNCTION_PREFIXlist(values);}
+    if (step === undefined || step === 1) {
+        start = (start === undefined) ? 0 : FUNCTION_PREFIXop_slice_index(start, n);
+        stop = (stop === undefined) ? n : Math.max(start, FUNCTION_PREFIXop_slice_index(stop, n));
+        d = values.length - (stop - start);
+        if (d !== 0 && ob.subarray !== undefined) {
+            throw FUNCTION_PREFIXop_error('ValueError', 'cannot resize a typed array');
+        } else if (d > 0) {
+            ob.length = n + d;
+            for (i = n - 1; i >= stop; i--) {ob[i + d] = ob[i];}
+        } else if (d < 0) {
+            for (i = stop; i < n; i++) {ob[i + d] = ob[i];}
+            ob.length = n + d;
+        }
+        for (i = 0; i < values.length; i++) {ob[start + i] = values[i];}
+        return;
+    }
+    if (step === 0) {throw FUNCTION_PREFIXop_error('ValueError', 'slice step cannot be zero');}
+    start = FUNCTION_PREFIXop_slice_step_index(start, n, step, (step < 0) ? n - 1 : 0);
+    stop = FUNCTION_PREFIXop_slice_step_index(stop, n, step, (step < 0) ? -1 : n);
+    n = Math.max(0, Math.ceil((stop - start) / step));
+    if (values.length !== n) {
+        throw FUNCTION_PREFIXop_error('ValueError', 'attempt to assign sequence of size ' +
+                                      values.length + ' to extended slice of size ' + n);
+    }
+    for (i = 0; i < n; i++) {ob[start + i * step] = values[i];}
+}"""
+
+# Slice deletion, e.g. del x[i:j:step], in-place
+FUNCTIONS["op_delslice"] = """function (ob, start, stop, step) { // nargs: 1 2 3 4
+    var i, j, count, n = ob.length;
+    if (typeof ob === 'string' || ob.subarray !== undefined) {
+        throw FUNCTION_PREFIXop_error('TypeError', 'object does not support item deletion');
+    }
+    step = (step === undefined) ? 1 : step;
+    if (step === 0) {throw FUNCTION_PREFIXop_error('ValueError', 'slice step cannot be zero');}
+    start = FUNCTION_PREFIXop_slice_step_index(start, n, step, (step < 0) ? n - 1 : 0);
+    stop = FUNCTION_PREFIXop_slice_step_index(stop, n, step, (step < 0) ? -1 : n);
+    count = Math.max(0, Math.ceil((stop - start) / step));
+    if (count === 0) {return;}
+    if (step < 0) {start += (count - 1) * step; step = -step;}
+    stop = start + count * step;
+    for (i = j = start; i < n; i++) {
+        if (i < stop && (i - start) % step === 0) {continue;}
+        ob[j++] = ob[i];
+    }
+    ob.length = j;
+}"""
+
+# Indexing with a dynamic negative index, e.g. x[-i]
+FUNCTIONS["getitem"] = """function (ob, i) { // nargs: 2
+    if (ob.__getitem__ !== undefined) {return ob.__getitem__(i);}
+    return ob[(i < 0) ? ob.length + i : i];
+}"""
+
 FUNCTIONS["op_error"] = """function (etype, msg) { // nargs: 2
     var e = new Error(etype + ': ' + msg);
     e.name = etype
@@ -204,6 +555,7 @@ FUNCTIONS["delattr"] = """function (ob, name) {  // nargs: 2
 
 FUNCTIONS["dict"] = """function (x) {
     var t, i, keys, r={};
+    if (FUNCTION_PREFIXop_iter(x) !== null) {x = FUNCTION_PREFIXlist(x);}
     if (Array.isArray(x)) {
         for (i=0; i<x.length; i++) {
             t=x[i]; r[t[0]] = t[1];
@@ -218,7 +570,11 @@ FUNCTIONS["dict"] = """function (x) {
 }"""
 
 FUNCTIONS["list"] = """function (x) {
-    var r=[];
+    var v, r=[], it = FUNCTION_PREFIXop_iter(x);
+    if (it !== null) {
+        while (!(v = it.next()).done) {r.push(v.value);}
+        return r;
+    }
     if (typeof x==="object" && !Array.isArray(x)) {x = Object.keys(x)}
     for (var i=0; i<x.length; i++) {
         r.push(x[i]);
@@ -226,23 +582,75 @@ FUNCTIONS["list"] = """function (x) {
     return r;
 }"""
 
-FUNCTIONS["range"] = """function (start, end, step) {
-    var i, res = [];
-    var val = start;
-    var n = (end - start) / step;
-    for (i=0; i<n; i++) {
-        res.push(val);
-        val += step;
+# Range objects are lazy and immutable, like in Python 3. They support len(),
+# the in operator, iteration, and indexing (the latter via a Proxy prototype,
+# so that own properties and methods are looked up at full speed).
+FUNCTIONS["range"] = """(function () {
+    var Range = function (start, stop, step) {
+        if (step === 0) {throw FUNCTION_PREFIXop_error('ValueError', 'range() arg 3 must not be zero');}
+        this.start = start; this.stop = stop; this.step = step;
+        this.length = Math.max(0, Math.ceil((stop - start) / step));
+    };
+    var index = function (ob, key) {
+        var i = (typeof key === 'string' && key.length) ? Number(key) : NaN;
+        return (i % 1 === 0 && i >= 0 && i < ob.length) ? ob.start + i * ob.step : undefined;
+    };
+    var proto = {};
+    if (typeof Proxy !== 'undefined') {
+        proto = new Proxy({}, {get: function (target, key, receiver) {
+            var val = index(receiver, key);
+            return (val === undefined) ? target[key] : val;
+        }});
     }
-    return res;
-}"""
+    Range.prototype = Object.create(proto);
+    Range.prototype.constructor = Range;
+    Range.prototype.__iter__ = function () {
+        var self = this, i = 0;
+        return FUNCTION_PREFIXop_make_iter(function () {
+            if (i >= self.length) {return {value: undefined, done: true};}
+            return {value: self.start + (i++) * self.step, done: false};
+        });
+    };
+    Range.prototype.__contains__ = function (x) {
+        if (typeof x !== 'number') {return false;}
+        var i = (x - this.start) / this.step;
+        return i % 1 === 0 && i >= 0 && i < this.length;
+    };
+    Range.prototype.__getitem__ = function (i) {
+        return index(this, String((i < 0) ? this.length + i : i));
+    };
+    Range.prototype.index = function (x) {
+        if (this.__contains__(x)) {return (x - this.start) / this.step;}
+        throw FUNCTION_PREFIXop_error('ValueError', x + ' is not in range');
+    };
+    Range.prototype.count = function (x) {
+        return this.__contains__(x) ? 1 : 0;
+    };
+    Range.prototype.slice = function (i0, i1, step) {
+        var n = this.length;
+        step = (step === undefined) ? 1 : step;
+        if (step === 0) {throw FUNCTION_PREFIXop_error('ValueError', 'slice step cannot be zero');}
+        i0 = FUNCTION_PREFIXop_slice_step_index(i0, n, step, (step < 0) ? n - 1 : 0);
+        i1 = FUNCTION_PREFIXop_slice_step_index(i1, n, step, (step < 0) ? -1 : n);
+        return new Range(this.start + i0 * this.step, this.start + i1 * this.step, this.step * step);
+    };
+    Range.prototype.toJSON = function () {
+        return Array.from(this);
+    };
+    Range.prototype.toString = function () {
+        return 'range(' + this.start + ', ' + this.stop +
+               ((this.step === 1) ? ')' : ', ' + this.step + ')');
+    };
+    Range.prototype.__repr__ = Range.prototype.toString;
+    if (typeof Symbol !== 'undefined') {Range.prototype[Symbol.iterator] = Range.prototype.__iter__;}
+    return function (start, stop, step) {return new Range(start, stop, step);};
+})()"""
 
 FUNCTIONS["format"] = """function (v, fmt) {  // nargs: 2
     fmt = fmt.toLowerCase();
     var s = String(v);
     if (fmt.indexOf('!r') >= 0) {
-        try { s = JSON.stringify(v); } catch (e) { s = undefined; }
-        if (typeof s === 'undefined') { s = v._IS_COMPONENT ? v.id : String(v); }
+        s = FUNCTION_PREFIXrepr(v);
     }
     var fmt_type = '';
     if (fmt.slice(-1) == 'i' || fmt.slice(-1) == 'f' ||
@@ -302,6 +710,11 @@ FUNCTIONS["format"] = """function (v, fmt) {  // nargs: 2
 FUNCTIONS["pow"] = "Math.pow // nargs: 2"
 
 FUNCTIONS["sum"] = """function (x) {  // nargs: 1
+    var v, r = 0, it = FUNCTION_PREFIXop_iter(x);
+    if (it !== null) {
+        while (!(v = it.next()).done) {r += v.value;}
+        return r;
+    }
     return x.reduce(function(a, b) {return a + b;});
 }"""
 
@@ -318,6 +731,9 @@ FUNCTIONS["str"] = "String // nargs: 0 1"
 
 # Note use of "_IS_COMPONENT" to check for flexx.app component classes.
 FUNCTIONS["repr"] = """function (x) { // nargs: 1
+    if (x !== null && typeof x === 'object' && typeof x.__repr__ === 'function') {
+        return x.__repr__();
+    }
     var res; try { res = JSON.stringify(x); } catch (e) { res = undefined; }
     if (typeof res === 'undefined') { res = x._IS_COMPONENT ? x.id : String(x); }
     return res;
@@ -334,32 +750,78 @@ FUNCTIONS["divmod"] = """function (x, y) { // nargs: 2
 }"""
 
 FUNCTIONS["all"] = """function (x) { // nargs: 1
+    var v, it = FUNCTION_PREFIXop_iter(x);
+    if (it !== null) {
+        while (!(v = it.next()).done) {
+            if (!FUNCTION_PREFIXtruthy(v.value)){return false;}
+        } return true;
+    }
     for (var i=0; i<x.length; i++) {
         if (!FUNCTION_PREFIXtruthy(x[i])){return false;}
     } return true;
 }"""
 
 FUNCTIONS["any"] = """function (x) { // nargs: 1
+    var v, it = FUNCTION_PREFIXop_iter(x);
+    if (it !== null) {
+        while (!(v = it.next()).done) {
+            if (FUNCTION_PREFIXtruthy(v.value)){return true;}
+        } return false;
+    }
     for (var i=0; i<x.length; i++) {
         if (FUNCTION_PREFIXtruthy(x[i])){return true;}
     } return false;
 }"""
 
 FUNCTIONS["enumerate"] = """function (iter) { // nargs: 1
-    var i, res=[];
+    var i, res=[], it = FUNCTION_PREFIXop_iter(iter);
+    if (it !== null) {
+        // Lazy if given an iterator, otherwise (e.g. a range) produce an array
+        i = 0;
+        var next = function () {
+            var v = it.next();
+            return v.done ? v : {value: [i++, v.value], done: false};
+        };
+        next = FUNCTION_PREFIXop_make_iter(next);
+        return (it === iter) ? next : FUNCTION_PREFIXlist(next);
+    }
     if ((typeof iter==="object") && (!Array.isArray(iter))) {iter = Object.keys(iter);}
     for (i=0; i<iter.length; i++) {res.push([i, iter[i]]);}
     return res;
 }"""
 
 FUNCTIONS["zip"] = """function () { // nargs: 2 3 4 5 6 7 8 9
-    var i, j, tup, arg, args = [], res = [], len = 1e20;
+    var i, j, tup, arg, args = [], its = [], res = [], len = 1e20;
+    var use_its = false, lazy = false;
     for (i=0; i<arguments.length; i++) {
         arg = arguments[i];
+        its.push(FUNCTION_PREFIXop_iter(arg));
+        if (its[i] !== null) {use_its = true; lazy = lazy || its[i] === arg; args.push(arg); continue;}
         if ((typeof arg==="object") && (!Array.isArray(arg))) {arg = Object.keys(arg);}
         args.push(arg);
         len = Math.min(len, arg.length);
     }
+    if (use_its) {
+        // Lazy if given an iterator, otherwise (e.g. a range) produce an array
+        j = 0;
+        var next = function () {
+            var v, tup = [];
+            for (var i=0; i<args.length; i++) {
+                if (its[i] === null) {
+                    if (j >= len) {return {value: undefined, done: true};}
+                    tup.push(args[i][j]);
+                } else {
+                    v = its[i].next();
+                    if (v.done) {return v;}
+                    tup.push(v.value);
+                }
+            }
+            j += 1;
+            return {value: tup, done: false};
+        };
+        next = FUNCTION_PREFIXop_make_iter(next);
+        return lazy ? next : FUNCTION_PREFIXlist(next);
+    }
     for (j=0; j<len; j++) {
         tup = []
         for (i=0; i<args.length; i++) {tup.push(args[i][j]);}
@@ -369,40 +831,107 @@ FUNCTIONS["zip"] = """function () { // nargs: 2 3 4 5 6 7 8 9
 }"""
 
 FUNCTIONS["reversed"] = """function (iter) { // nargs: 1
+    if (FUNCTION_PREFIXop_iter(iter) !== null) {return FUNCTION_PREFIXlist(iter).reverse();}
     if ((typeof iter==="object") && (!Array.isArray(iter))) {iter = Object.keys(iter);}
     return iter.slice().reverse();
 }"""
 
 FUNCTIONS["sorted"] = """function (iter, key, reverse) { // nargs: 1 2 3
+    if (FUNCTION_PREFIXop_iter(iter) !== null) {iter = FUNCTION_PREFIXlist(iter);}
     if ((typeof iter==="object") && (!Array.isArray(iter))) {iter = Object.keys(iter);}
-    var comp = function (a, b) {a = key(a); b = key(b);
-        if (a<b) {return -1;} if (a>b) {return 1;} return 0;};
-    comp = Boolean(key) ? comp : undefined;
-    iter = iter.slice().sort(comp);
-    if (reverse) iter.reverse();
-    return iter;
+    return FUNCTION_PREFIXop_sort(iter.slice(), key, reverse);
 }"""
 
 FUNCTIONS["filter"] = """function (func, iter) { // nargs: 2
     if (typeof func === "undefined" || func === null) {func = function(x) {return x;}}
+    var it = FUNCTION_PREFIXop_iter(iter);
+    if (it !== null) {
+        var next = function () {
+            var v = it.next();
+            while (!v.done && !FUNCTION_PREFIXtruthy(func(v.value))) {v = it.next();}
+            return v;
+        };
+        next = FUNCTION_PREFIXop_make_iter(next);
+        return (it === iter) ? next : FUNCTION_PREFIXlist(next);
+    }
     if ((typeof iter==="object") && (!Array.isArray(iter))) {iter = Object.keys(iter);}
     return iter.filter(func);
 }"""
 
 FUNCTIONS["map"] = """function (func, iter) { // nargs: 2
     if (typeof func === "undefined" || func === null) {func = function(x) {return x;}}
+    var it = FUNCTION_PREFIXop_iter(iter);
+    if (it !== null) {
+        var next = function () {
+            var v = it.next();
+            return v.done ? v : {value: func(v.value), done: false};
+        };
+        next = FUNCTION_PREFIXop_make_iter(next);
+        return (it === iter) ? next : FUNCTION_PREFIXlist(next);
+    }
     if ((typeof iter==="object") && (!Array.isArray(iter))) {iter = Object.keys(iter);}
     return iter.map(func);
 }"""
 
 ## Other / Helper functions
 
+FUNCTIONS["op_iter"] = """function (x) { // nargs: 1
+    // Get an iterator if x is one (e.g. a generator) or provides one via
+    // __iter__ (e.g. a range), or null otherwise (e.g. arrays and strings)
+    if (x === null || typeof x !== "object" || Array.isArray(x)) {return null;}
+    // A dict can have a "next" key, so plain objects must be JS iterators
+    if (typeof x.__iter__ === "function") {return x.__iter__();}
+    if (typeof x.next !== "function") {return null;}
+    if (x.constructor !== Object) {return x;}
+    return (typeof Symbol !== "undefined" && typeof x[Symbol.iterator] === "function") ? x : null;
+}"""
+
+FUNCTIONS["op_make_iter"] = """function (next) { // nargs: 1
+    // Create an iterator object from a function that produces {value, done}
+    var it = {next: next, __iter__: function () {return this;}};
+    if (typeof Symbol !== "undefined") {it[Symbol.iterator] = function () {return this;};}
+    return it;
+}"""
+
 FUNCTIONS["truthy"] = """function (v) {
     if (v === null || typeof v !== "object") {return v;}
     else if (v.length !== undefined) {return v.length ? v : false;}
     else if (v.byteLength !== undefined) {return v.byteLength ? v : false;}
     else if (v.constructor !== Object) {return true;}
-    else {return Object.getOwnPropertyNames(v).length ? v : false;}
+    else {for (var k in v) {if (Object.prototype.hasOwnProperty.call(v, k)) {return v;}} return false;}
+}"""
+
+# Decorate-sort-undecorate: keys are computed once per element, and we sort
+# a typed array of indices. Ties are broken by index, so that the sort is
+# stable (also with reverse) regardless of the stability of the engine's sort.
+FUNCTIONS["op_sort"] = """function (arr, key, reverse) { // nargs: 3
+    var i, n = arr.length, keys = arr, numeric = true;
+    if (key) {
+        keys = new Array(n);
+        for (i=0; i<n; i++) {keys[i] = key(arr[i]);}
+    }
+    for (i=0; i<n; i++) {if (typeof keys[i] !== "number") {numeric = false; break;}}
+    if (!key && !reverse) {
+        // Plain values, the order of equal elements does not matter
+        return arr.sort(numeric ? function (a, b) {return a - b;} : undefined);
+    }
+    var comp, idx, copy = arr.slice(), typed = typeof Float64Array !== "undefined";
+    idx = (typed && Uint32Array.prototype.sort) ? new Uint32Array(n) : new Array(n);
+    for (i=0; i<n; i++) {idx[i] = i;}
+    if (numeric) {
+        keys = typed ? new Float64Array(keys) : keys;
+        if (reverse) {comp = function (a, b) {return (keys[b] - keys[a]) || a - b;};}
+        else {comp = function (a, b) {return (keys[a] - keys[b]) || a - b;};}
+    } else {
+        var s = reverse ? -1 : 1;
+        comp = function (a, b) {
+            var ka = keys[a], kb = keys[b];
+            return (ka < kb) ? -s : ((ka > kb) ? s : a - b);
+        };
+    }
+    idx.sort(comp);
+    for (i=0; i<n; i++) {arr[i] = copy[idx[i]];}
+    return arr;
 }"""
 
 FUNCTIONS["op_equals"] = """function op_equals (a, b) { // nargs: 2
@@ -412,49 +941,91 @@ FUNCTIONS["op_equals"] = """function op_equals (a, b) { // nargs: 2
     if (a_type === "string" || a_type === "boolean" || a_type === "number") {
         return a == b;
     }
+    if (a === b) {return true;}
 
+    var i, k, x, y, n;
     if (a == null || b == null) {
     } else if (Array.isArray(a) && Array.isArray(b)) {
-        var i = 0, iseq = a.length == b.length;
-        while (iseq && i < a.length) {iseq = op_equals(a[i], b[i]); i+=1;}
-        return iseq;
+        if (a.length !== b.length) {return false;}
+        for (i=0; i<a.length; i++) {
+            x = a[i]; y = b[i];
+            if (x === y) {continue;}
+            if (x === null || typeof x !== "object") {if (x != y) {return false;}}
+            else if (!op_equals(x, y)) {return false;}
+        }
+        return true;
+    } else if (a.constructor === b.constructor && typeof a.__getitem__ === "function" &&
+               typeof a.length === "number") {
+        // Lazy sequences like ranges are equal if their elements are
+        if (a.length !== b.length) {return false;}
+        return op_equals(FUNCTION_PREFIXop_as_array(a), FUNCTION_PREFIXop_as_array(b));
     } else if (a.constructor === Object && b.constructor === Object) {
-        var akeys = Object.keys(a), bkeys = Object.keys(b);
-        akeys.sort(); bkeys.sort();
-        var i=0, k, iseq = op_equals(akeys, bkeys);
-        while (iseq && i < akeys.length)
-            {k=akeys[i]; iseq = op_equals(a[k], b[k]); i+=1;}
-        return iseq;
+        // Walk the keys of a, then check that b has no more keys; no sorting
+        var has = Object.prototype.hasOwnProperty;
+        n = 0;
+        for (k in a) {
+            if (!has.call(a, k)) {continue;}
+            if (!has.call(b, k) || !op_equals(a[k], b[k])) {return false;}
+            n += 1;
+        }
+        for (k in b) {if (has.call(b, k)) {n -= 1; if (n < 0) {return false;}}}
+        return n === 0;
     } return a == b;
 }"""
 
 FUNCTIONS["op_contains"] = """function op_contains (a, b) { // nargs: 2
     if (b == null) {
     } else if (Array.isArray(b)) {
-        for (var i=0; i<b.length; i++) {if (FUNCTION_PREFIXop_equals(a, b[i]))
-                                           return true;}
+        if (a === null || typeof a !== "object") {  // op_equals would use ==
+            for (var i=0; i<b.length; i++) {if (b[i] == a) return true;}
+        } else {
+            for (var i=0; i<b.length; i++) {if (FUNCTION_PREFIXop_equals(a, b[i]))
+                                               return true;}
+        }
         return false;
     } else if (b.constructor === Object) {
         for (var k in b) {if (a == k) return true;}
         return false;
     } else if (b.constructor == String) {
         return b.indexOf(a) >= 0;
+    } else if (typeof b.__contains__ === "function") {
+        return b.__contains__(a);
+    } else if (FUNCTION_PREFIXop_iter(b) !== null) {
+        b = FUNCTION_PREFIXop_iter(b);
+        for (var v=b.next(); !v.done; v=b.next()) {if (FUNCTION_PREFIXop_equals(a, v.value)) return true;}
+        return false;
     } var e = Error('Not a container: ' + b); e.name='TypeError'; throw e;
 }"""
 
+# Lazy sequences like ranges are added and multiplied as arrays
+FUNCTIONS["op_as_array"] = """function (x) { // nargs: 1
+    if (x === null || typeof x !== 'object' || x.__getitem__ === undefined) {return x;}
+    return Array.isArray(x) ? x : Array.from(x);
+}"""
+
 FUNCTIONS["op_add"] = """function (a, b) { // nargs: 2
     if (Array.isArray(a) && Array.isArray(b)) {
         return a.concat(b);
+    } else if (typeof a === 'object' && typeof b === 'object') {
+        a = FUNCTION_PREFIXop_as_array(a); b = FUNCTION_PREFIXop_as_array(b);
+        if (Array.isArray(a) && Array.isArray(b)) {return a.concat(b);}
     } return a + b;
 }"""
 
 FUNCTIONS["op_mult"] = """function (a, b) { // nargs: 2
     if ((typeof a === 'number') + (typeof b === 'number') === 1) {
-        if (a.constructor === String) return METHOD_PREFIXrepeat(a, b);
-        if (b.constructor === String) return METHOD_PREFIXrepeat(b, a);
-        if (Array.isArray(b)) {var t=a; a=b; b=t;}
+        if (typeof a === 'number') {var t=a; a=b; b=t;}
+        if (typeof b !== 'number' || !isFinite(b)) {
+            throw FUNCTION_PREFIXop_error('TypeError', "can't multiply sequence by " + b);
+        }
+        var reps = Math.max(0, Math.ceil(b));
+        if (a.constructor === String) return METHOD_PREFIXrepeat(a, reps);
+        a = FUNCTION_PREFIXop_as_array(a);
         if (Array.isArray(a)) {
-            var res = []; for (var i=0; i<b; i++) res = res.concat(a);
+            // Allocate once, and fill or copy in place
+            var i, j, k = 0, n = a.length, res = new Array(n * reps);
+            if (n === 1 && res.fill) {return res.fill(a[0]);}
+            for (i=0; i<reps; i++) {for (j=0; j<n; j++) {res[k++] = a[j];}}
             return res;
         }
     } return a * b;
@@ -472,6 +1043,7 @@ METHODS["append"] = """function (x) { // nargs: 1
 
 METHODS["extend"] = """function (x) { // nargs: 1
     if (!Array.isArray(this)) return this.KEY.apply(this, arguments);
+    if (FUNCTION_PREFIXop_iter(x) !== null) {x = FUNCTION_PREFIXlist(x);}
     this.push.apply(this, x);
 }"""
 
@@ -483,8 +1055,11 @@ METHODS["insert"] = """function (i, x) { // nargs: 2
 
 METHODS["remove"] = """function (x) { // nargs: 1
     if (!Array.isArray(this)) return this.KEY.apply(this, arguments);
-    for (var i=0; i<this.length; i++) {
-        if (FUNCTION_PREFIXop_equals(this[i], x)) {this.splice(i, 1); return;}
+    var i, prim = x === null || typeof x !== "object";  // op_equals would use ==
+    for (i=0; i<this.length; i++) {
+        if (prim ? this[i] == x : FUNCTION_PREFIXop_equals(this[i], x)) {
+            this.splice(i, 1); return;
+        }
     }
     var e = Error(x); e.name='ValueError'; throw e;
 }"""
@@ -495,11 +1070,7 @@ METHODS["reverse"] = """function () { // nargs: 0
 
 METHODS["sort"] = """function (key, reverse) { // nargs: 0 1 2
     if (!Array.isArray(this)) return this.KEY.apply(this, arguments);
-    var comp = function (a, b) {a = key(a); b = key(b);
-        if (a<b) {return -1;} if (a>b) {return 1;} return 0;};
-    comp = Boolean(key) ? comp : undefined;
-    this.sort(comp);
-    if (reverse) this.reverse();
+    FUNCTION_PREFIXop_sort(this, key, reverse);
 }"""
 
 ## List and dict
@@ -548,8 +1119,12 @@ METHODS["count"] = """function (x, start, stop) { // nargs: 1 2 3
     stop = Math.min(this.length, ((stop < 0) ? this.length + stop : stop));
     if (Array.isArray(this)) {
         var count = 0;
-        for (var i=0; i<this.length; i++) {
-            if (FUNCTION_PREFIXop_equals(this[i], x)) {count+=1;}
+        if (x === null || typeof x !== "object") {  // op_equals would use ==
+            for (var i=0; i<this.length; i++) {if (this[i] == x) {count+=1;}}
+        } else {
+            for (var i=0; i<this.length; i++) {
+                if (FUNCTION_PREFIXop_equals(this[i], x)) {count+=1;}
+            }
         } return count;
     } else if (this.constructor == String) {
         var count = 0, i = start;
@@ -568,8 +1143,12 @@ METHODS["index"] = """function (x, start, stop) { // nargs: 1 2 3
     start = Math.max(0, ((start < 0) ? this.length + start : start));
     stop = Math.min(this.length, ((stop < 0) ? this.length + stop : stop));
     if (Array.isArray(this)) {
-        for (var i=start; i<stop; i++) {
-            if (FUNCTION_PREFIXop_equals(this[i], x)) {return i;} // indexOf cant
+        if (x === null || typeof x !== "object") {  // op_equals would use ==
+            for (var i=start; i<stop; i++) {if (this[i] == x) {return i;}}
+        } else {
+            for (var i=start; i<stop; i++) {
+                if (FUNCTION_PREFIXop_equals(this[i], x)) {return i;} // indexOf cant
+            }
         }
     } else if (this.constructor === String) {
         var i = this.slice(start, stop).indexOf(x);
@@ -774,6 +1353,7 @@ METHODS["isupper"] = """function () { // nargs: 0
 
 METHODS["join"] = """function (x) { // nargs: 1
     if (this.constructor !== String) return this.KEY.apply(this, arguments);
+    if (FUNCTION_PREFIXop_iter(x) !== null) {x = FUNCTION_PREFIXlist(x);}
     return x.join(this);  // call join on the list instead of the string.
 }"""
 
@@ -153,6 +153,60 @@ def test_json_conversion():
     assert len(repr(roota)) < 80
 
 
+def test_bytes_conversion():
+    import pickle
+    from pscript.commonast import Node, Assign, Name, BinOp, Bytes, Num
+
+    roota = Assign([Name("foo")], BinOp("Add", Name("a"), Num(3)))
+    rootb = Assign([Name("foo")], BinOp("Add", None, Num(3.2)))
+    rootc = Assign([Name("foo")], BinOp("Add", Bytes(b"xx"), Num(4j)))
+    for node1 in (roota, rootb, rootc):
+        node2 = Node.frombytes(node1.tobytes())
+        assert node1 == node2
+        assert node1.tojson() == node2.tojson()
+        assert not hasattr(node2, "lineno")  # positions not set, so not restored
+
+    # Parsed code, with positions
+    code = open(filename1, "rb").read().decode()
+    root = commonast.parse(code)
+    root2 = Node.frombytes(root.tobytes())
+    assert root2 == root
+    assert root2.tojson() == root.tojson()
+    func1, func2 = root.body_nodes[-1], root2.body_nodes[-1]
+    assert (func2.lineno, func2.col_offset) == (func1.lineno, func1.col_offset)
+    assert func2.lineno > 1
+    # Without positions
+    data = root.tobytes(positions=False)
+    assert len(data) < len(root.tobytes()) < len(root.tojson(None))
+    assert Node.frombytes(data) == root
+    assert not hasattr(Node.frombytes(data).body_nodes[-1], "lineno")
+    # Pickle uses the binary format
+    root3 = pickle.loads(pickle.dumps(root))
+    assert root3 == root and root3.body_nodes[-1].lineno == func1.lineno
+
+    with raises(ValueError):
+        Node.frombytes(b"not a tree")
+
+
+def test_structural_eq():
+    from pscript.commonast import Assign, Name, BinOp, Num, Str, Tuple
+
+    def make(*args):
+        return Assign([Name("foo")], BinOp("Add", *args))
+
+    assert make(Name("a"), Num(3)) == make(Name("a"), Num(3))
+    assert make(Name("a"), Num(3)) != make(Name("a"), Num(4))
+    assert make(Name("a"), Num(3)) != make(Name("a"), Str("3"))
+    assert make(Name("a"), Num(3)) != make(None, Num(3))
+    assert make(None, Num(3)) != make(Name("a"), Num(3))
+    assert make(Tuple([]), Num(3)) != make(Tuple([Num(1)]), Num(3))
+    # Deep trees do not hit the recursion limit
+    node1, node2 = Num(1), Num(1)
+    for i in range(5000):
+        node1, node2 = BinOp("Add", node1, Num(i)), BinOp("Add", node2, Num(i))
+    assert node1 == node2
+
+
 def test_comments():
     code = """
     # cm0
@@ -255,6 +309,64 @@ def test_consistent_ast3():
     _compare_large_strings(_get_ref_json(filename3), js)
 
 
+class PlainConverter(commonast.NativeAstConverter):
+    """Converter that looks up the converter method for each node, like
+    the converter did before it used a dispatch table.
+    """
+
+    def _convert(self, n):
+        if n is None:
+            return None
+        val = getattr(self, "_convert_" + n.__class__.__name__)(n)
+        val.lineno = getattr(n, "lineno", 1)
+        val.col_offset = getattr(n, "col_offset", 0)
+        return val
+
+
+def _rebuild(node):
+    """Rebuild a tree using the generic Node.__init__."""
+    cls = node.__class__
+    args = []
+    for name, kind in commonast._get_slots(cls):
+        val = getattr(node, name)
+        if kind == 1:
+            val = None if val is None else _rebuild(val)
+        elif kind == 2:
+            val = [_rebuild(n) for n in val]
+        args.append(val)
+    new_node = cls.__new__(cls)
+    commonast.Node.__init__(new_node, *args)
+    for name in ("lineno", "col_offset"):
+        if hasattr(node, name):
+            setattr(new_node, name, getattr(node, name))
+    return new_node
+
+
+def test_fast_init_and_dispatch():
+    for filename in (filename1, filename3):
+        code = open(filename, "rb").read().decode()
+        for comments in (False, True):
+            root = commonast.parse(code, comments)
+            ref = PlainConverter(code).convert(comments)
+            assert root == ref
+            assert root.tojson() == ref.tojson()
+            assert _rebuild(root).tojson() == root.tojson()
+
+    # The generated __init__ also checks its args during tests
+    with raises(AssertionError):
+        commonast.Name(commonast.Name("x"))
+    with raises(TypeError):
+        commonast.Name()
+
+    # Converter methods can still be overridden in a subclass
+    class MyConverter(commonast.NativeAstConverter):
+        def _convert_Name(self, n):
+            return commonast.Name(n.id.upper())
+
+    root = MyConverter("foo + bar").convert()
+    assert root.body_nodes[0].value_node.left_node.name == "FOO"
+
+
 def test_functiondef_some_more():
     code = """
     def foo(a, b=3, *, c=4, d):
@@ -4,10 +4,13 @@
 
 import os
 import tempfile
+import subprocess
 
 from pscript.testing import run_tests_if_main, raises
 
-from pscript import py2js, evaljs, evalpy, script2js
+from pscript import py2js, evaljs, evalpy, script2js, StatsCollector
+from pscript import create_js_module, get_full_std_lib, get_all_std_names
+from pscript.functions import get_node_exe
 
 
 def test_dotted_unknowns():
@@ -36,6 +39,55 @@ def test_py2js_on_strings():
     assert py2js("list()") == "[];"
 
 
+def test_py2js_stats():
+    def foo(a, b):
+        if a:
+            return a + b
+        return [a] * 3 == b
+
+    stats = py2js(foo).meta["stats"]
+    for phase in ("extract", "convert", "parse", "stdlib", "dump", "rename"):
+        assert stats["time_" + phase] >= 0
+    assert stats["time_total"] >= stats["time_parse"]
+    assert stats["bytes_stdlib"] > stats["bytes_user"] > 0
+    assert stats["bytes_total"] == stats["bytes_user"] + stats["bytes_stdlib"]
+    assert stats["overload_helpers"] == dict(
+        op_add=1, op_mult=1, op_equals=1, op_contains=0, truthy=1
+    )
+
+    # Only helpers that are called directly are counted, not their deps
+    js = py2js("a in b")
+    assert "op_equals = function" in js
+    assert js.meta["stats"]["overload_helpers"]["op_equals"] == 0
+    assert js.meta["stats"]["overload_helpers"]["op_contains"] == 1
+
+    stats = py2js("x = 3", inline_stdlib=False).meta["stats"]
+    assert stats["bytes_stdlib"] == 0
+    assert stats["bytes_total"] == len("var x;\nx = 3;")
+    assert sum(stats["overload_helpers"].values()) == 0
+
+
+def test_stats_collector():
+    def foo(a, b):
+        return a + b
+
+    with StatsCollector() as collector:
+        py2js(foo)
+        py2js("x = a + b")
+    py2js("not collected")  # collector is no longer active
+
+    assert [name for name, stats in collector.entries] == [
+        foo.__qualname__,
+        "<string>",
+    ]
+    assert collector.totals["overload_helpers"]["op_add"] == 2
+    assert collector.totals["bytes_total"] == sum(
+        stats["bytes_total"] for _, stats in collector.entries
+    )
+    report = collector.report()
+    assert "called 2 times" in report and "<string>" in report
+
+
 def test_evaljs():
     assert evaljs("3+4") == "7"
     assert evaljs("var x = {}; x.doesnotexist") == ""  # strip undefined
@@ -272,5 +324,55 @@ def test_scripts():
     assert "foo = 42;" in jscode
     assert "define(" not in jscode
 
+    # Convert - ES module, with and without the stdlib inlined
+    script2js(pyname, module_type="esm")
+    jscode = open(pyname[:-3] + ".mjs", "rb").read().decode()
+    assert "foo = 42;" in jscode
+    assert "export {foo};" in jscode
+    assert "var _pyfunc_op_add" not in jscode  # no stdlib used
+
+    script2js(pyname, module_type="esm", minify=True)
+    jscode = open(pyname[:-3] + ".mjs", "rb").read().decode()
+    assert jscode.startswith("var foo;foo=42;console.log(foo);")
+    assert jscode.endswith("export{foo};")
+
+    with raises(ValueError):  # std_module needs esm
+        script2js(pyname, "mymodule", std_module="./stdlib.mjs")
+
+
+def test_scripts_esm():
+    dirname = tempfile.mkdtemp()
+    # A shared stdlib module
+    func_names, method_names = get_all_std_names()
+    code = create_js_module(
+        "stdlib", get_full_std_lib(), [], func_names + method_names, "esm"
+    )
+    with open(os.path.join(dirname, "stdlib.mjs"), "wb") as f:
+        f.write(code.encode())
+    # A module that imports the stdlib
+    with open(os.path.join(dirname, "mod1.py"), "wb") as f:
+        f.write(b"def add(a, b):\n    return a + b\n")
+    script2js(
+        os.path.join(dirname, "mod1.py"), module_type="esm", std_module="./stdlib.mjs"
+    )
+    jscode = open(os.path.join(dirname, "mod1.mjs"), "rb").read().decode()
+    assert 'import {_pyfunc_op_add, _pyfunc_op_as_array} from "./stdlib.mjs";' in jscode
+    assert "var _pyfunc_" not in jscode
+    assert "export {add};" in jscode
+    # A module that imports the first module, and inlines the stdlib
+    jscode = py2js("def double(x):\n    return mod1.add(x, x) * 1")
+    code = create_js_module("mod2", jscode, ["./mod1.mjs as mod1"], ["double"], "esm")
+    with open(os.path.join(dirname, "mod2.mjs"), "wb") as f:
+        f.write(code.encode())
+
+    # Run it with Node
+    with open(os.path.join(dirname, "main.mjs"), "wb") as f:
+        f.write(b'import {double} from "./mod2.mjs";\n')
+        f.write(b"console.log(JSON.stringify(double([1, 2])));\n")
+    res = subprocess.check_output(
+        [get_node_exe(), os.path.join(dirname, "main.mjs")], stderr=subprocess.STDOUT
+    )
+    assert res.decode().strip() == "[1,2,1,2]"
+
 
 run_tests_if_main()
@@ -0,0 +1,105 @@
+"""Tests for the linker, that bundles transpiled code with a shared stdlib."""
+
+from pscript.testing import run_tests_if_main, raises
+
+from pscript import py2js, evaljs, link, stdlib
+
+
+# A minimal synchronous AMD loader, which requires modules to be in order
+DEFINE = """
+var modules = {};
+var define = function (name, deps, factory) {
+    modules[name] = factory.apply(null, deps.map(function (d) {return modules[d];}));
+};
+"""
+
+CODE_A = """
+def add(a, b):
+    return a + b
+"""
+
+CODE_B = """
+def double_all(items):
+    return [a.add(x, x) for x in items if x]
+"""
+
+
+def test_link_snippets():
+    snippets = [py2js("x = a + b"), py2js("y = [1] * 3 == c + d"), py2js("z = 3")]
+    js = link(snippets)
+    assert js.count("var _pyfunc_op_add =") == 1
+    assert js.count("var _pyfunc_op_equals =") == 1
+    assert "x = _pyfunc_op_add(a, b);" in js
+    assert "var z;\nz = 3;" in js
+    assert js.meta["order"] == [None, None, None]
+    assert js.meta["std_functions"] == {
+        "op_add",
+        "op_as_array",
+        "op_equals",
+        "op_error",
+        "op_mult",
+    }
+
+    stats = js.meta["stats"]
+    assert stats["bytes_total"] == len(js)
+    lib = stdlib.get_partial_std_lib(js.meta["std_functions"], js.meta["std_methods"])
+    assert stats["bytes_stdlib"] == len(lib)
+    assert stats["bytes_saved"] == len(
+        stdlib.get_partial_std_lib(["op_add", "op_as_array"], [])
+    )
+    assert stats["bytes_saved"] > sum(len(s) for s in snippets) - len(js)
+    assert stats["bytes_saved"] > len(stdlib.FUNCTIONS["op_add"])
+
+    # Snippets that do not inline the stdlib are fine too
+    js2 = link([py2js("x = a + b", inline_stdlib=False)])
+    assert js2.count("var _pyfunc_op_add =") == 1
+    assert js2.meta["stats"]["bytes_saved"] == 0
+
+    # Indented code cannot be stripped
+    with raises(ValueError):
+        link([py2js("x = a + b", indent=1)])
+
+
+def test_link_modules():
+    modules = [
+        ("b", CODE_B, ["a"], ["double_all"]),
+        ("a", py2js(CODE_A), [], None),
+        ("c", "import_b = 1", ["b as bb"], "bb.double_all([1, 0, 2])"),
+    ]
+    js = link(modules, "amd")
+    assert js.meta["order"] == ["a", "b", "c"]
+    assert js.count("var _pyfunc_op_add =") == 1
+    assert js.count("define(") == 3
+    assert 'define("b", ["a"]' in js
+    res = evaljs(DEFINE + js + "JSON.stringify(modules.c)")
+    assert res == "[2,4]"
+
+    # Minified, with a mix of minified and normal pieces
+    modules[1] = ("a", py2js(CODE_A, minify=True), [], None)
+    js2 = link(modules, "amd", minify=True)
+    assert js2.meta["order"] == ["a", "b", "c"]
+    assert js2.count("var $op_add=") == 1
+    assert "_pyfunc_" not in js2
+    assert len(js2) < 0.85 * len(js)
+    res = evaljs(DEFINE + js2 + "JSON.stringify(modules.c)")
+    assert res == "[2,4]"
+    with raises(ValueError):  # minified pieces need a minified stdlib
+        link(modules, "amd")
+    with raises(ValueError):
+        link([py2js("x = [1] * 3", minify=True)])
+
+    with raises(ValueError):  # circular
+        link([("a", CODE_A, ["b"], None), ("b", CODE_B, ["a"], None)])
+    with raises(ValueError):  # duplicate
+        link([("a", CODE_A, [], None), ("a", CODE_B, [], None)])
+    with raises(ValueError):  # invalid spec
+        link([("a", CODE_A)])
+    with raises(ValueError):  # invalid code
+        link([("a", 3, [], None)])
+    with raises(ValueError):  # invalid item
+        link(["x = 3"])
+    with raises(ValueError):  # esm modules cannot share a file
+        link([("a", CODE_A, [], None)], "esm")
+
+
+run_tests_if_main()
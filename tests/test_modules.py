@@ -40,6 +40,12 @@ def test_js_module_types():
     assert "bb" in code
     assert "return aa" in code
 
+    code = create_js_module("baz.js", CODE, ["bb"], "aa", "esm")
+    assert "define" not in code
+    assert "require" not in code
+    assert 'import * as bb from "bb";' in code
+    assert "export default aa;" in code
+
     with raises(ValueError):  # type not a str
         create_js_module("baz.js", CODE, ["bb"], "aa", 3)
 
@@ -77,6 +83,12 @@ def test_js_module_imports():
         assert '"cc"' not in code
         assert "cc, dd" in code
 
+    code = create_js_module("foo.js", CODE, ["bb as cc", "dd"], "aa", "ESM")
+    assert code.startswith('import * as cc from "bb";\nimport * as dd from "dd";\n\n')
+
+    code = create_js_module("foo.js", CODE, [], "aa", "esm")
+    assert code.startswith(CODE)
+
 
 def test_js_module_exports():
     with raises(ValueError):  # exports not a str or list
@@ -90,5 +102,8 @@ def test_js_module_exports():
     code = create_js_module("foo.js", CODE, ["bb"], ["aa", "bb"], "simple")
     assert "return {aa: aa, bb: bb}" in code
 
+    code = create_js_module("foo.js", CODE, ["bb"], ["aa", "bb"], "esm")
+    assert code.endswith("\nexport {aa, bb};\n")
+
 
 run_tests_if_main()
@@ -0,0 +1,188 @@
+"""Tests for the optimizer, that folds constants and removes dead code."""
+
+from pscript.testing import run_tests_if_main
+
+from pscript import py2js, evaljs, link, commonast
+from pscript.optimizer import optimize
+
+
+def nowhitespace(s):
+    return s.replace("\n", "").replace("\t", "").replace(" ", "")
+
+
+def test_this_is_js():
+    code = "if this_is_js():\n    x = 1\nelse:\n    x = 2\n"
+    js = py2js(code, optimize=True)
+    assert "x = 1;" in js and "x = 2" not in js and "if" not in js
+
+    code = "if not this_is_js():\n    x = 1\nelse:\n    x = 2\n"
+    js = py2js(code, optimize=True)
+    assert "x = 2;" in js and "x = 1" not in js and "if" not in js
+
+    code = "x = 1 if this_is_js() else 2"
+    assert nowhitespace(py2js(code, optimize=True)) == "varx;x=1;"
+
+    code = "if this_is_js() and foo:\n    x = 1\n"
+    assert "this_is_js" in py2js(code)
+    assert "this_is_js" not in py2js(code, optimize=True)
+    assert "if (_pyfunc_truthy(foo))" in py2js(code, optimize=True)
+
+
+def test_fold_conditions():
+    def opt(code):
+        return nowhitespace(py2js(code, inline_stdlib=False, optimize=True))
+
+    assert opt("x = not True") == "varx;x=false;"
+    assert opt("x = 3 > 2") == "varx;x=true;"
+    assert opt("x = 'a' in 'abc'") == "varx;x=true;"
+    assert opt("x = None is None") == "varx;x=true;"
+    assert opt("x = True and y") == "varx;x=y;"
+    assert opt("x = False or y or z") == "varx;x=_pyfunc_truthy(y)||z;"
+    assert opt("x = 0 and y") == "varx;x=0;"
+    assert opt("x = y and True") == "varx;x=_pyfunc_truthy(y)&&true;"
+
+    # Not folded: identity of numbers, and comparisons that fail in Python
+    assert "===" in opt("x = 3 is 3")
+    assert "<" in opt("x = 'a' < 3")
+    # Or equality that depends on the type coercion of JS
+    assert opt("x = 1 == 1.0") == "varx;x=true;"
+    assert opt("x = 'a' != 'b'") == "varx;x=true;"
+    for code in ["x = 1 == '1'", "x = True == 1", "x = None != 0"]:
+        assert "=" in opt(code).split("x=")[1]  # not folded
+        assert evaljs(py2js(code, optimize=True)) == evaljs(py2js(code))
+
+    # Branches and loops
+    code = "if 1 > 2:\n    x = 1\nelif 2 > 1:\n    x = 2\nelse:\n    x = 3\n"
+    assert opt(code) == "varx;x=2;"
+    assert opt("while False:\n    x = 1\nelse:\n    x = 2\n") == "varx;x=2;"
+    code = "def f():\n    if False:\n        return 1\n"
+    assert "if" not in opt(code)
+    assert evaljs(py2js(code + "f()", optimize=True)) == "null"
+
+
+def test_fold_arithmetic():
+    def opt(code):
+        return nowhitespace(py2js(code, inline_stdlib=False, optimize=True))
+
+    assert opt("x = 60 * 60 * 24") == "varx;x=86400;"
+    assert opt("x = 1 << 20") == "varx;x=1048576;"
+    assert opt("x = 2 ** 10 + 2 ** -1") == "varx;x=1024.5;"
+    assert opt("x = -(3 + 4)") == "varx;x=-7;"
+    assert opt("x = ~5") == "varx;x=-6;"
+    assert opt("x = 7 / 2") == "varx;x=3.5;"
+    assert opt("x = 'prefix-' + 'name'") == 'varx;x="prefix-name";'
+    assert opt("x = 'ab' * 2") == 'varx;x="abab";'
+
+    # Python semantics for floor division, which PScript implements too
+    assert opt("x = -7 // 2") == "varx;x=-4;"
+    assert opt("x = 7 % 3") == "varx;x=1;"
+
+    # Not folded: errors, values that JS cannot represent, bitwise ops
+    # that would overflow 32 bit ints in JS, string formatting
+    assert opt("x = 1 / 0") == "varx;x=1/0;"
+    assert opt("x = 10 ** 100") == "varx;x=Math.pow(10,100);"
+    assert opt("x = 2 ** 60") == "varx;x=Math.pow(2,60);"
+    assert opt("x = 1 << 40") == "varx;x=1<<40;"
+    assert opt("x = 'a' + 3") == 'varx;x="a"+3;'
+    # The runtime % is the JS one, which differs for negative operands
+    assert opt("x = -7 % 3") == "varx;x=-7%3;"
+    assert opt("x = 7 % -3") == "varx;x=7%-3;"
+    code = "X = -7\ndef f():\n    return [X % 3, -7 % 3]\nf()"
+    assert evaljs(py2js(code, optimize=True)) == evaljs(py2js(code))
+    assert "%" not in opt("x = '%i' % 3")
+
+    # No helper for overloaded operators is needed anymore
+    js = py2js("x = 'ab' * 2", optimize=True)
+    assert "op_mult" not in js and "op_mult" in py2js("x = 'ab' * 2")
+
+
+def test_fold_module_constants():
+    code = """
+PI = 3.14159
+TAU = 2 * PI
+DEBUG = False
+PREFIX = "prefix-"
+CHANGED = 1
+CHANGED += 1
+SHADOWED = 3
+Lower = 4
+def f(x):
+    if DEBUG:
+        print(x)
+    return x * TAU + CHANGED + Lower
+def g(SHADOWED):
+    return PREFIX + "name" + SHADOWED
+"""
+    js = py2js(code, inline_stdlib=False, optimize=True)
+    assert "TAU = 6.28318;" in js
+    assert "op_mult(x, 6.28318), CHANGED), Lower)" in js
+    assert 'return "prefix-name" + SHADOWED;' in js
+    assert "print" not in js and "log" not in js
+    assert evaljs(py2js(code + "f(1)", optimize=True)) == "12.28318"
+
+
+def test_remove_unreachable_code():
+    code = "def f(x):\n    return x\n    x = 3\n    print(x)\n"
+    js = py2js(code, optimize=True)
+    assert "x = 3" not in js and "print" not in js
+
+    code = "for i in range(3):\n    if i:\n        break\n        print(i)\n"
+    js = py2js(code, optimize=True)
+    assert "break;" in js and "log" not in js
+
+    code = "def f(x):\n    raise ValueError(x)\n    return x\n"
+    assert "return x" not in py2js(code, optimize=True)
+
+    # A docstring that remains is not interpreted as raw JS
+    code = 'def f():\n    """doc"""\n    if False:\n        x = 3\nf()'
+    assert "// doc" in py2js(code, optimize=True)
+    assert evaljs(py2js(code, optimize=True)) == "null"
+
+
+def test_remove_unused_functions():
+    code = """
+def helper1():
+    return 1
+def helper2():
+    return helper1() + 1
+def unused1():
+    return helper2()
+def unused2():
+    return 3
+def raw():
+    return 4
+def main():
+    return helper2() + RawJS('raw()')
+x = 2 if this_is_js() else unused2()
+"""
+    root = optimize(commonast.parse(code), ["main"])
+    names = [node.name for node in root.body_nodes if hasattr(node, "name")]
+    assert names == ["helper1", "helper2", "raw", "main"]
+
+    # Exports can be a JS expression
+    root = optimize(commonast.parse(code), "{foo: unused1}")
+    names = [node.name for node in root.body_nodes if hasattr(node, "name")]
+    assert names == ["helper1", "helper2", "unused1"]
+
+    # Via link
+    modules = [("m", code, [], ["main"])]
+    js1 = link(modules, "simple")
+    js2 = link(modules, "simple", optimize=True)
+    assert "unused1" in js1 and "unused2" in js1
+    assert "unused1" not in js2 and "unused2" not in js2
+    assert evaljs(js2 + "m.main()") == "6"
+
+    # Without explicit exports, all public functions are kept
+    js3 = link([("m", code, [], None)], "simple", optimize=True)
+    assert "unused1" in js3 and "unused2" in js3
+
+
+def test_py2js_tree():
+    code = "def f():\n    return 3\n"
+    root = commonast.parse(code)
+    js = py2js(root)
+    assert js == py2js(code)
+    assert js.meta["pyhash"] == py2js(commonast.parse(code)).meta["pyhash"]
+
+
+run_tests_if_main()
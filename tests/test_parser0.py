@@ -2,7 +2,7 @@
 
 from pscript.testing import run_tests_if_main
 
-from pscript.parser0 import unify
+from pscript.parser0 import unify, wrap, JSExpr, PREC_ATOM, PRECEDENCE
 
 
 def test_unify():
@@ -46,4 +46,22 @@ def test_unify():
     assert unify("b + {a:3}") == "(b + {a:3})"
 
 
+def test_jsexpr():
+    # Expressions carry their precedence, so unify does not inspect the code
+    atom = JSExpr("foo(a + b)", PREC_ATOM, "number", True)
+    assert unify(atom) is atom
+    assert unify([atom]) is atom
+
+    expr = JSExpr("a + b", PRECEDENCE["+"], "primitive")
+    assert unify(expr) == "(a + b)"
+    assert unify(expr).kind == "primitive"
+    assert unify(expr).precedence == PREC_ATOM
+
+    # Braces depend on the precedence of the operator
+    assert wrap(expr, PRECEDENCE["*"]) == "(a + b)"
+    assert wrap(expr, PRECEDENCE["+"]) == "(a + b)"
+    assert wrap(expr, PRECEDENCE["&&"]) == "a + b"
+    assert wrap("a + b", PRECEDENCE["&&"]) == "(a + b)"  # unknown precedence
+
+
 run_tests_if_main()
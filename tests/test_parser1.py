@@ -27,6 +27,117 @@ class TestTheParser:
         assert StubParser("xxx.bar_bar()").dump() == "xxx;"
         assert StubParser("xxx.foo_foo()").dump() == "xxx.foo_foo();"
 
+    def test_dump_to(self):
+        import io
+
+        code = "def foo(a):\n    for i in a:\n        if i:\n            return i\n"
+        parser = Parser(code * 20, indent=1)
+        js = parser.dump()
+        assert js.startswith("    var ")
+        f = io.StringIO()
+        parser.dump_to(f)
+        assert f.getvalue() == js
+        f = io.StringIO()
+        parser.dump_to(f, chunk_size=10)
+        assert f.getvalue() == js
+
+    def test_profile(self):
+        import os
+        import pstats
+        import tempfile
+        from pscript import ParserProfile
+
+        code = "def foo(a):\n    return str(a) + a.upper() + (a + (a + a))\n"
+        profile = ParserProfile()
+        js = Parser(code, profile=profile).dump()
+        assert js == Parser(code).dump()
+        Parser(code, profile=profile)  # aggregates
+
+        stats = profile.stats
+        assert stats["parse_Module"][:2] == [2, 2]
+        assert stats["function_str"][0] == 2
+        assert stats["method_upper"][0] == 2
+        # Nested BinOps are recursive calls
+        ncalls, primcalls, tottime, cumtime, callers = stats["parse_BinOp"]
+        assert (ncalls, primcalls) == (8, 2)
+        assert 0 <= tottime <= cumtime <= stats["parse_Module"][3]
+        assert set(callers) == {"parse_Return", "parse_BinOp"}
+        assert stats["parse_Module"][4] == {
+            None: [2, stats["parse_Module"][2], stats["parse_Module"][3]]
+        }
+        assert "parse_BinOp" in profile.report()
+
+        filename = os.path.join(tempfile.gettempdir(), "pscript_profile.prof")
+        profile.dump_stats(filename)
+        ps = pstats.Stats(filename)
+        assert ps.stats[("pscript", 0, "parse_BinOp")][:2] == (2, 8)
+
+    def test_minify(self):
+        code = """
+        def foo(a, b=2):
+            'docstring'
+            if a > 1:
+                a = a + 1
+            elif a < 0:
+                b = 3
+            if b:
+                print("  x  // y  ")
+            for x in [1, 2, 3]:
+                if x == 2:
+                    break
+                a += x
+            else:
+                a = 0
+            return [i * a for i in range(b) if i]
+        print(foo(3), foo(-1), [1] * 2 == [1, 1])
+        """
+        code = code.replace("\n        ", "\n")
+        js1 = py2js(code)
+        js2 = py2js(code, minify=True)
+        assert len(js2) < 0.7 * len(js1)
+        assert evaljs(js2) == evaljs(js1)
+        assert "docstring" not in js2
+        assert "  x  // y  " in js2
+        assert "    " not in js2.replace("  x  // y  ", "")
+        assert "stub" not in js2 and "$1" in js2  # dummies
+        assert "_pyfunc_" not in js2 and "$op_add(" in js2  # helpers
+        assert "if(x==2){$" in js2  # not folded, assigns else-dummy and breaks
+        assert "if($truthy(b))console.log(" in js2  # folded
+        assert "if(a>1){a=a+1;}else if(a<0){b=3;}" in js2  # elif is not folded
+
+        # Renaming also works for minified code
+        def func(x):
+            return x
+
+        class Foo:
+            pass
+
+        js = py2js(func, "bar.func", minify=True)
+        assert js == "bar.func=function flx_func(x){return x;};"
+        js = py2js(Foo, "Bar", minify=True)
+        assert js.startswith("var $op_instantiate=")
+        assert "var Bar;Bar=function(){" in js and '__name__="Bar"' in js
+
+    def test_parse_commonast_tree(self):
+        from pscript import commonast
+
+        code = "def foo(a):\n    return a + 1\n"
+        root = commonast.parse(code)
+        assert Parser(root).dump() == Parser(code).dump()
+
+        # The tree is not modified, so it can be parsed again
+        code = '"""hello"""\nclass Foo:\n    """doc"""\n    def f(self):\n'
+        code += '        """doc"""\n        if not this_is_js():\n            x = 3\n'
+        code += "        return 1\n"
+        root = commonast.parse(code)
+        bytes1 = root.tobytes()
+        js1 = Parser(root, ("<string>", 0), optimize=True).dump()
+        js2 = Parser(root, ("<string>", 0)).dump()
+        assert root.tobytes() == bytes1
+        assert js1 == Parser(code, ("<string>", 0), optimize=True).dump()
+        assert js2 == Parser(code, ("<string>", 0)).dump()
+        assert "hello" in js1 and "hello" in js2 and "this_is_js" in js2
+
     # def test_exceptions(self):
     #     raises(JSError, py2js, "foo(**kwargs)")
 
@@ -57,6 +168,14 @@ class TestExpressions:
         # But they should be if it gets more complex
         assert py2js("foo - bar > 4") == "(foo - bar) > 4;"
 
+        # Braces follow the precedence of the operators
+        assert py2js("2 + 3 * 4") == "2 + 3 * 4;"
+        assert py2js("(2 + 3) * 4") == "(2 + 3) * 4;"
+        assert py2js("2 - 3 - 4") == "2 - 3 - 4;"
+        assert py2js("2 - (3 - 4)") == "2 - (3 - 4);"
+        assert py2js("a > 1 and b < 2") == "a > 1 && b < 2;"
+        assert py2js("a > 1 and (b > 0 or c < 2)") == "a > 1 && (b > 0 || c < 2);"
+
         # Test outcome
         assert evalpy("2+3") == "5"  # Binary
         assert evalpy("6/3") == "2"
@@ -160,6 +279,14 @@ class TestExpressions:
         assert evalpy("2 * [3, 4]") == "[ 3, 4, 3, 4 ]"
         assert evalpy('"ab" * 2') == "abab"
         assert evalpy('2 * "ab"') == "abab"
+        assert evalpy("[7] * 3") == "[ 7, 7, 7 ]"
+        assert evalpy("[1, 2] * 0") == "[]"
+        assert evalpy("[1, 2] * -1") == "[]"
+        assert evalpy('"ab" * -1') == ""
+        assert evalpy("a = [[]] * 2; a[0].append(1); a") == "[ [ 1 ], [ 1 ] ]"
+        err = "try:\n  {}\nexcept TypeError:\n  'TypeError'"
+        for code in ["[1] * NaN", "Infinity * [1]", "'ab' * NaN"]:
+            assert evalpy(err.format(code)) == "TypeError"
 
         assert evalpy("a = [1, 2]; a += [3, 4]; a") == "[ 1, 2, 3, 4 ]"
         assert evalpy("a = [3, 4]; a += [1, 2]; a") == "[ 3, 4, 1, 2 ]"
@@ -252,6 +379,22 @@ class TestExpressions:
         assert evalpy(d1 + d2 + d3 + "d2 not in (1, d3, 2)") == "true"
         assert evalpy(d1 + d2 + d3 + "4 in [2, d1, 4]") == "true"
 
+        # Dicts with the same number of keys, but different keys
+        assert evalpy('{"a": 1, "b": 2} == {"a": 1, "c": 2}') == "false"
+        assert evalpy('{"a": 1} == {"a": 1, "b": 2}') == "false"
+        assert evalpy('{"a": 1, "b": 2} == {"a": 1}') == "false"
+        assert evalpy("{} == {}") == "true"
+        # Identical objects and arrays of different length
+        assert evalpy(d1 + "d1 == d1") == "true"
+        assert evalpy("[1, 2] == [1, 2, 3]") == "false"
+        assert evalpy("[[1, 2], 3] == [[1, 2], 3]") == "true"
+        assert evalpy("[[1, 2], 3] == [[1, 3], 3]") == "false"
+        # Primitives and null in containers behave like op_equals
+        assert evalpy("[1, None, 'x'].count(None)") == "1"
+        assert evalpy("[1, None, 'x'].index('x')") == "2"
+        assert evalpy("None in [1, [None], 3]") == "false"
+        assert evalpy("a = [(1, 2), 3, 4]; a.remove(3); a") == "[ [ 1, 2 ], 4 ]"
+
     def test_truthfulness_of_basic_types(self):
         # Numbers
         assert evalpy('"T" if (1) else "F"') == "T"
@@ -314,6 +457,19 @@ class TestExpressions:
         assert py2js("if True: pass").count("_truthy") == 0
         assert py2js("if a == 3: pass").count("_truthy") == 0
         assert py2js("if a is 3: pass").count("_truthy") == 0
+        assert py2js("if len(a): pass").count("_truthy") == 0
+        assert py2js("if str(a): pass").count("_truthy") == 0
+        assert py2js("if a.isdigit(): pass").count("_truthy") == 0
+        assert py2js("while a > 3: pass").count("_truthy") == 0
+        assert py2js("if a and b: pass").count("_truthy(") == 2
+
+        # Specialized tests when the kind of value is known
+        assert "[1, 2].length" in py2js("if [1, 2]: pass")
+        assert "_truthy" not in py2js("class Foo:\n pass\nif Foo(): pass")
+        assert evalpy("class Foo:\n pass\nif not Foo(): 1\nelse: 2") == "2"
+        assert evalpy("[1, 2] if [] else 3") == "3"
+        assert evalpy("x = [1] or 3\nx") == "[ 1 ]"
+        assert evalpy('x = {"hasOwnProperty": 1}\nif x: 1\nelse: 2') == "1"
 
     def test_indexing_and_slicing(self):
         c = "a = [1, 2, 3, 4, 5]\n"
@@ -325,6 +481,65 @@ class TestExpressions:
         # Slicing
         assert evalpy(c + "a[:]") == "[ 1, 2, 3, 4, 5 ]"
         assert evalpy(c + "a[1:-1]") == "[ 2, 3, 4 ]"
+        assert py2js("'abc'[1:]") == '"abc".slice(1);'
+        assert (
+            py2js("a[:2]", inline_stdlib=False) == "_pyfunc_op_slice(a, undefined, 2);"
+        )
+
+        # Slicing with a step
+        assert evalpy(c + "a[::2]") == "[ 1, 3, 5 ]"
+        assert evalpy(c + "a[::-1]") == "[ 5, 4, 3, 2, 1 ]"
+        assert evalpy(c + "a[3:0:-2]") == "[ 4, 2 ]"
+        assert evalpy(c + "a[-1:-9:-3]") == "[ 5, 2 ]"
+        assert evalpy(c + "a[::1]") == "[ 1, 2, 3, 4, 5 ]"
+        assert evalpy("'abcdef'[1::2] + 'abc'[::-1]") == "bdfcba"
+        assert (
+            evalpy("r = range(10)[8:1:-3]\n[list(r), len(r)]") == "[ [ 8, 5, 2 ], 3 ]"
+        )
+        err = "try:\n  {}\nexcept ValueError:\n  'ValueError'"
+        assert evalpy(c + err.format("a[::0]")) == "ValueError"
+
+        # Typed arrays give a view, except with a step
+        c3 = "a = Float32Array([1, 2, 3, 4])\n"
+        assert evalpy(c3 + "b = a[1:3]\nb[0] = 9\n[a[1], len(b)]") == "[ 9, 2 ]"
+        assert evalpy(c3 + "b = a[::-2]\nb[0] = 9\n[b, a[3]]") == (
+            "[ Float32Array(2) [ 9, 2 ], 4 ]"
+        )
+
+        # Slice assignment and deletion, in-place
+        assert evalpy(c + "a[1:3] = [7, 8, 9]\na") == "[ 1, 7, 8, 9, 4, 5 ]"
+        assert evalpy(c + "a[1:] = []\na") == "[ 1 ]"
+        assert evalpy(c + "a[:0] = a\na") == "[\n  1, 2, 3, 4, 5,\n  1, 2, 3, 4, 5\n]"
+        assert evalpy(c + "a[::-2] = 'xyz'\na") == "[ 'z', 2, 'y', 4, 'x' ]"
+        assert evalpy(c + err.format("a[::2] = [1, 2]")) == "ValueError"
+        assert evalpy(c + "del a[1:3]\na") == "[ 1, 4, 5 ]"
+        assert evalpy(c + "del a[::2]\na") == "[ 2, 4 ]"
+        assert evalpy(c + "del a[-2::-2]\na") == "[ 1, 3, 5 ]"
+        assert evalpy(c + "del a[:]\na") == "[]"
+        with raises(JSError):
+            py2js("a[1:] += [1]")
+
+        # Negative indices evaluate the base only once
+        c2 = c + "n = 0\ndef f():\n  global n\n  n += 1\n  return a\n"
+        js = py2js(c2 + "f()[-2]", inline_stdlib=False)
+        assert "(stub1_base = f())[stub1_base.length -2]" in js
+        assert evalpy(c2 + "[f()[-2], n]") == "[ 4, 1 ]"
+        assert evalpy(c2 + "f()[-1] = 9\n[a, n]") == "[ [ 1, 2, 3, 4, 9 ], 1 ]"
+        assert evalpy(c2 + "g = lambda: f()[-1]\n[g(), n]") == "[ 5, 1 ]"
+        assert py2js("a[-1]") == "a[a.length -1];"
+
+        # Dynamic negative indices, which may also be positive
+        assert py2js("a[-i]", inline_stdlib=False) == "_pyfunc_getitem(a, -i);"
+        assert evalpy(c + "i = 2\na[-i]") == "4"
+        assert evalpy(c + "i = -2\na[-i]") == "3"
+        assert evalpy("r = range(10)\ni = 3\nr[-i]") == "7"
+
+        # The length of a slice, without copying
+        js = py2js("len(a[1:3])", inline_stdlib=False)
+        assert js == "_pyfunc_op_len_slice(a, 1, 3);"
+        assert evalpy(c + "[len(a[1:3]), len(a[-2:]), len(a[4:2]), len(a[:-9])]") == (
+            "[ 2, 2, 0, 0 ]"
+        )
 
     def test_assignments(self):
         assert py2js("foo = 3") == "var foo;\nfoo = 3;"  # with var
@@ -1,5 +1,7 @@
 # ruff: noqa: F841
 
+import json
+
 from pscript.testing import run_tests_if_main, raises
 
 from pscript import RawJS, JSError, py2js, evaljs, evalpy
@@ -142,6 +144,51 @@ class TestConrolFlow:
         else:
             print("this should not show")
 
+    def test_for_slice(self):
+        # Iterating over a slice does not copy
+        code = "a = [1, 2, 3, 4, 5]\nb = 'abc'\nres = []\n"
+        js = py2js(code + "for x in a[1:]:\n  res += [x]", inline_stdlib=False)
+        assert "slice" not in js
+        assert "stub2_end = a.length;" in js
+        assert "for (stub1_itr = 1; stub1_itr < stub2_end; stub1_itr += 1)" in js
+        for loop, res in [
+            ("for x in a[1:]:", "[2,3,4,5]"),
+            ("for x in a[-2:]:", "[4,5]"),
+            ("for x in a[1:-1]:", "[2,3,4]"),
+            ("for x in a[:9]:", "[1,2,3,4,5]"),
+            ("for x in a[3:1]:", "[]"),
+            ("for x in b[1:]:", '["b","c"]'),
+        ]:
+            js = py2js(code + loop + "\n  res += [x]\nJSON.stringify(res)")
+            assert "op_slice(" not in js
+            assert evaljs(js) == res
+        code2 = code + "for i, x in [[1, 2], [3, 4], [5, 6]][1:]:\n  res += [i + x]"
+        assert evalpy(code2 + "\nres") == "[ 7, 11 ]"
+        code2 = code + "for x in a[2:]:\n  res += [x + a[0] + len(a)]\n"
+        assert "op_slice(" not in py2js(code2)
+        assert evalpy(code2 + "res") == "[ 9, 10, 11 ]"
+
+        # But it does when the array may be modified in the loop, also via
+        # an alias or in a function that is called
+        for body in [
+            "a.append(x)",
+            "a[0] = x",
+            "b[0] = x",
+            "b, c[0] = x",
+            "del b[0]",
+            "a = [x]",
+            "foo(a)",
+            "res.append(x)",
+            "yield x",
+        ]:
+            assert "op_slice(" in py2js("for x in a[1:]:\n  " + body)
+        code2 = code + "for x in a[1:]:\n  a.append(x)\n"
+        assert nowhitespace(evalpy(code2 + "a")) == "[1,2,3,4,5,2,3,4,5]"
+        code2 = code + "c = a\nfor x in a[3:]:\n  c.append(x)\n"
+        assert nowhitespace(evalpy(code2 + "a")) == "[1,2,3,4,5,4,5]"
+        # And for explicit copies
+        assert "op_slice(" in py2js("for x in a[:]:\n  pass")
+
     def test_while(self):
         # Test code output
         line = nowhitespace(py2js("while(True): pass"))
@@ -157,6 +204,16 @@ class TestConrolFlow:
         assert evalpy(for9 + "if i==3:break\nelse: print(99)\n0") == "0"
         assert evalpy(for9 + "if i==30:break\nelse: print(99)\n0") == "99\n0"
 
+        # Test else with nested loops, a break only applies to the inner loop
+        code = "while True:\n  for j in range(2):\n    pass\n  else:\n    break\n"
+        assert evalpy(code + "else:\n  print(99)\n0") == "0"
+        code = "i = 0\nwhile i < 2:\n  i += 1\n  while True:\n    break\n"
+        assert evalpy(code + "else:\n  print(99)\n0") == "99\n0"
+
+        # Test truthy condition
+        assert evalpy("a = [1, 2]\nwhile a:\n  a.pop()\nlen(a)") == "0"
+        assert evalpy("d = {1: 2}\nwhile d:\n  d.clear()\nbool(d)") == "false"
+
     def test_list_comprehensions(self):
         # Simple
         code1 = "[i for i in [-1, -2, 1, 2, 3]]"
@@ -225,6 +282,24 @@ class TestConrolFlow:
         code2 = "a = " + code1 + "; a == " + code1
         assert evalpy(code2) == "true"
 
+        # Ranges are looped over without creating a range object
+        for code1 in [
+            "[i * 2 for i in range(5)]",
+            "[i for i in range(2, 9, 3)]",
+            "[i for i in range(9, 2, -3)]",
+            "[(i, j) for i in range(3) for j in range(i, 0, -1) if j != 2]",
+        ]:
+            assert "__iter__" not in py2js(code1)
+            assert str(eval(code1)).replace("(", "[").replace(")", "]") == normallist(
+                evalpy(code1)
+            )
+            code2 = "a = " + code1 + "; a == " + code1
+            assert evalpy(code2) == "true"
+        # The range args are evaluated outside of the comprehension
+        assert evalpy("x = 2\n[x for x in range(x, 5)]") == "[ 2, 3, 4 ]"
+        code1 = "s = 2\n[i for i in range(0, 7, s)]"
+        assert evalpy(code1) == "[ 0, 2, 4, 6 ]"
+
     def test_listcomp_regressions(self):
         code1 = "a = [i for i in range(the_iter)]"
         js = py2js(code1)
@@ -572,9 +647,15 @@ class TestFunctions:
 
         # NOTE: if we use kwargs on a simple func, we just get weird args.
         # Checking for this case adds overhead, and quite a bit of boilerplate code
+        # Calls to a known function in the same module are resolved statically.
         code = "def foo(a=2): return a\nd = {'foo':foo}\n"
-        assert evalpy(code + "foo(a=3)") == "{ flx_args: [], flx_kwargs: { a: 3 } }"
-        assert evalpy(code + "d.foo(a=3)") == "{ flx_args: [], flx_kwargs: { a: 3 } }"
+        assert evalpy(code + "foo(a=3)") == "3"
+        # Otherwise the function receives the marker object
+        js = py2js(code + "x = d.foo(a=3)")
+        assert evaljs(js + "x instanceof _pyfunc_op_kwargs") == "true"
+        assert evaljs(js + "JSON.stringify([x.flx_args, x.flx_kwargs])") == (
+            '[[],{"a":3}]'
+        )
 
     def test_function_call_kwargs(self):
         code = "def foo(a, b=9, **x): return repr([a, b]) + repr(x);\nd = {'foo':foo}\n"
@@ -619,6 +700,78 @@ class TestFunctions:
         assert evalpy(code + "foo(1, c=8)") == "[1,2,8]{}"
         assert evalpy(code + "foo(1, d=8)") == '[1,2,3]{"d":8}'
 
+    def test_function_call_kwargs_marker(self):
+        # The marker is recognized across separately inlined stdlibs
+        js1 = py2js("def foo(a, *, b=2): return a + b")
+        js2 = py2js("x = foo(1, b=3)")
+        assert "new _pyfunc_op_kwargs([1], {b: 3})" in js2
+        code = "var foo = (function () {%s\nreturn foo;})();\n" % js1
+        code += "(function () {%s\nreturn x;})();" % js2
+        assert evaljs(code) == "4"
+
+        # The kwargs passed in are not modified
+        code = "def foo(a, *, b=2, **x): return a + b\nd = {'b': 3, 'c': 4}\n"
+        assert evalpy(code + "foo(1, **d)\nd") == "{ b: 3, c: 4 }"
+
+    def test_function_call_known_function(self):
+        # Keyword args of calls to known functions are resolved statically
+        code = "def foo(a, b=2, c=3): return [a, b, c]\n"
+        js = py2js(code + "foo(1, c=4)", inline_stdlib=False)
+        assert "foo(1, 2, 4);" in js and "op_kwargs" not in js
+        assert nowhitespace(evalpy(code + "foo(1, c=4)")) == "[1,2,4]"
+        assert nowhitespace(evalpy(code + "foo(c=4, a=1)")) == "[1,2,4]"
+        assert nowhitespace(evalpy(code + "foo(1, b=3)")) == "[1,3,3]"
+
+        # Not when arguments with side effects would be reordered
+        js = py2js(code + "foo(b=bar(), a=spam())")
+        assert "op_kwargs" in js
+        # Not when a required argument is missing
+        assert "op_kwargs" in py2js(code + "foo(b=1)")
+        # Not when the name is bound elsewhere
+        assert "op_kwargs" in py2js(code + "foo(a=1)\nfoo = bar")
+        assert "op_kwargs" in py2js(code + "def spam(foo): foo(a=1)")
+        # Not when the function has **kwargs, or *args and keyword-only args
+        assert "op_kwargs" in py2js("def foo(a, **b): pass\nfoo(a=1)")
+        assert "op_kwargs" in py2js("def foo(a, *b, c=1): pass\nfoo(1, c=1)")
+        # Not for **kwargs in the call
+        assert "op_kwargs" in py2js(code + "foo(1, **d)")
+
+        # Defaults that are not literals are applied by the function
+        code = "def foo(a, b=[], c=3): return [a, b, c]\n"
+        js = py2js(code + "foo(1, c=4)", inline_stdlib=False)
+        assert "foo(1, undefined, 4);" in js
+
+    def test_function_call_known_kwonly_args(self):
+        # Keyword-only args are trailing args in JS, if there is no *args
+        code = "def foo(a, b=2, *, c=3, d=4): return [a, b, c, d]\n"
+        js = py2js(code + "foo(1, d=5)", inline_stdlib=False)
+        assert "function flx_foo (a, b, c, d)" in js
+        assert "foo(1, 2, 3, 5);" in js
+        assert nowhitespace(evalpy(code + "foo(1, d=5)")) == "[1,2,3,5]"
+        assert nowhitespace(evalpy(code + "foo(1)")) == "[1,2,3,4]"
+        # And can also be passed in the normal way
+        code += "f = [foo]\n"
+        assert nowhitespace(evalpy(code + "f[0](1, d=5)")) == "[1,2,3,5]"
+        assert nowhitespace(evalpy(code + "f[0](1, 2, c=5)")) == "[1,2,5,4]"
+
+    def test_function_call_known_class(self):
+        code = "class foo:\n  def __init__(self, a, *, b=2): self.x = [a, b]\n"
+        js = py2js(code + "x = foo(1, b=3)", inline_stdlib=False)
+        assert "x = new foo(1, 3);" in js
+        assert nowhitespace(evalpy(code + "foo(1, b=3).x")) == "[1,3]"
+
+        # No guessing based on the name
+        js = py2js("def Foo(): pass\nx = Foo()", inline_stdlib=False)
+        assert "x = Foo();" in js
+        js = py2js("x = Foo()", inline_stdlib=False)
+        assert "x = new Foo();" in js
+
+        # The signature of an inherited __init__ is not known
+        code += "class bar(foo):\n  pass\n"
+        js = py2js(code + "x = bar(1, b=3)", inline_stdlib=False)
+        assert "x = new bar(new _pyfunc_op_kwargs([1], {b: 3}));" in js
+        assert nowhitespace(evalpy(code + "bar(1, b=3).x")) == "[1,3]"
+
     def method1(self):
         return
 
@@ -859,6 +1012,39 @@ class TestFunctions:
         assert "42" in evaljs(js + "spam()")
         # assert "42" in evaljs(js + "eggs()")  # depends on the nodejs
 
+    def test_generators(self):
+        code = "def gen(n):\n    for i in range(n):\n        yield i * 2\n"
+        assert "function* flx_gen" in py2js(code)
+        assert "function*" not in py2js("def foo():\n    return 2\n")
+        # Yield in a nested function does not make the outer one a generator
+        code2 = "def foo():\n    def bar():\n        yield 3\n    return bar\n"
+        assert py2js(code2).count("function*") == 1
+
+        assert evalpy(code + "for x in gen(3): print(x)") == "0\n2\n4"
+        assert evalpy(code + "print([x + 1 for x in gen(3)])") == "[ 1, 3, 5 ]"
+        assert evalpy(code + "a = [x for x in gen(3)]\nprint(a)") == "[ 0, 2, 4 ]"
+        # For-else and break
+        code3 = "for x in gen(9):\n    if x > 4: break\nelse:\n    print('else')\n"
+        assert evalpy(code + code3 + "print(x)") == "6"
+        code3 = "for x in gen(2):\n    pass\nelse:\n    print('else')\n"
+        assert evalpy(code + code3) == "else"
+        # Unpacking
+        code3 = "def pairs():\n    yield 1, 2\n    yield 3, 4\n"
+        assert evalpy(code3 + "for a, b in pairs(): print(a + b)") == "3\n7"
+        # Yield from and bare yield
+        code3 = "def gen2():\n    yield from gen(2)\n    yield\n"
+        assert evalpy(code + code3 + "print(list(gen2()))") == "[ 0, 2, null ]"
+        # Generator methods
+        code3 = "class Foo:\n    def __init__(self):\n        self.x = 7\n"
+        code3 += "    def walk(self):\n        yield self.x\n"
+        assert evalpy(code3 + "for v in Foo().walk(): print(v)") == "7"
+        # A dict with a "next" key is not an iterator
+        code3 = "d = {'next': lambda: 1, 'a': 2}\n"
+        assert evalpy(code3 + "for k in d: print(k)") == "next\na"
+        assert evalpy(code3 + "print(list(d))") == "[ 'next', 'a' ]"
+        assert evalpy(code3 + "print([k for k in d])") == "[ 'next', 'a' ]"
+        assert evalpy(code3 + "a = [k for k in d]\nprint(a)") == "[ 'next', 'a' ]"
+
 
 class TestClasses:
     def test_class(self):
@@ -1114,4 +1300,74 @@ class TestClasses:
         )
 
 
+class TestInstrumentation:
+    def test_instrument_off(self):
+        code = "def foo(a):\n    return a\n"
+        assert "profile" not in py2js(code)
+        assert "profile" not in py2js(code, instrument=False)
+
+    def test_instrument_functions_and_methods(self):
+        code = """
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+class Foo:
+    def bar(self):
+        def inner():
+            return 2
+        return inner()
+
+class Sub(Foo):
+    pass
+
+def fails():
+    raise ValueError()
+
+def gen():
+    yield 1
+    yield 2
+
+fib(5)
+fib(5)
+for x in gen():
+    break
+Sub().bar()
+Sub().bar()
+try:
+    fails()
+except ValueError:
+    pass
+"""
+        js = py2js(code, instrument=True)
+        assert "_pyfunc_op_profile_enter" in js
+        stats = json.loads(evaljs(js + "pscript_profile.dump()"))
+
+        assert list(stats) == ["fib", "Foo.bar", "Foo.bar.inner", "fails"]
+        assert stats["fib"]["enter"] == stats["fib"]["exit"] == 30
+        assert stats["Foo.bar"]["enter"] == 2
+        assert stats["Foo.bar.inner"]["enter"] == 2
+        assert stats["fails"]["exit"] == 1  # also counted when raising
+        assert all(s["active"] == 0 and s["time"] >= 0 for s in stats.values())
+        # Generators are not instrumented, they may never finish
+        assert "gen" not in stats
+
+    def test_instrument_result(self):
+        code = "def foo(a, b=2):\n    return a * b\nfoo(3)"
+        assert evaljs(py2js(code, instrument=True)) == "6"
+        # The registry is shared between modules, and can be reset
+        js = py2js(code, instrument=True)
+        res = evaljs(js + js + "pscript_profile.stats.foo.enter")
+        assert res == "2"
+        res = evaljs(js + "pscript_profile.reset(); pscript_profile.dump()")
+        assert res == "{}"
+        # Without a known global object, e.g. in some workers
+        js = py2js("def foo(a, b=2):\n    return a * b\n", instrument=True)
+        res = evaljs(
+            "(function (globalThis, window, global) {%s return foo(3);})()" % js
+        )
+        assert res == "6"
+
+
 run_tests_if_main()
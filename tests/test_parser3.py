@@ -186,6 +186,46 @@ class TestHardcoreBuiltins:
         assert evalpy("list(range(2, 9, 2))") == "[ 2, 4, 6, 8 ]"
         assert evalpy("list(range(10, 3, -2))") == "[ 10, 8, 6, 4 ]"
 
+    def test_range_object(self):
+        code = "r = range(2, 20, 3)\n"  # 2, 5, 8, 11, 14, 17
+        assert evalpy(code + "print(len(r), len(range(5, 0)))") == "6 0"
+        assert evalpy(code + "print(r[0], r[5], r[6])") == "2 17 undefined"
+        assert evalpy(code + "print(5 in r, 6 in r, 20 in r, 17 in r)") == (
+            "true false false true"
+        )
+        assert evalpy(code + "print(r.index(8), r.count(8), r.count(9))") == "2 1 0"
+        assert evalpy(code + "print(list(r[1:3]), str(r))") == "5,8 range(2, 20, 3)"
+        assert evalpy(code + "print(bool(r), bool(range(0)))") == "true false"
+        # The range is not materialized, but can be iterated in many ways
+        assert evalpy("r = range(10**12)\nprint(len(r), r[10**11], -1 in r)") == (
+            "1000000000000 100000000000 false"
+        )
+        assert evalpy(code + "for i in r: print(i)") == "2\n5\n8\n11\n14\n17"
+        assert evalpy(code + "print([i for i in r if i > 10])") == "[ 11, 14, 17 ]"
+        assert evalpy(code + "print(sum(r), max(r), min(r))") == "57 17 2"
+        assert (
+            evalpy("print(list(zip(range(9), 'ab')))") == "[ [ 0, 'a' ], [ 1, 'b' ] ]"
+        )
+        assert evalpy("print(map(lambda x: x * 2, range(3)))") == "[ 0, 2, 4 ]"
+        assert evalpy("print('-'.join(map(lambda x: str(x), range(3))))") == "0-1-2"
+        # A range is immutable
+        with raises(RuntimeError):
+            evalpy(code + "r.append(3)")
+        # But it can be added, multiplied and serialized like a list
+        assert evalpy("print(range(3) + [9], [0] + range(2))") == "0,1,2,9 0,0,1"
+        assert evalpy("print(range(2) * 2, 2 * range(1))") == "0,1,0,1 0,0"
+        assert evalpy("JSON.stringify(range(3))") == "[0,1,2]"
+        # Ranges compare by their elements, and repr() matches str()
+        code = "print(range(3) == range(3), [range(2)] == [range(2)], "
+        assert evalpy(code + "range(0, 3, 2) == range(0, 4, 2))") == "true true true"
+        assert evalpy("print(range(3) == range(4), range(3) != range(3))") == (
+            "false false"
+        )
+        assert evalpy("print(repr(range(3)), repr(range(1, 9, 2)))") == (
+            "range(0, 3) range(1, 9, 2)"
+        )
+        assert evalpy("print('{!r}'.format(range(2)))") == "range(0, 2)"
+
 
 class TestOtherBuiltins:
     # def test_allow_overload(self):
@@ -331,6 +371,30 @@ class TestOtherBuiltins:
         code = "f1 = lambda x: x+2\n"
         assert evalpy(code + "for x in map(f1, [-1, 0, 2]): print(x)") == "1\n2\n4"
 
+    def test_iterators(self):
+        # Builtins that consume iterators, such as generators
+        code = "def gen(n):\n    for i in range(n):\n        yield i\n"
+        assert evalpy(code + "print(list(gen(3)))") == "[ 0, 1, 2 ]"
+        assert evalpy(code + "print(sum(gen(5)))") == "10"
+        assert evalpy(code + "print(all(gen(3)), any(gen(3)))") == "false true"
+        assert evalpy(code + "print(all(gen(0)), any(gen(1)))") == "true false"
+        assert evalpy(code + "print(sorted(gen(3), reverse=True))") == "[ 2, 1, 0 ]"
+        assert evalpy(code + "print(reversed(gen(3)))") == "[ 2, 1, 0 ]"
+        assert evalpy(code + "print(dict(zip(['a', 'b'], gen(2))))") == "{ a: 0, b: 1 }"
+        # Builtins that produce iterators when given one
+        assert (
+            evalpy(code + "for i, x in enumerate(gen(3)): print(i*10 + x)")
+            == "0\n11\n22"
+        )
+        assert evalpy(code + "for a, b in zip(gen(9), 'ab'): print(a, b)") == "0 a\n1 b"
+        assert (
+            evalpy(code + "print(list(map(lambda x: x*2, filter(None, gen(4)))))")
+            == "[ 2, 4, 6 ]"
+        )
+        # But arrays still produce arrays
+        assert evalpy("print(enumerate([5]))") == "[ [ 0, 5 ] ]"
+        assert evalpy("print(map(lambda x: x+1, [5]))") == "[ 6 ]"
+
 
 class TestListMethods:
     def test_append(self):
@@ -398,6 +462,25 @@ class TestListMethods:
             == "[ 'aa', 'bb', 'dd', 'mm' ]"
         )
 
+        # Numbers are sorted numerically, also without a key
+        assert evalpy("a=[10, 9, 100, 1]; a.sort(); a") == "[ 1, 9, 10, 100 ]"
+        # Sorting is stable, also when reversed (like Python)
+        code = "a=[[2, 'a'], [1, 'b'], [2, 'c'], [1, 'd']];"
+        code += "k = lambda x: x[0];"
+        assert evalpy(code + "a.sort(key=k); ''.join([x[1] for x in a])") == "bdac"
+        assert (
+            evalpy(code + "a.sort(key=k, reverse=True); ''.join([x[1] for x in a])")
+            == "acbd"
+        )
+        code = code.replace("x[0]", "str(x[0])")
+        assert (
+            evalpy(code + "a.sort(key=k, reverse=True); ''.join([x[1] for x in a])")
+            == "acbd"
+        )
+        # The key is called once per element
+        code = "n = [0]\ndef k(x):\n    n[0] += 1\n    return x\n"
+        assert evalpy(code + "a = [5, 3, 1, 4, 2]; a.sort(key=k); n[0]") == "5"
+
     def test_clear(self):
         assert evalpy("a=[3,1,4,2]; a.clear(); a") == "[]"
 
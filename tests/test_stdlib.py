@@ -4,9 +4,14 @@ will mostly test if the implemenation is correct. This module does some
 meta tests.
 """
 
-from pscript.testing import run_tests_if_main
+import os
+import json
+import hashlib
+import tempfile
 
-from pscript import py2js, stdlib
+from pscript.testing import run_tests_if_main, raises
+
+from pscript import py2js, evaljs, stdlib, write_std_lib, __version__
 
 
 def test_stdlib_full_and_partial():
@@ -51,4 +56,88 @@ def test_stdlib_has_all_str_methods():
         assert method_name in stdlib.METHODS
 
 
+def test_minify_js():
+    code = """
+    var foo = function (a, b) { // nargs: 2
+        /* a comment */
+        var s = ' // not a comment ', r = /[/]\\//g;
+        return a + +b + s.replace(r, "x");
+    }
+    foo(1, 2)
+    """
+    code2 = stdlib.minify_js(code)
+    assert code2 == (
+        "var foo=function(a,b){var s=' // not a comment ',r=/[/]\\//g;"
+        'return a+ +b+s.replace(r,"x");}\nfoo(1,2)'
+    )
+    assert evaljs(code + ";foo(1, 2)") == evaljs(code2 + ";foo(1, 2)")
+
+
+def test_std_check():
+    assert stdlib.get_std_check([], []) == ""
+    code = py2js("x = [1] * 3", inline_stdlib=False, check_stdlib=True)
+    assert (
+        "typeof _pyfunc_op_as_array, typeof _pyfunc_op_error, "
+        "typeof _pyfunc_op_mult, typeof _pymeth_repeat" in code
+    )
+    assert "stdlib is not loaded" not in py2js("x = [1] * 3", check_stdlib=True)
+    code2 = py2js("x = 3", inline_stdlib=False, check_stdlib=True)
+    assert "stdlib is not loaded" not in code2
+    with raises(Exception) as err:
+        evaljs(code)
+    assert (
+        "needs: _pyfunc_op_as_array, _pyfunc_op_error, _pyfunc_op_mult, _pymeth_repeat"
+        in str(err.value)
+    )
+    assert evaljs(stdlib.get_full_std_lib() + code + "x", print_result=False) == ""
+
+
+def test_write_std_lib():
+    dirname = tempfile.mkdtemp()
+
+    for module_type in (None, "umd", "esm"):
+        for minify in (False, True):
+            manifest = write_std_lib(dirname, module_type, minify)
+            filename = os.path.join(dirname, manifest["filename"])
+            with open(filename, "rb") as f:
+                jscode = f.read().decode()
+            with open(os.path.join(dirname, "pscript-stdlib.json"), "rb") as f:
+                assert json.loads(f.read().decode()) == manifest
+            assert manifest["filename"].startswith("pscript-stdlib-" + __version__)
+            assert manifest["sha256"][:10] in manifest["filename"]
+            assert manifest["sha256"] == hashlib.sha256(jscode.encode()).hexdigest()
+            assert manifest["size"] == len(jscode.encode())
+            assert manifest["functions"] == sorted(stdlib.FUNCTIONS)
+            assert manifest["methods"] == sorted(stdlib.METHODS)
+            if module_type == "esm":
+                assert filename.endswith(".mjs")
+                assert "export" in jscode
+                assert jscode.rstrip().endswith("zfill};")
+            elif module_type is None:
+                code = py2js("print([1] * 3)", inline_stdlib=False, minify=minify)
+                res = evaljs(jscode + code, print_result=False)
+                assert res == "[ 1, 1, 1 ]"
+            if minify:
+                assert manifest["function_prefix"] == "$"
+                assert "var $op_mult=function" in jscode
+                assert manifest["size"] < 0.85 * len(stdlib.get_full_std_lib())
+
+
+def test_command_line():
+    from pscript.__main__ import main
+
+    dirname = tempfile.mkdtemp()
+    assert main(["stdlib", dirname, "--minify"]) == 0
+    with open(os.path.join(dirname, "pscript-stdlib.json"), "rb") as f:
+        assert json.loads(f.read().decode())["filename"] in os.listdir(dirname)
+    with raises(SystemExit):  # a command is required
+        main([])
+    # The directory is created, and errors are reported without a traceback
+    subdirname = os.path.join(dirname, "sub", "dir")
+    assert main(["stdlib", subdirname]) == 0
+    assert len(os.listdir(subdirname)) == 2
+    with raises(SystemExit):
+        main(["stdlib", os.path.join(dirname, "pscript-stdlib.json")])
+
+
 run_tests_if_main()